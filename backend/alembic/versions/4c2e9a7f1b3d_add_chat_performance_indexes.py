@@ -0,0 +1,51 @@
+"""Add performance indexes to the chat tables
+
+Revision ID: 4c2e9a7f1b3d
+Revises: replace_file_data_with_s3_key
+Create Date: 2026-10-18 19:40:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "4c2e9a7f1b3d"
+down_revision: Union[str, Sequence[str], None] = "replace_file_data_with_s3_key"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Message history is always read per conversation in (created_at, id) order
+    op.create_index(
+        "ix_messages_conversation_id_created_at_id",
+        "messages",
+        ["conversation_id", "created_at", "id"],
+        unique=False,
+        if_not_exists=True,
+    )
+    # The conversation list is read newest-first by (updated_at, id)
+    op.create_index(
+        "ix_conversations_updated_at_id",
+        "conversations",
+        [sa.text("updated_at DESC"), sa.text("id DESC")],
+        unique=False,
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        "ix_conversations_updated_at_id", table_name="conversations", if_exists=True
+    )
+    op.drop_index(
+        "ix_messages_conversation_id_created_at_id",
+        table_name="messages",
+        if_exists=True,
+    )
@@ -0,0 +1,62 @@
+"""Add denormalized summary columns to conversations
+
+Revision ID: 8d1f5b6c2e90
+Revises: 4c2e9a7f1b3d
+Create Date: 2026-10-18 20:05:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8d1f5b6c2e90"
+down_revision: Union[str, Sequence[str], None] = "4c2e9a7f1b3d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "conversations",
+        sa.Column("message_count", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.add_column(
+        "conversations",
+        sa.Column("last_message_preview", sa.String(length=200), nullable=True),
+    )
+    op.add_column(
+        "conversations", sa.Column("last_message_at", sa.DateTime(), nullable=True)
+    )
+
+    # Backfill existing rows; `python backfill_conversation_summaries.py` reruns this
+    op.execute(
+        """
+        UPDATE conversations SET
+            message_count = (
+                SELECT COUNT(*) FROM messages
+                WHERE messages.conversation_id = conversations.id
+            ),
+            last_message_at = (
+                SELECT MAX(created_at) FROM messages
+                WHERE messages.conversation_id = conversations.id
+            ),
+            last_message_preview = (
+                SELECT SUBSTR(content, 1, 200) FROM messages
+                WHERE messages.conversation_id = conversations.id
+                ORDER BY created_at DESC, id DESC
+                LIMIT 1
+            )
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("conversations", "last_message_at")
+    op.drop_column("conversations", "last_message_preview")
+    op.drop_column("conversations", "message_count")
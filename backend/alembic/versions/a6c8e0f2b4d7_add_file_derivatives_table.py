@@ -0,0 +1,82 @@
+"""Add file_derivatives table and drop large values from file metadata
+
+Revision ID: a6c8e0f2b4d7
+Revises: f3b9d2e7a5c1
+Create Date: 2026-10-19 01:10:00.000000
+
+"""
+
+import json
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a6c8e0f2b4d7"
+down_revision: Union[str, Sequence[str], None] = "f3b9d2e7a5c1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Same limit as app.services.file_service.MAX_METADATA_STRING_LENGTH
+MAX_METADATA_STRING_LENGTH = 256
+
+stored_files = sa.table(
+    "stored_files",
+    sa.column("id", sa.Integer),
+    sa.column("file_metadata", sa.Text),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "file_derivatives",
+        sa.Column("key", sa.String(length=255), nullable=False),
+        sa.Column("file_hash", sa.String(length=64), nullable=False),
+        sa.Column("content_type", sa.String(length=100), nullable=False),
+        sa.Column("size", sa.Integer(), nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("key"),
+    )
+    op.create_index(
+        op.f("ix_file_derivatives_file_hash"),
+        "file_derivatives",
+        ["file_hash"],
+        unique=False,
+    )
+
+    # Images used to keep their whole base64 data in file_metadata; the
+    # downscaled derivative is rebuilt from S3 on first use instead
+    connection = op.get_bind()
+    rows = connection.execute(
+        sa.select(stored_files.c.id, stored_files.c.file_metadata).where(
+            sa.func.length(stored_files.c.file_metadata) > MAX_METADATA_STRING_LENGTH
+        )
+    ).all()
+    for file_id, file_metadata in rows:
+        metadata = json.loads(file_metadata)
+        small = {
+            key: value
+            for key, value in metadata.items()
+            if value is None
+            or isinstance(value, (bool, int, float))
+            or (isinstance(value, str) and len(value) <= MAX_METADATA_STRING_LENGTH)
+        }
+        if small != metadata:
+            connection.execute(
+                stored_files.update()
+                .where(stored_files.c.id == file_id)
+                .values(file_metadata=json.dumps(small))
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema.
+
+    Dropped metadata values are not restored; the originals remain in S3.
+    """
+    op.drop_index(op.f("ix_file_derivatives_file_hash"), table_name="file_derivatives")
+    op.drop_table("file_derivatives")
@@ -0,0 +1,41 @@
+"""Add rolling context summary columns to conversations
+
+Revision ID: b7e3c1d9a4f2
+Revises: 8d1f5b6c2e90
+Create Date: 2026-10-18 21:10:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b7e3c1d9a4f2"
+down_revision: Union[str, Sequence[str], None] = "8d1f5b6c2e90"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "conversations", sa.Column("context_summary", sa.Text(), nullable=True)
+    )
+    op.add_column(
+        "conversations",
+        sa.Column("context_summary_through_at", sa.DateTime(), nullable=True),
+    )
+    op.add_column(
+        "conversations",
+        sa.Column("context_summary_through_id", sa.Integer(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("conversations", "context_summary_through_id")
+    op.drop_column("conversations", "context_summary_through_at")
+    op.drop_column("conversations", "context_summary")
@@ -0,0 +1,61 @@
+"""Move file derivative bytes to S3
+
+Revision ID: c4d6f8a0b2e5
+Revises: a6c8e0f2b4d7
+Create Date: 2026-10-20 09:30:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c4d6f8a0b2e5"
+down_revision: Union[str, Sequence[str], None] = "a6c8e0f2b4d7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema.
+
+    Stored derivatives are dropped rather than copied to S3; each is rebuilt
+    from its original the next time it is needed.
+    """
+    op.drop_index(op.f("ix_file_derivatives_file_hash"), table_name="file_derivatives")
+    op.drop_table("file_derivatives")
+    op.create_table(
+        "file_derivatives",
+        sa.Column("key", sa.String(length=1024), nullable=False),
+        sa.Column("kind", sa.String(length=255), nullable=False),
+        sa.Column("size", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("key"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema.
+
+    Derivatives in S3 are left behind; the old table starts out empty.
+    """
+    op.drop_table("file_derivatives")
+    op.create_table(
+        "file_derivatives",
+        sa.Column("key", sa.String(length=255), nullable=False),
+        sa.Column("file_hash", sa.String(length=64), nullable=False),
+        sa.Column("content_type", sa.String(length=100), nullable=False),
+        sa.Column("size", sa.Integer(), nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("key"),
+    )
+    op.create_index(
+        op.f("ix_file_derivatives_file_hash"),
+        "file_derivatives",
+        ["file_hash"],
+        unique=False,
+    )
@@ -0,0 +1,56 @@
+"""Add generation_jobs table for asynchronous agent replies
+
+Revision ID: e2a4c6f8b1d3
+Revises: b7e3c1d9a4f2
+Create Date: 2026-10-18 22:30:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e2a4c6f8b1d3"
+down_revision: Union[str, Sequence[str], None] = "b7e3c1d9a4f2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "generation_jobs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("conversation_id", sa.Integer(), nullable=False),
+        sa.Column("user_message_id", sa.Integer(), nullable=False),
+        sa.Column("agent_message_id", sa.Integer(), nullable=True),
+        sa.Column("status", sa.String(length=10), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["conversation_id"], ["conversations.id"]),
+        sa.ForeignKeyConstraint(["user_message_id"], ["messages.id"]),
+        sa.ForeignKeyConstraint(["agent_message_id"], ["messages.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_generation_jobs_id"), "generation_jobs", ["id"], unique=False
+    )
+    # Unfinished jobs are re-queued by status at startup
+    op.create_index(
+        "ix_generation_jobs_status_id",
+        "generation_jobs",
+        ["status", "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_generation_jobs_status_id", table_name="generation_jobs")
+    op.drop_index(op.f("ix_generation_jobs_id"), table_name="generation_jobs")
+    op.drop_table("generation_jobs")
@@ -0,0 +1,29 @@
+"""Add generation_stats to messages for per-call LLM latency and cost
+
+Revision ID: f3b9d2e7a5c1
+Revises: e2a4c6f8b1d3
+Create Date: 2026-10-18 23:40:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f3b9d2e7a5c1"
+down_revision: Union[str, Sequence[str], None] = "e2a4c6f8b1d3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("messages", sa.Column("generation_stats", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("messages", "generation_stats")
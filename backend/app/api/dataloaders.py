@@ -0,0 +1,99 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import Select, desc, literal, select, union_all
+from strawberry.dataloader import DataLoader
+from strawberry.fastapi import BaseContext
+
+from app.api.pagination import keyset_before
+from app.core.database import AsyncSessionLocal
+from app.models.chat import Message
+from app.models.file import StoredFile
+
+
+class MessagePageKey(NamedTuple):
+    conversation_id: int
+    last: Optional[int] = None  # None loads the whole history
+    before: Optional[Tuple[datetime, int]] = None  # (created_at, id) keyset
+
+
+class MessagePage(NamedTuple):
+    messages: List[Message]  # oldest first
+    has_previous_page: bool
+
+
+async def load_message_pages(keys: List[MessagePageKey]) -> List[MessagePage]:
+    """Fetch the requested message page of every key in one query."""
+    unique_keys = list(dict.fromkeys(keys))
+    rows_by_key: Dict[int, List[Message]] = defaultdict(list)
+
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(message_pages_query(unique_keys))
+        for message, key_index in result.all():
+            rows_by_key[key_index].append(message)
+
+    pages = {}
+    for key_index, key in enumerate(unique_keys):
+        newest_first = rows_by_key[key_index]
+        if key.last is None:
+            pages[key] = MessagePage(list(reversed(newest_first)), False)
+        else:
+            pages[key] = MessagePage(
+                list(reversed(newest_first[: key.last])),
+                len(newest_first) > key.last,
+            )
+    return [pages[key] for key in keys]
+
+
+def message_pages_query(keys: List[MessagePageKey]) -> Select:
+    """Select (Message, key index) rows for each key's page, newest first.
+
+    Every key gets its own keyset select with a LIMIT, so a page costs an index
+    seek plus the page's rows however long the conversation is; the selects
+    are combined with UNION ALL to keep one round trip.
+    """
+    pages = []
+    for key_index, key in enumerate(keys):
+        page = select(Message.id, literal(key_index).label("key_index")).where(
+            Message.conversation_id == key.conversation_id
+        )
+        if key.before:
+            page = page.where(keyset_before(Message.created_at, Message.id, key.before))
+        page = page.order_by(desc(Message.created_at), desc(Message.id))
+        if key.last is not None:
+            # One row past the page tells us whether older messages exist
+            page = page.limit(key.last + 1)
+        # SQLite only accepts LIMIT inside a UNION ALL member as a subquery
+        pages.append(select(page.subquery()))
+
+    paged = (pages[0] if len(pages) == 1 else union_all(*pages)).subquery()
+    return (
+        select(Message, paged.c.key_index)
+        .join(paged, Message.id == paged.c.id)
+        .order_by(paged.c.key_index, desc(Message.created_at), desc(Message.id))
+    )
+
+
+async def load_files(file_ids: List[int]) -> List[Optional[StoredFile]]:
+    """Fetch stored file records for every requested ID in one IN query."""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(StoredFile).where(StoredFile.id.in_(file_ids))
+        )
+        files_by_id = {file.id: file for file in result.scalars().all()}
+
+        return [files_by_id.get(id) for id in file_ids]
+
+
+class Context(BaseContext):
+    """Per-request GraphQL context holding request-scoped DataLoaders."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.message_pages_loader = DataLoader(load_fn=load_message_pages)
+        self.files_loader = DataLoader(load_fn=load_files)
+
+
+async def get_context() -> Context:
+    return Context()
@@ -0,0 +1,81 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Optional, Set, TypeVar
+
+from app.core.metrics import counter
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+cancelled_generations = counter(
+    "llm_generations_cancelled_total",
+    "Agent replies abandoned because the client went away, by operation and "
+    "whether a partial reply was kept",
+    labelnames=("operation", "persisted"),
+)
+
+
+# Writes that must finish although the request that started them is gone
+_pending: Set[asyncio.Task] = set()
+
+
+class ClientDisconnected(Exception):
+    """The HTTP client went away before the response was ready."""
+
+
+async def wait_for_disconnect(request: Any) -> None:
+    """Return once the client of an HTTP request disconnects.
+
+    The GraphQL body has been read by then, so the next ASGI message is the
+    disconnect.
+    """
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def cancel_on_disconnect(request: Optional[Any], awaitable: Awaitable[T]) -> T:
+    """Await `awaitable`, cancelling it if the HTTP client disconnects first.
+
+    Raises ClientDisconnected after the cancellation. Without an HTTP request
+    (a websocket operation or a direct schema call) it just awaits.
+    """
+    task = asyncio.ensure_future(awaitable)
+    # Operations sent over a websocket end with the socket, not a disconnect
+    if request is None or request.scope.get("type") != "http":
+        return await task
+
+    watcher = asyncio.ensure_future(wait_for_disconnect(request))
+    try:
+        done, _ = await asyncio.wait(
+            {task, watcher}, return_when=asyncio.FIRST_COMPLETED
+        )
+        if task in done:
+            return task.result()
+
+        logger.info("Client disconnected, cancelling generation")
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        raise ClientDisconnected()
+    finally:
+        watcher.cancel()
+        # Our own caller was cancelled
+        task.cancel()
+
+
+async def run_to_completion(awaitable: Awaitable[T]) -> T:
+    """Await `awaitable`, letting it finish even if the caller is cancelled.
+
+    A cancelled subscription may be cancelled again while it cleans up; the
+    work carries on in the background and `wait_for_pending` waits for it.
+    """
+    task = asyncio.ensure_future(awaitable)
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+    return await asyncio.shield(task)
+
+
+async def wait_for_pending() -> None:
+    await asyncio.gather(*_pending, return_exceptions=True)
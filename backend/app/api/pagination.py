@@ -0,0 +1,41 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import Tuple
+
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(timestamp: datetime, id: int) -> str:
+    """Encode a (timestamp, id) keyset position as an opaque cursor string."""
+    raw = f"{timestamp.isoformat()}|{id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by encode_cursor back into (timestamp, id)."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        timestamp, id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(id)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def keyset_before(timestamp_column, id_column, position: Tuple[datetime, int]):
+    """Filter for rows strictly before a position in (timestamp, id) order.
+
+    A row-value comparison lets SQLite seek a composite index in one range scan,
+    where the equivalent OR of comparisons re-checks every row past the seek.
+    """
+    return tuple_(timestamp_column, id_column) < tuple_(*position)
+
+
+def clamp_page_size(size: int) -> int:
+    """Validate a requested page size and cap it at MAX_PAGE_SIZE."""
+    if size < 1:
+        raise ValueError(f"Invalid page size: {size}. Must be at least 1")
+    return min(size, MAX_PAGE_SIZE)
@@ -0,0 +1,93 @@
+import hashlib
+from typing import Any, Optional, Union
+
+from fastapi import Request
+from graphql import GraphQLError
+from strawberry.fastapi import GraphQLRouter
+from strawberry.http import GraphQLRequestData
+from strawberry.http.async_base_view import AsyncHTTPRequestAdapter
+from strawberry.types import ExecutionResult, SubscriptionExecutionResult
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+
+PERSISTED_QUERY_VERSION = 1
+
+# Query documents keyed by the sha256 hex digest of their text
+persisted_queries = LRUCache(
+    "persisted_query",
+    max_entries=settings.PERSISTED_QUERY_MAX_ENTRIES,
+    max_bytes=settings.PERSISTED_QUERY_MAX_BYTES,
+    ttl_seconds=settings.PERSISTED_QUERY_TTL,
+)
+
+
+class PersistedQueryError(GraphQLError):
+    def __init__(self, message: str, code: str):
+        super().__init__(message, extensions={"code": code})
+
+
+def hash_query(query: str) -> str:
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+def resolve_persisted_query(
+    query: Optional[str], extensions: Optional[dict]
+) -> Optional[str]:
+    """Resolve a request's query text using the automatic persisted query protocol.
+
+    A request carrying only `extensions.persistedQuery.sha256Hash` is served
+    from the registry; a request carrying the query as well registers it under
+    that hash. Requests without the extension pass through unchanged.
+    """
+    persisted_query = (extensions or {}).get("persistedQuery")
+    if not persisted_query:
+        return query
+
+    if persisted_query.get("version") != PERSISTED_QUERY_VERSION:
+        raise PersistedQueryError(
+            "Unsupported persisted query version", "PERSISTED_QUERY_NOT_SUPPORTED"
+        )
+
+    sha256_hash = persisted_query.get("sha256Hash")
+    if not isinstance(sha256_hash, str):
+        raise PersistedQueryError(
+            "Persisted query is missing sha256Hash", "BAD_USER_INPUT"
+        )
+
+    if query is None:
+        query = persisted_queries.get(sha256_hash)
+        if query is None:
+            # Clients retry with the full document, which registers it
+            raise PersistedQueryError(
+                "PersistedQueryNotFound", "PERSISTED_QUERY_NOT_FOUND"
+            )
+        return query
+
+    if hash_query(query) != sha256_hash:
+        raise PersistedQueryError(
+            "Provided sha256Hash does not match query", "BAD_USER_INPUT"
+        )
+    persisted_queries.set(sha256_hash, query)
+    return query
+
+
+class PersistedQueryRouter(GraphQLRouter):
+    """GraphQLRouter that accepts automatic persisted queries (APQ)."""
+
+    async def parse_http_body(
+        self, request: AsyncHTTPRequestAdapter
+    ) -> GraphQLRequestData:
+        request_data = await super().parse_http_body(request)
+        request_data.query = resolve_persisted_query(
+            request_data.query, request_data.extensions
+        )
+        return request_data
+
+    async def execute_operation(
+        self, request: Request, context: Any, root_value: Any
+    ) -> Union[ExecutionResult, SubscriptionExecutionResult]:
+        try:
+            return await super().execute_operation(request, context, root_value)
+        except PersistedQueryError as error:
+            return ExecutionResult(data=None, errors=[error])
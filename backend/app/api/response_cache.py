@@ -0,0 +1,15 @@
+from app.core.cache import LRUCache
+from app.core.config import settings
+
+# Built ConversationGQL objects and message connections, tagged by conversation ID
+conversation_cache = LRUCache(
+    "conversation",
+    max_entries=settings.CONVERSATION_CACHE_MAX_ENTRIES,
+    max_bytes=settings.CONVERSATION_CACHE_MAX_BYTES,
+    ttl_seconds=settings.CONVERSATION_CACHE_TTL,
+)
+
+
+def invalidate_conversation(conversation_id: int) -> None:
+    """Drop every cached response derived from a conversation after a write."""
+    conversation_cache.invalidate(conversation_id)
@@ -1,14 +1,51 @@
+import asyncio
+import json
 from datetime import datetime
-from typing import List, Optional
+from typing import AsyncGenerator, List, Optional
 
 import strawberry
 from sqlalchemy import desc, select
-from sqlalchemy.orm import selectinload
-
+from strawberry.extensions import ParserCache, ValidationCache
+
+from app.api.dataloaders import MessagePageKey
+from app.api.disconnect import (
+    ClientDisconnected,
+    cancel_on_disconnect,
+    cancelled_generations,
+    run_to_completion,
+)
+from app.api.pagination import (
+    DEFAULT_PAGE_SIZE,
+    clamp_page_size,
+    decode_cursor,
+    encode_cursor,
+    keyset_before,
+)
+from app.api.response_cache import conversation_cache, invalidate_conversation
+from app.core.config import settings
 from app.core.database import AsyncSessionLocal
-from app.models.chat import Conversation, Message
+from app.models.chat import Conversation, GenerationJob, Message
+from app.services.context_summary_service import context_summary_service
+from app.services.conversation_service import conversation_service
+from app.services.file_service import file_id_from_url
+from app.services.generation_service import generation_service
+from app.services.llm_metrics import LLMCallStats
 from app.services.llm_service import llm_service
 
+# Replies stored by background jobs change what cached conversations show
+generation_service.on_reply(invalidate_conversation)
+
+
+@strawberry.type
+class FileGQL:
+    id: int
+    file_name: str = strawberry.field(name="fileName")
+    file_size: int = strawberry.field(name="fileSize")
+    mime_type: str = strawberry.field(name="mimeType")
+    has_extracted_content: bool = strawberry.field(name="hasExtractedContent")
+    metadata: Optional[strawberry.scalars.JSON] = None
+    created_at: datetime = strawberry.field(name="createdAt")
+
 
 @strawberry.type
 class AttachmentGQL:
@@ -19,6 +56,29 @@ class AttachmentGQL:
     mime_type: Optional[str] = None
     metadata: Optional[strawberry.scalars.JSON] = None
 
+    @strawberry.field
+    async def file(self, info: strawberry.Info) -> Optional[FileGQL]:
+        """Stored file record behind an /api/files/<id> attachment URL."""
+        file_id = file_id_from_url(self.url)
+        if file_id is None:
+            return None
+
+        stored_file = await info.context.files_loader.load(file_id)
+        if not stored_file:
+            return None
+
+        return FileGQL(
+            id=stored_file.id,
+            file_name=stored_file.original_filename,
+            file_size=stored_file.file_size,
+            mime_type=stored_file.content_type,
+            has_extracted_content=stored_file.extracted_text is not None,
+            metadata=json.loads(stored_file.file_metadata)
+            if stored_file.file_metadata
+            else None,
+            created_at=stored_file.created_at,
+        )
+
 
 @strawberry.type
 class MessageGQL:
@@ -30,13 +90,116 @@ class MessageGQL:
     created_at: datetime = strawberry.field(name="createdAt")
 
 
+def build_message_gql(msg: Message) -> MessageGQL:
+    return MessageGQL(
+        id=msg.id,
+        conversation_id=msg.conversation_id,
+        type=msg.type,
+        content=msg.content,
+        attachments=[AttachmentGQL(**att) for att in (msg.attachments or [])],
+        created_at=msg.created_at,
+    )
+
+
+@strawberry.type
+class PageInfo:
+    has_next_page: bool = strawberry.field(name="hasNextPage")
+    end_cursor: Optional[str] = strawberry.field(name="endCursor", default=None)
+    has_previous_page: bool = strawberry.field(name="hasPreviousPage", default=False)
+    start_cursor: Optional[str] = strawberry.field(name="startCursor", default=None)
+
+
+@strawberry.type
+class MessageEdge:
+    cursor: str
+    node: MessageGQL
+
+
+@strawberry.type
+class MessageConnection:
+    edges: List[MessageEdge]
+    page_info: PageInfo = strawberry.field(name="pageInfo")
+
+
 @strawberry.type
 class ConversationGQL:
     id: int
     title: str
     created_at: datetime = strawberry.field(name="createdAt")
     updated_at: datetime = strawberry.field(name="updatedAt")
-    messages: List[MessageGQL] = strawberry.field(default_factory=list)
+
+    @strawberry.field
+    async def messages(
+        self,
+        info: strawberry.Info,
+        last: Optional[int] = None,
+        before: Optional[str] = None,
+    ) -> MessageConnection:
+        """Messages oldest-first, keyset-paginated backwards on (created_at, id).
+
+        Pass `last` to load only the newest page, then the page's `startCursor`
+        as `before` to scroll back. Without `last` the whole history is returned.
+        """
+        key = MessagePageKey(
+            conversation_id=self.id,
+            last=clamp_page_size(last) if last is not None else None,
+            before=decode_cursor(before) if before else None,
+        )
+        cache_key = ("messages", key)
+        cached = conversation_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        version = conversation_cache.version([self.id])
+        page = await info.context.message_pages_loader.load(key)
+
+        edges = [
+            MessageEdge(
+                cursor=encode_cursor(msg.created_at, msg.id),
+                node=build_message_gql(msg),
+            )
+            for msg in page.messages
+        ]
+        connection = MessageConnection(
+            edges=edges,
+            page_info=PageInfo(
+                has_next_page=False,
+                end_cursor=edges[-1].cursor if edges else None,
+                has_previous_page=page.has_previous_page,
+                start_cursor=edges[0].cursor if edges else None,
+            ),
+        )
+        conversation_cache.set(cache_key, connection, tags=[self.id], version=version)
+        return connection
+
+
+@strawberry.type
+class ConversationSummaryGQL:
+    """Sidebar-sized view of a conversation; never carries messages."""
+
+    id: int
+    title: str
+    created_at: datetime = strawberry.field(name="createdAt")
+    updated_at: datetime = strawberry.field(name="updatedAt")
+    message_count: int = strawberry.field(name="messageCount")
+    last_message_preview: Optional[str] = strawberry.field(
+        name="lastMessagePreview", default=None
+    )
+    last_message_at: Optional[datetime] = strawberry.field(
+        name="lastMessageAt", default=None
+    )
+
+
+@strawberry.type
+class ConversationEdge:
+    cursor: str
+    node: ConversationSummaryGQL
+
+
+@strawberry.type
+class ConversationConnection:
+    edges: List[ConversationEdge]
+    page_info: PageInfo = strawberry.field(name="pageInfo")
 
 
 @strawberry.input
@@ -59,6 +222,101 @@ class MessageInput:
     attachments: Optional[List[AttachmentInput]] = None
 
 
+def serialize_attachments(
+    attachments: Optional[List[AttachmentInput]],
+) -> Optional[List[dict]]:
+    """Convert AttachmentInput to dict format for JSON storage."""
+    if not attachments:
+        return None
+    return [
+        {
+            "type": att.type,
+            "name": att.name,
+            "url": att.url,
+            "size": att.size,
+            "mime_type": att.mime_type,
+            "metadata": att.metadata,
+        }
+        for att in attachments
+    ]
+
+
+@strawberry.type
+class MessageStreamEvent:
+    """One step of a streamed reply.
+
+    The first event carries the saved user message, each following event a
+    token `delta`, and the last one the saved agent message with `done` set.
+    """
+
+    delta: Optional[str] = None
+    message: Optional[MessageGQL] = None
+    done: bool = False
+
+
+@strawberry.type
+class GenerationJobGQL:
+    """An agent reply being generated in the background.
+
+    `status` is one of pending, running, completed or failed; `agentMessage`
+    is set once the reply is stored.
+    """
+
+    id: int
+    conversation_id: int
+    status: str
+    error: Optional[str] = None
+    user_message: MessageGQL
+    agent_message: Optional[MessageGQL] = None
+    created_at: datetime = strawberry.field(name="createdAt")
+    updated_at: datetime = strawberry.field(name="updatedAt")
+
+
+async def load_generation_job(session, job: GenerationJob) -> GenerationJobGQL:
+    message_ids = [job.user_message_id, job.agent_message_id]
+    result = await session.execute(
+        select(Message).where(
+            Message.id.in_([message_id for message_id in message_ids if message_id])
+        )
+    )
+    messages = {msg.id: msg for msg in result.scalars().all()}
+    agent_message = messages.get(job.agent_message_id)
+
+    return GenerationJobGQL(
+        id=job.id,
+        conversation_id=job.conversation_id,
+        status=job.status,
+        error=job.error,
+        user_message=build_message_gql(messages[job.user_message_id]),
+        agent_message=build_message_gql(agent_message) if agent_message else None,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+    )
+
+
+async def store_streamed_reply(
+    conversation_id: int, content: str, stats: LLMCallStats
+) -> Message:
+    async with AsyncSessionLocal() as session:
+        ai_message = Message(
+            conversation_id=conversation_id,
+            type="agent",
+            content=content,
+            generation_stats=stats.as_stored(),
+        )
+        session.add(ai_message)
+
+        conversation = await session.get(Conversation, conversation_id)
+        if conversation:
+            conversation_service.record_message(conversation, ai_message)
+
+        await session.commit()
+        invalidate_conversation(conversation_id)
+        await session.refresh(ai_message)
+    context_summary_service.schedule(conversation_id)
+    return ai_message
+
+
 @strawberry.input
 class ConversationInput:
     title: Optional[str] = None
@@ -91,70 +349,82 @@ class DocumentCreateInput:
 @strawberry.type
 class Query:
     @strawberry.field(name="getConversations")
-    async def get_conversations(self) -> List[ConversationGQL]:
+    async def get_conversations(
+        self, first: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None
+    ) -> ConversationConnection:
+        """List conversations newest-first, keyset-paginated on (updated_at, id)."""
+        page_size = clamp_page_size(first)
+
         async with AsyncSessionLocal() as session:
-            result = await session.execute(
-                select(Conversation)
-                .options(selectinload(Conversation.messages))
-                .order_by(desc(Conversation.updated_at))
+            query = select(Conversation).order_by(
+                desc(Conversation.updated_at), desc(Conversation.id)
             )
+            if after:
+                query = query.where(
+                    keyset_before(
+                        Conversation.updated_at, Conversation.id, decode_cursor(after)
+                    )
+                )
+
+            # Fetch one extra row to know whether another page exists
+            result = await session.execute(query.limit(page_size + 1))
             conversations = result.scalars().all()
 
-            return [
-                ConversationGQL(
-                    id=conv.id,
-                    title=conv.title,
-                    created_at=conv.created_at,
-                    updated_at=conv.updated_at,
-                    messages=[
-                        MessageGQL(
-                            id=msg.id,
-                            conversation_id=msg.conversation_id,
-                            type=msg.type,
-                            content=msg.content,
-                            attachments=[
-                                AttachmentGQL(**att) for att in (msg.attachments or [])
-                            ],
-                            created_at=msg.created_at,
-                        )
-                        for msg in conv.messages
-                    ],
+            edges = [
+                ConversationEdge(
+                    cursor=encode_cursor(conv.updated_at, conv.id),
+                    node=ConversationSummaryGQL(
+                        id=conv.id,
+                        title=conv.title,
+                        created_at=conv.created_at,
+                        updated_at=conv.updated_at,
+                        message_count=conv.message_count,
+                        last_message_preview=conv.last_message_preview,
+                        last_message_at=conv.last_message_at,
+                    ),
                 )
-                for conv in conversations
+                for conv in conversations[:page_size]
             ]
 
+            return ConversationConnection(
+                edges=edges,
+                page_info=PageInfo(
+                    has_next_page=len(conversations) > page_size,
+                    end_cursor=edges[-1].cursor if edges else None,
+                ),
+            )
+
     @strawberry.field(name="getConversation")
     async def get_conversation(self, id: int) -> Optional[ConversationGQL]:
+        cache_key = ("conversation", id)
+        cached = conversation_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        version = conversation_cache.version([id])
         async with AsyncSessionLocal() as session:
-            result = await session.execute(
-                select(Conversation)
-                .options(selectinload(Conversation.messages))
-                .where(Conversation.id == id)
-            )
-            conversation = result.scalar_one_or_none()
+            conversation = await session.get(Conversation, id)
 
             if not conversation:
                 return None
 
-            return ConversationGQL(
+            result = ConversationGQL(
                 id=conversation.id,
                 title=conversation.title,
                 created_at=conversation.created_at,
                 updated_at=conversation.updated_at,
-                messages=[
-                    MessageGQL(
-                        id=msg.id,
-                        conversation_id=msg.conversation_id,
-                        type=msg.type,
-                        content=msg.content,
-                        attachments=[
-                            AttachmentGQL(**att) for att in (msg.attachments or [])
-                        ],
-                        created_at=msg.created_at,
-                    )
-                    for msg in conversation.messages
-                ],
             )
+            conversation_cache.set(cache_key, result, tags=[id], version=version)
+            return result
+
+    @strawberry.field(name="generationStatus")
+    async def generation_status(self, job_id: int) -> Optional[GenerationJobGQL]:
+        """Poll a reply requested with sendMessageAsync."""
+        async with AsyncSessionLocal() as session:
+            job = await session.get(GenerationJob, job_id)
+            if not job:
+                return None
+            return await load_generation_job(session, job)
 
     @strawberry.field(name="getDocument")
     async def get_document(self, id: int) -> DocumentType:
@@ -205,45 +475,60 @@ class Mutation:
                 title=conversation.title,
                 created_at=conversation.created_at,
                 updated_at=conversation.updated_at,
-                messages=[],
             )
 
     @strawberry.mutation
     async def create_conversation_with_message(
         self,
+        info: strawberry.Info,
         title: Optional[str],
         first_message: str,
         attachments: Optional[List[AttachmentInput]] = None,
     ) -> ConversationGQL:
         """Create a conversation and send the first message, generating AI response and smart title."""
-        async with AsyncSessionLocal() as session:
+        attachments_data = serialize_attachments(attachments)
+        reply_stats = LLMCallStats()
+
+        async def generate_title() -> str:
             # Generate smart title if not provided
-            if not title:
-                try:
-                    title = await llm_service.generate_conversation_title(first_message)
-                except Exception:
-                    title = f"Conversation {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+            if title:
+                return title
+            try:
+                return await llm_service.generate_conversation_title(first_message)
+            except Exception:
+                return f"Conversation {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+
+        async def generate_reply() -> str:
+            try:
+                return await llm_service.generate_response(
+                    user_message=first_message,
+                    conversation_history=None,
+                    attachments=attachments_data,
+                    stats=reply_stats,
+                )
+            except Exception as e:
+                print(f"Error generating AI response: {e}")
+                return "I'm having trouble connecting to the AI service right now. Please try again in a moment."
+
+        # The title and the reply only depend on the first message, so both LLM
+        # calls run at once and creating a conversation costs one round trip.
+        # If the client leaves first, both are cancelled and nothing is saved
+        try:
+            conversation_title, ai_response = await cancel_on_disconnect(
+                getattr(info.context, "request", None),
+                asyncio.gather(generate_title(), generate_reply()),
+            )
+        except ClientDisconnected:
+            cancelled_generations.inc(
+                operation="createConversationWithMessage", persisted="false"
+            )
+            raise
 
+        async with AsyncSessionLocal() as session:
             # Create conversation
-            conversation = Conversation(title=title)
+            conversation = Conversation(title=conversation_title)
             session.add(conversation)
-            await session.commit()
-            await session.refresh(conversation)
-
-            # Convert AttachmentInput to dict format for JSON storage
-            attachments_data = None
-            if attachments:
-                attachments_data = [
-                    {
-                        "type": att.type,
-                        "name": att.name,
-                        "url": att.url,
-                        "size": att.size,
-                        "mime_type": att.mime_type,
-                        "metadata": att.metadata,
-                    }
-                    for att in attachments
-                ]
+            await session.flush()
 
             # Create user message
             user_message = Message(
@@ -253,68 +538,34 @@ class Mutation:
                 attachments=attachments_data,
             )
             session.add(user_message)
+            conversation_service.record_message(conversation, user_message)
 
-            # Generate AI response
-            try:
-                ai_response = await llm_service.generate_response(
-                    user_message=first_message,
-                    conversation_history=None,
-                    attachments=attachments_data,
-                )
-
-                # Create AI message
-                ai_message = Message(
-                    conversation_id=conversation.id,
-                    type="agent",
-                    content=ai_response,
-                )
-                session.add(ai_message)
-
-            except Exception as e:
-                print(f"Error generating AI response: {e}")
-                # Create fallback response
-                ai_message = Message(
-                    conversation_id=conversation.id,
-                    type="agent",
-                    content="I'm having trouble connecting to the AI service right now. Please try again in a moment.",
-                )
-                session.add(ai_message)
+            # Create AI message
+            ai_message = Message(
+                conversation_id=conversation.id,
+                type="agent",
+                content=ai_response,
+                generation_stats=reply_stats.as_stored(),
+            )
+            session.add(ai_message)
 
-            # Update conversation timestamp
-            conversation.updated_at = datetime.utcnow()
+            # Update conversation summary and timestamp
+            conversation_service.record_message(conversation, ai_message)
             await session.commit()
+            invalidate_conversation(conversation.id)
 
-            # Refresh to get the messages
-            await session.refresh(conversation)
-            result = await session.execute(
-                select(Conversation)
-                .options(selectinload(Conversation.messages))
-                .where(Conversation.id == conversation.id)
-            )
-            conversation_with_messages = result.scalar_one()
-
+            # Messages are resolved lazily through the request's messages loader
             return ConversationGQL(
-                id=conversation_with_messages.id,
-                title=conversation_with_messages.title,
-                created_at=conversation_with_messages.created_at,
-                updated_at=conversation_with_messages.updated_at,
-                messages=[
-                    MessageGQL(
-                        id=msg.id,
-                        conversation_id=msg.conversation_id,
-                        type=msg.type,
-                        content=msg.content,
-                        attachments=[
-                            AttachmentGQL(**att) for att in (msg.attachments or [])
-                        ],
-                        created_at=msg.created_at,
-                    )
-                    for msg in conversation_with_messages.messages
-                ],
+                id=conversation.id,
+                title=conversation.title,
+                created_at=conversation.created_at,
+                updated_at=conversation.updated_at,
             )
 
     @strawberry.mutation
-    async def send_message(self, input: MessageInput) -> MessageGQL:
+    async def send_message(
+        self, info: strawberry.Info, input: MessageInput
+    ) -> MessageGQL:
         # Validate message type
         if input.type not in ["user", "agent"]:
             raise ValueError(
@@ -322,20 +573,7 @@ class Mutation:
             )
 
         async with AsyncSessionLocal() as session:
-            # Convert AttachmentInput to dict format for JSON storage
-            attachments_data = None
-            if input.attachments:
-                attachments_data = [
-                    {
-                        "type": att.type,
-                        "name": att.name,
-                        "url": att.url,
-                        "size": att.size,
-                        "mime_type": att.mime_type,
-                        "metadata": att.metadata,
-                    }
-                    for att in input.attachments
-                ]
+            attachments_data = serialize_attachments(input.attachments)
 
             # Create user message
             message = Message(
@@ -346,61 +584,112 @@ class Mutation:
             )
             session.add(message)
 
-            # Update conversation timestamp
+            # Update conversation summary and timestamp
             conversation = await session.get(Conversation, input.conversation_id)
             if conversation:
-                conversation.updated_at = datetime.utcnow()
+                conversation_service.record_message(conversation, message)
 
             await session.commit()
+            invalidate_conversation(input.conversation_id)
             await session.refresh(message)
 
-            # If this is a user message, generate an AI response
-            if input.type == "user":
-                try:
-                    # Get conversation history for context
-                    history_result = await session.execute(
-                        select(Message)
-                        .where(Message.conversation_id == input.conversation_id)
-                        .order_by(Message.created_at)
-                    )
-                    conversation_history = list(history_result.scalars().all())
-
-                    # Generate AI response with attachment context
-                    ai_response = await llm_service.generate_response(
-                        user_message=input.content,
-                        conversation_history=conversation_history[
-                            :-1
-                        ],  # Exclude current message
-                        attachments=attachments_data,
-                    )
+            if input.type != "user":
+                return build_message_gql(message)
 
-                    # Create AI message
-                    ai_message = Message(
-                        conversation_id=input.conversation_id,
-                        type="agent",
-                        content=ai_response,
-                    )
-                    session.add(ai_message)
-
-                    # Update conversation timestamp again
-                    conversation.updated_at = datetime.utcnow()
-                    await session.commit()
-
-                except Exception as e:
-                    # Log the error but don't fail the user message creation
-                    print(f"Error generating AI response: {e}")
-
-            return MessageGQL(
-                id=message.id,
-                conversation_id=message.conversation_id,
-                type=message.type,
-                content=message.content,
-                attachments=[
-                    AttachmentGQL(**att) for att in (message.attachments or [])
-                ],
-                created_at=message.created_at,
+            # Get conversation history for context
+            history_result = await session.execute(
+                context_summary_service.unsummarized_messages(
+                    input.conversation_id, conversation
+                )
+            )
+            conversation_history = list(history_result.scalars().all())
+            summary = conversation.context_summary if conversation else None
+
+        # If this is a user message, generate an AI response. The session is
+        # closed first so the LLM call never pins a connection or a lock
+        try:
+            # Generate AI response with attachment context
+            stats = LLMCallStats()
+            # Nobody reads a reply for a client that went away: the call is
+            # cancelled and no agent message is saved, only the user's
+            ai_response = await cancel_on_disconnect(
+                getattr(info.context, "request", None),
+                llm_service.generate_response(
+                    user_message=input.content,
+                    conversation_history=conversation_history[
+                        :-1
+                    ],  # Exclude current message
+                    attachments=attachments_data,
+                    summary=summary,
+                    stats=stats,
+                ),
             )
 
+            async with AsyncSessionLocal() as session:
+                # Create AI message
+                ai_message = Message(
+                    conversation_id=input.conversation_id,
+                    type="agent",
+                    content=ai_response,
+                    generation_stats=stats.as_stored(),
+                )
+                session.add(ai_message)
+
+                # Update conversation summary and timestamp again
+                conversation = await session.get(Conversation, input.conversation_id)
+                if conversation:
+                    conversation_service.record_message(conversation, ai_message)
+                await session.commit()
+
+            invalidate_conversation(input.conversation_id)
+            context_summary_service.schedule(input.conversation_id)
+
+        except ClientDisconnected:
+            cancelled_generations.inc(operation="sendMessage", persisted="false")
+
+        except Exception as e:
+            # Log the error but don't fail the user message creation
+            print(f"Error generating AI response: {e}")
+
+        return build_message_gql(message)
+
+    @strawberry.mutation(name="sendMessageAsync")
+    async def send_message_async(self, input: MessageInput) -> GenerationJobGQL:
+        """Save a user message and queue the agent reply instead of waiting for it.
+
+        Poll generationStatus with the returned job ID for the reply.
+        """
+        if input.type != "user":
+            raise ValueError(
+                f"Invalid message type: {input.type}. Only 'user' messages get a reply"
+            )
+
+        async with AsyncSessionLocal() as session:
+            conversation = await session.get(Conversation, input.conversation_id)
+            if not conversation:
+                raise ValueError(f"Conversation {input.conversation_id} not found")
+
+            message = Message(
+                conversation_id=input.conversation_id,
+                type=input.type,
+                content=input.content,
+                attachments=serialize_attachments(input.attachments),
+            )
+            session.add(message)
+            conversation_service.record_message(conversation, message)
+            await session.flush()
+
+            # The message and its job commit together, so no reply is lost
+            job = GenerationJob(
+                conversation_id=input.conversation_id, user_message_id=message.id
+            )
+            session.add(job)
+            await session.commit()
+            invalidate_conversation(input.conversation_id)
+            generation_service.submit(job.id)
+
+            return await load_generation_job(session, job)
+
     @strawberry.mutation
     async def create_document(self, document: DocumentCreateInput) -> DocumentType:
         # Mock database operation
@@ -413,4 +702,99 @@ class Mutation:
         )
 
 
-schema = strawberry.Schema(query=Query, mutation=Mutation)
+@strawberry.type
+class Subscription:
+    @strawberry.subscription(name="sendMessageStream")
+    async def send_message_stream(
+        self, input: MessageInput
+    ) -> AsyncGenerator[MessageStreamEvent, None]:
+        """Send a message and stream the AI reply as it is generated.
+
+        The agent message is saved once the stream ends; no database session
+        is held open while tokens arrive.
+        """
+        if input.type not in ["user", "agent"]:
+            raise ValueError(
+                f"Invalid message type: {input.type}. Must be either 'user' or 'agent'"
+            )
+
+        attachments_data = serialize_attachments(input.attachments)
+
+        async with AsyncSessionLocal() as session:
+            message = Message(
+                conversation_id=input.conversation_id,
+                type=input.type,
+                content=input.content,
+                attachments=attachments_data,
+            )
+            session.add(message)
+
+            conversation = await session.get(Conversation, input.conversation_id)
+            if conversation:
+                conversation_service.record_message(conversation, message)
+
+            await session.commit()
+            invalidate_conversation(input.conversation_id)
+            await session.refresh(message)
+
+            if input.type == "user":
+                history_result = await session.execute(
+                    context_summary_service.unsummarized_messages(
+                        input.conversation_id, conversation
+                    )
+                )
+                conversation_history = list(history_result.scalars().all())
+                summary = conversation.context_summary if conversation else None
+
+        # Events are only yielded once the session is closed: a slow subscriber
+        # must not keep a connection checked out
+        if input.type != "user":
+            yield MessageStreamEvent(message=build_message_gql(message), done=True)
+            return
+
+        yield MessageStreamEvent(message=build_message_gql(message))
+
+        parts = []
+        stats = LLMCallStats()
+        reply = llm_service.stream_response(
+            user_message=input.content,
+            conversation_history=conversation_history[:-1],  # Exclude current message
+            attachments=attachments_data,
+            summary=summary,
+            stats=stats,
+        )
+        try:
+            async for delta in reply:
+                parts.append(delta)
+                yield MessageStreamEvent(delta=delta)
+        except (asyncio.CancelledError, GeneratorExit):
+            # The subscriber went away: stop generating. What they already saw
+            # is kept, so the history matches their screen; if nothing was
+            # streamed yet, no agent message is saved
+            await reply.aclose()
+            partial = "".join(parts).strip()
+            cancelled_generations.inc(
+                operation="sendMessageStream", persisted=str(bool(partial)).lower()
+            )
+            if partial:
+                await run_to_completion(
+                    store_streamed_reply(input.conversation_id, partial, stats)
+                )
+            raise
+
+        ai_message = await store_streamed_reply(
+            input.conversation_id, "".join(parts).strip(), stats
+        )
+        yield MessageStreamEvent(message=build_message_gql(ai_message), done=True)
+
+
+schema = strawberry.Schema(
+    query=Query,
+    mutation=Mutation,
+    subscription=Subscription,
+    # Hot operations reuse their parsed document and validation result
+    extensions=[
+        ParserCache(maxsize=settings.GRAPHQL_DOCUMENT_CACHE_SIZE),
+        ValidationCache(maxsize=settings.GRAPHQL_DOCUMENT_CACHE_SIZE),
+    ],
+)
@@ -0,0 +1,231 @@
+import asyncio
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from app.core.metrics import counter, gauge
+
+
+def estimate_size(obj: Any, _seen: Optional[Set[int]] = None) -> int:
+    """Rough deep size in bytes of plain data, dataclasses and ORM-free objects."""
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, int, float, bool)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        return size + sum(
+            estimate_size(key, seen) + estimate_size(value, seen)
+            for key, value in obj.items()
+        )
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return size + sum(estimate_size(item, seen) for item in obj)
+    if hasattr(obj, "__dict__"):
+        return size + estimate_size(vars(obj), seen)
+    return size
+
+
+@dataclass
+class _Entry:
+    value: Any
+    size: int
+    expires_at: float
+    tags: frozenset
+
+
+class LRUCache:
+    """In-process LRU cache bounded by entry count, total bytes and TTL.
+
+    Entries can carry tags so that every entry derived from the same source
+    (e.g. one conversation) is invalidated together. Readers take
+    `version(tags)` before loading and pass it to `set`, so a value read before
+    a concurrent invalidation is never stored. Hits, misses and evictions are
+    exported as `<name>_cache_*` metrics.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int,
+        max_bytes: int,
+        ttl_seconds: float,
+        sizeof: Callable[[Any], int] = estimate_size,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._sizeof = sizeof
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._keys_by_tag: Dict[Hashable, Set[Hashable]] = {}
+        self._tag_versions: Dict[Hashable, int] = {}
+        self.total_bytes = 0
+
+        self.hits = counter(f"{name}_cache_hits_total", f"{name} cache hits")
+        self.misses = counter(f"{name}_cache_misses_total", f"{name} cache misses")
+        self.evictions = counter(
+            f"{name}_cache_evictions_total",
+            f"{name} cache entries dropped for size, expiry or invalidation",
+            labelnames=("reason",),
+        )
+        gauge(
+            f"{name}_cache_entries",
+            f"{name} cache entries",
+            callback=lambda: len(self._entries),
+        )
+        gauge(
+            f"{name}_cache_bytes",
+            f"Estimated bytes held by the {name} cache",
+            callback=lambda: self.total_bytes,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses.inc()
+            return None
+
+        if entry.expires_at <= self._clock():
+            self._remove(key, reason="expired")
+            self.misses.inc()
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits.inc()
+        return entry.value
+
+    def version(self, tags: Iterable[Hashable]) -> Tuple[int, ...]:
+        return tuple(self._tag_versions.get(tag, 0) for tag in tags)
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        tags: Iterable[Hashable] = (),
+        version: Optional[Tuple[int, ...]] = None,
+    ) -> None:
+        tags = tuple(tags)
+        if not self.enabled:
+            return
+        if version is not None and version != self.version(tags):
+            # A write invalidated these tags while the value was being built
+            return
+
+        size = self._sizeof(value)
+        if size > self.max_bytes:
+            # Never let one oversized value flush the whole cache
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        entry = _Entry(value, size, self._clock() + self.ttl_seconds, frozenset(tags))
+        self._entries[key] = entry
+        self.total_bytes += size
+        for tag in entry.tags:
+            self._keys_by_tag.setdefault(tag, set()).add(key)
+
+        while (
+            len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes
+        ):
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key, reason="capacity")
+
+    def invalidate(self, tag: Hashable) -> int:
+        """Drop every entry carrying the tag; returns how many were dropped."""
+        self._tag_versions[tag] = self._tag_versions.get(tag, 0) + 1
+        keys = self._keys_by_tag.pop(tag, set())
+        for key in keys:
+            self._remove(key, reason="invalidated")
+        return len(keys)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._keys_by_tag.clear()
+        self.total_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: Hashable, reason: Optional[str] = None) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+
+        self.total_bytes -= entry.size
+        for tag in entry.tags:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+        if reason:
+            self.evictions.inc(reason=reason)
+
+
+@dataclass
+class _Flight:
+    task: asyncio.Task
+    waiters: int = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one in-flight call.
+
+    Callers arriving while a call for their key is running wait for its result
+    instead of starting their own. The call is cancelled only once every
+    waiter has gone. Joined calls are exported as `<name>_coalesced_total`.
+    """
+
+    def __init__(self, name: str):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.coalesced = counter(
+            f"{name}_coalesced_total",
+            f"{name} calls that joined an identical call already in flight",
+        )
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(call()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        else:
+            self.coalesced.inc()
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1:
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
@@ -1,4 +1,5 @@
 import os
+from typing import Dict, List
 
 from pydantic import ConfigDict
 from pydantic_settings import BaseSettings
@@ -18,10 +19,95 @@ class Settings(BaseSettings):
     LITELLM_TEMPERATURE: float = 0.7
     LITELLM_TIMEOUT: int = 60
 
+    # Provider protection: concurrent calls, per-minute limits (0 disables),
+    # retries with exponential backoff on 429/5xx, and a circuit breaker that
+    # fails fast for LLM_CIRCUIT_RESET_SECONDS after consecutive failures
+    LLM_MAX_CONCURRENT_REQUESTS: int = 8
+    LLM_REQUESTS_PER_MINUTE: int = 0
+    LLM_TOKENS_PER_MINUTE: int = 0
+    LLM_QUEUE_TIMEOUT: float = 30
+    LLM_MAX_RETRIES: int = 2
+    LLM_BACKOFF_BASE_SECONDS: float = 0.5
+    LLM_BACKOFF_MAX_SECONDS: float = 20
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    LLM_CIRCUIT_RESET_SECONDS: float = 30
+
+    # Opt-in exact-match cache of non-streamed LLM responses, keyed by model,
+    # parameters and messages. Off by default: at a non-zero temperature it
+    # would serve one sampled reply to every identical prompt, e.g. when a
+    # user regenerates. A TTL or entry limit of 0 disables it
+    LLM_RESPONSE_CACHE_MAX_ENTRIES: int = 0
+    LLM_RESPONSE_CACHE_MAX_BYTES: int = 32 * 1024 * 1024  # 32MB
+    LLM_RESPONSE_CACHE_TTL: int = 300  # seconds
+
+    # Endpoint routing: JSON lists of {"model", "base_url", "api_key"} that can
+    # serve the same requests (empty uses the LITELLM_* endpoint). Calls go to
+    # the endpoint with the lowest moving-average latency; with
+    # LLM_HEDGE_REQUESTS a call slower than the observed p95 (at least
+    # LLM_HEDGE_MIN_DELAY_SECONDS) is duplicated on the next-best endpoint.
+    # An endpoint left unsampled for LLM_ENDPOINT_PROBE_SECONDS (0 disables)
+    # gets the next call, so one that failed can win its traffic back.
+    # Titles use LLM_TITLE_ENDPOINTS when set, e.g. a cheaper, faster model
+    LLM_ENDPOINTS: List[Dict[str, str]] = []
+    LLM_TITLE_ENDPOINTS: List[Dict[str, str]] = []
+    LLM_LATENCY_EWMA_ALPHA: float = 0.2
+    LLM_HEDGE_REQUESTS: bool = False
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+    LLM_HEDGE_MIN_DELAY_SECONDS: float = 1.0
+    LLM_ENDPOINT_PROBE_SECONDS: float = 30
+
+    # Keep each agent message's LLM latency, token usage and estimated cost on
+    # messages.generation_stats (they are always exported as llm_* metrics)
+    LLM_STORE_CALL_STATS: bool = True
+
     # System prompt for the AI assistant
     # SYSTEM_PROMPT: str = """You are a helpful AI assistant specialized in financial analysis and document review. You help users analyze financial documents, investment risks, and market considerations. Provide clear, concise, and professional responses based on the context provided."""
     SYSTEM_PROMPT: str = """You are a helpful AI assistant. Provide clear, concise, and professional responses based on the context provided."""
 
+    # Prompt size: history is added newest-first until the budget is spent.
+    # LLM_TOKENIZER is a tiktoken encoding, or "approximate" for the offline estimate
+    LLM_CONTEXT_TOKEN_BUDGET: int = 6000
+    LLM_TOKENIZER: str = "cl100k_base"
+
+    # Rolling context summaries: turns older than the newest
+    # CONVERSATION_SUMMARY_RECENT_TOKENS are folded into a running summary once
+    # at least CONVERSATION_SUMMARY_MIN_TOKENS of them have piled up
+    CONVERSATION_SUMMARY_RECENT_TOKENS: int = 3000
+    CONVERSATION_SUMMARY_MIN_TOKENS: int = 1000
+    CONVERSATION_SUMMARY_MAX_TOKENS: int = 400
+
+    # Asynchronous agent replies (sendMessageAsync): at most GENERATION_WORKERS
+    # replies are generated at once; a job is given up after
+    # GENERATION_MAX_ATTEMPTS starts, e.g. when it keeps crashing the process
+    GENERATION_WORKERS: int = 4
+    GENERATION_MAX_ATTEMPTS: int = 3
+
+    # Response cache for getConversation (a TTL or entry limit of 0 disables it)
+    CONVERSATION_CACHE_MAX_ENTRIES: int = 1000
+    CONVERSATION_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # 64MB
+    CONVERSATION_CACHE_TTL: int = 300  # seconds
+
+    # Extracted file content reused across prompts (a TTL or entry limit of 0 disables it)
+    FILE_CONTENT_CACHE_MAX_ENTRIES: int = 500
+    FILE_CONTENT_CACHE_MAX_BYTES: int = 128 * 1024 * 1024  # 128MB
+    FILE_CONTENT_CACHE_TTL: int = 3600  # seconds
+
+    # Image attachments go to the model as image content parts, downscaled to
+    # fit LLM_IMAGE_MAX_DIMENSION pixels and recompressed as JPEG. Derivatives
+    # are cached by file hash. Turn LLM_IMAGE_INPUT off for models without vision
+    LLM_IMAGE_INPUT: bool = True
+    LLM_IMAGE_MAX_DIMENSION: int = 1024
+    LLM_IMAGE_JPEG_QUALITY: int = 85
+    IMAGE_CACHE_MAX_ENTRIES: int = 200
+    IMAGE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # 64MB
+    IMAGE_CACHE_TTL: int = 3600  # seconds
+
+    # GraphQL documents: parsed/validated LRU size and the persisted query registry
+    GRAPHQL_DOCUMENT_CACHE_SIZE: int = 256
+    PERSISTED_QUERY_MAX_ENTRIES: int = 1000
+    PERSISTED_QUERY_MAX_BYTES: int = 8 * 1024 * 1024  # 8MB
+    PERSISTED_QUERY_TTL: int = 24 * 60 * 60  # seconds
+
     # File Upload Configuration
     UPLOAD_DIR: str = "uploads"
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
@@ -45,6 +131,20 @@ class Settings(BaseSettings):
         ".docx",
     ]
     MAX_FILES_PER_MESSAGE: int = 5
+    # Uploads are read UPLOAD_CHUNK_SIZE bytes at a time and sent to S3 in
+    # parts of UPLOAD_PART_SIZE (S3 requires at least 5MB), so each upload holds
+    # about two parts in memory whatever the file size
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # 1MB
+    UPLOAD_PART_SIZE: int = 8 * 1024 * 1024  # 8MB
+    # Files of one upload request streamed and extracted at the same time
+    UPLOAD_CONCURRENCY: int = 4
+    # Text of PDF, Word and JSON uploads is extracted in a pool of
+    # EXTRACTION_WORKERS processes (0 uses a thread, without the limits below).
+    # A job is stopped after EXTRACTION_TIMEOUT seconds, and a worker fails
+    # jobs that grow it past EXTRACTION_MEMORY_LIMIT_MB (0 disables either)
+    EXTRACTION_WORKERS: int = 2
+    EXTRACTION_TIMEOUT: float = 30
+    EXTRACTION_MEMORY_LIMIT_MB: int = 1024
 
     # AWS S3 Configuration
     AWS_REGION: str = os.getenv("AWS_REGION", "us-east-1")
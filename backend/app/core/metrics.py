@@ -0,0 +1,187 @@
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+LabelValues = Tuple[str, ...]
+
+
+class Metric:
+    """Base class for in-process metrics rendered in Prometheus text format."""
+
+    type = "untyped"
+
+    def __init__(self, name: str, description: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+
+    def _label_values(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"Metric {self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, values: LabelValues, extra: str = "") -> str:
+        pairs = [f'{name}="{value}"' for name, value in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.type}",
+            *self.samples(),
+        ]
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, description: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, description, labelnames)
+        self._values: Dict[LabelValues, float] = defaultdict(float)
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        self._values[self._label_values(labels)] += amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._label_values(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{self._format_labels(values)} {value}"
+            for values, value in self._values.items()
+        ]
+
+
+class Gauge(Metric):
+    """A value that can go up and down, or is read from a callback on render."""
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: Iterable[str] = (),
+        callback: Optional[Callable[[], float]] = None,
+    ):
+        super().__init__(name, description, labelnames)
+        self._values: Dict[LabelValues, float] = defaultdict(float)
+        self._callback = callback
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._label_values(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        self._values[self._label_values(labels)] += amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self._values[self._label_values(labels)] -= amount
+
+    def value(self, **labels: str) -> float:
+        if self._callback:
+            return self._callback()
+        return self._values.get(self._label_values(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        if self._callback:
+            return [f"{self.name} {self._callback()}"]
+        return [
+            f"{self.name}{self._format_labels(values)} {value}"
+            for values, value in self._values.items()
+        ]
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, plus their sum and count."""
+
+    type = "histogram"
+
+    DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = defaultdict(float)
+
+    def observe(self, value: float, **labels: str) -> None:
+        values = self._label_values(labels)
+        counts = self._counts.setdefault(values, [0] * (len(self.buckets) + 1))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        counts[-1] += 1
+        self._sums[values] += value
+
+    def count(self, **labels: str) -> int:
+        counts = self._counts.get(self._label_values(labels))
+        return counts[-1] if counts else 0
+
+    def sum(self, **labels: str) -> float:
+        return self._sums.get(self._label_values(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        lines = []
+        for values, counts in self._counts.items():
+            bounds = [*(str(bound) for bound in self.buckets), "+Inf"]
+            for bound, count in zip(bounds, counts):
+                labels = self._format_labels(values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = self._format_labels(values)
+            lines.append(f"{self.name}_sum{labels} {self._sums[values]}")
+            lines.append(f"{self.name}_count{labels} {counts[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        """Register a metric, returning the existing one if the name is taken."""
+        return self._metrics.setdefault(metric.name, metric)
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+# Global registry
+metrics_registry = MetricsRegistry()
+
+
+def counter(name: str, description: str, labelnames: Iterable[str] = ()) -> Counter:
+    return metrics_registry.register(Counter(name, description, labelnames))
+
+
+def histogram(
+    name: str,
+    description: str,
+    labelnames: Iterable[str] = (),
+    buckets: Iterable[float] = Histogram.DEFAULT_BUCKETS,
+) -> Histogram:
+    return metrics_registry.register(Histogram(name, description, labelnames, buckets))
+
+
+def gauge(
+    name: str,
+    description: str,
+    labelnames: Iterable[str] = (),
+    callback: Optional[Callable[[], float]] = None,
+) -> Gauge:
+    return metrics_registry.register(Gauge(name, description, labelnames, callback))
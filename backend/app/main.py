@@ -1,15 +1,23 @@
+import asyncio
 import os
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from strawberry.fastapi import GraphQLRouter
 
+from app.api.dataloaders import get_context
+from app.api.disconnect import wait_for_pending
+from app.api.persisted_queries import PersistedQueryRouter
 from app.api.routes.files import router as files_router
+from app.api.routes.metrics import router as metrics_router
 from app.api.routes.upload import router as upload_router
 from app.api.schema import schema
 from app.core.config import settings
 from app.core.database import init_db
+from app.services.content_extraction import content_extraction_service
+from app.services.context_summary_service import context_summary_service
+from app.services.generation_service import generation_service
+from app.services.tokenizer import load_tokenizer
 
 
 @asynccontextmanager
@@ -17,7 +25,16 @@ async def lifespan(app):
     await init_db()
     # Ensure upload directory exists
     os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    # The tokenizer may download its vocabulary; keep that off the event loop
+    await asyncio.to_thread(load_tokenizer)
+    # Also picks up replies left unfinished by the previous process
+    await generation_service.start()
     yield
+    await generation_service.stop()
+    # Partial replies of streams cut off by the shutdown
+    await wait_for_pending()
+    await context_summary_service.stop()
+    content_extraction_service.shutdown()
 
 
 app = FastAPI(title=settings.APP_NAME, debug=settings.DEBUG, lifespan=lifespan)
@@ -34,9 +51,10 @@ app.add_middleware(
 # Include API routes
 app.include_router(upload_router, prefix="/api", tags=["upload"])
 app.include_router(files_router, prefix="/api", tags=["files"])
+app.include_router(metrics_router, tags=["metrics"])
 
 # GraphQL endpoint
-graphql_app = GraphQLRouter(schema)
+graphql_app = PersistedQueryRouter(schema, context_getter=get_context)
 app.include_router(graphql_app, prefix="/graphql")
 
 # Note: We no longer need static file serving since files are served from database
@@ -1,5 +1,5 @@
-from app.models.chat import Conversation, Message
-from app.models.file import StoredFile
+from app.models.chat import Conversation, GenerationJob, Message
+from app.models.file import FileDerivative, StoredFile
 
 # Make sure all models are imported for Alembic
-__all__ = ["Conversation", "Message", "StoredFile"]
+__all__ = ["Conversation", "FileDerivative", "GenerationJob", "Message", "StoredFile"]
@@ -2,7 +2,16 @@ from datetime import datetime
 from enum import Enum
 from typing import Optional
 
-from sqlalchemy import JSON, Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import (
+    JSON,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+)
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -13,6 +22,13 @@ class MessageType(str, Enum):
     AGENT = "agent"
 
 
+class GenerationStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
 class AttachmentType(str, Enum):
     TEXT = "text"
     IMAGE = "image"
@@ -20,6 +36,10 @@ class AttachmentType(str, Enum):
     DOCUMENT = "document"
 
 
+# Characters of the latest message kept on the conversation row
+PREVIEW_LENGTH = 200
+
+
 class Conversation(Base):
     __tablename__ = "conversations"
 
@@ -28,6 +48,22 @@ class Conversation(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Denormalized summary for the sidebar, maintained on every message write
+    message_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_message_preview = Column(String(PREVIEW_LENGTH), nullable=True)
+    last_message_at = Column(DateTime, nullable=True)
+
+    # Rolling LLM summary of the older turns, covering every message up to and
+    # including (context_summary_through_at, context_summary_through_id)
+    context_summary = Column(Text, nullable=True)
+    context_summary_through_at = Column(DateTime, nullable=True)
+    context_summary_through_id = Column(Integer, nullable=True)
+
+    # Serves the sidebar's newest-first keyset pagination
+    __table_args__ = (
+        Index("ix_conversations_updated_at_id", updated_at.desc(), id.desc()),
+    )
+
     # Relationship to messages
     messages = relationship(
         "Message", back_populates="conversation", cascade="all, delete-orphan"
@@ -43,11 +79,46 @@ class Message(Base):
     content = Column(Text, nullable=False)
     attachments = Column(JSON, nullable=True)  # JSON array of attachment objects
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Latency, token usage and cost of the LLM call behind an agent message
+    generation_stats = Column(JSON, nullable=True)
+
+    # Serves per-conversation history in (created_at, id) order, both directions
+    __table_args__ = (
+        Index(
+            "ix_messages_conversation_id_created_at_id",
+            conversation_id,
+            created_at,
+            id,
+        ),
+    )
 
     # Relationship to conversation
     conversation = relationship("Conversation", back_populates="messages")
 
 
+class GenerationJob(Base):
+    """A queued agent reply to one user message.
+
+    Rows outlive the process that created them, so replies that were pending
+    or running at shutdown are picked up again on the next start.
+    """
+
+    __tablename__ = "generation_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    conversation_id = Column(Integer, ForeignKey("conversations.id"), nullable=False)
+    user_message_id = Column(Integer, ForeignKey("messages.id"), nullable=False)
+    agent_message_id = Column(Integer, ForeignKey("messages.id"), nullable=True)
+    status = Column(String(10), nullable=False, default=GenerationStatus.PENDING.value)
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Serves the re-queue scan of unfinished jobs at startup
+    __table_args__ = (Index("ix_generation_jobs_status_id", status, id),)
+
+
 class Attachment:
     """
     Structure for attachment data stored in JSON format:
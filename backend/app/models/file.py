@@ -15,9 +15,27 @@ class StoredFile(Base):
     s3_key = Column(String(512), nullable=False)  # S3 object key
     file_hash = Column(String(64), nullable=True, index=True)  # For deduplication
     extracted_text = Column(Text, nullable=True)  # Extracted text content for LLM
-    file_metadata = Column(Text, nullable=True)  # JSON metadata (renamed from metadata)
+    # Small JSON metadata (renamed from metadata); large artifacts are FileDerivatives
+    file_metadata = Column(Text, nullable=True)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
     def __repr__(self):
         return f"<StoredFile(id={self.id}, filename='{self.filename}', size={self.file_size})>"
+
+
+class FileDerivative(Base):
+    """A large artifact derived from a file's bytes, such as a downscaled image.
+
+    The bytes are in S3 under key, "<s3_key>.derivative/<kind>" of the original.
+    """
+
+    __tablename__ = "file_derivatives"
+
+    key = Column(String(1024), primary_key=True)
+    kind = Column(String(255), nullable=False)
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=func.now())
+
+    def __repr__(self):
+        return f"<FileDerivative(key='{self.key}', size={self.size})>"
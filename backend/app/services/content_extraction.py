@@ -1,39 +1,79 @@
-import base64
+import asyncio
+import codecs
+import functools
+import io
 import logging
-from typing import Dict, Optional, Tuple
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import BinaryIO, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import counter, histogram
+from app.services.extraction_worker import ExtractionTimeout, init_worker, run_job
+from app.services.image_service import image_size
 
 logger = logging.getLogger(__name__)
 
+# Types extracted in the worker pool: (metrics kind, text stored on failure)
+WORKER_KINDS = {
+    "application/pdf": ("pdf", "[PDF: Could not process PDF file]"),
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": (
+        "word",
+        "[WORD: Could not process Word document]",
+    ),
+    "application/msword": ("word", "[WORD: Could not process Word document]"),
+    "application/json": ("json", "[JSON: Could not process JSON file]"),
+}
+
+extraction_duration = histogram(
+    "content_extraction_seconds",
+    "Seconds to extract text from an upload in the worker pool, by kind",
+    labelnames=("kind",),
+)
+extractions = counter(
+    "content_extractions_total",
+    "Worker pool extractions by kind and outcome: ok, error, timeout, "
+    "memory_limit or crashed",
+    labelnames=("kind", "outcome"),
+)
+
+# Seconds past twice the job timeout before the caller gives up on a worker
+BACKSTOP_GRACE = 5
+
 
 class ContentExtractionService:
     """Service to extract content from various file types for LLM processing."""
 
     def __init__(self):
         self.max_text_length = 10000  # Limit text length to avoid token limits
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # One per worker, so a job is only submitted once a worker is free
+        self._slots: Optional[asyncio.Semaphore] = None
 
     async def extract_content(
-        self, file_data: bytes, content_type: str, filename: str
+        self, file_obj: BinaryIO, content_type: str, filename: str
     ) -> Tuple[Optional[str], Dict]:
         """
-        Extract content from file data based on content type.
+        Extract content from a seekable file object based on content type.
+
+        Files are read only as far as each format needs, so large uploads are
+        never loaded whole just to keep their first max_text_length characters.
 
         Returns:
             Tuple of (extracted_text, metadata)
         """
         try:
             if content_type.startswith("image/"):
-                return await self._extract_image_content(file_data, content_type)
+                return await self._extract_image_content(file_obj, content_type)
             elif content_type == "text/plain":
-                return await self._extract_text_content(file_data)
-            elif content_type == "application/pdf":
-                return await self._extract_pdf_content(file_data)
-            elif content_type in [
-                "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                "application/msword",
-            ]:
-                return await self._extract_word_content(file_data, content_type)
-            elif content_type == "application/json":
-                return await self._extract_json_content(file_data)
+                return await self._extract_text_content(file_obj)
+            elif content_type in WORKER_KINDS:
+                return await self._extract_in_worker(file_obj, content_type)
             else:
                 # For unsupported types, just return basic info
                 return None, {"type": "unsupported", "content_type": content_type}
@@ -43,23 +83,24 @@ class ContentExtractionService:
             return None, {"error": str(e)}
 
     async def _extract_image_content(
-        self, file_data: bytes, content_type: str
+        self, file_obj: BinaryIO, content_type: str
     ) -> Tuple[str, Dict]:
-        """Extract image content as base64 for vision models."""
+        """Describe an image; the pixels reach vision models via image_service."""
         try:
-            # Convert to base64 for LLM vision models
-            base64_image = base64.b64encode(file_data).decode("utf-8")
-
-            # Create a description that can be sent to vision-capable models
+            size = file_obj.seek(0, io.SEEK_END)
+            file_obj.seek(0)
+            width, height, image_format = image_size(file_obj)
             image_description = (
-                f"[IMAGE: Base64 encoded {content_type} image - {len(file_data)} bytes]"
+                f"[IMAGE: {content_type} image, {width}x{height} pixels]"
             )
 
             metadata = {
                 "type": "image",
-                "base64_data": base64_image,
                 "content_type": content_type,
-                "size": len(file_data),
+                "format": image_format,
+                "width": width,
+                "height": height,
+                "size": size,
             }
 
             return image_description, metadata
@@ -68,15 +109,22 @@ class ContentExtractionService:
             logger.error(f"Error processing image: {str(e)}")
             return "[IMAGE: Could not process image]", {"error": str(e)}
 
-    async def _extract_text_content(self, file_data: bytes) -> Tuple[str, Dict]:
+    async def _extract_text_content(self, file_obj: BinaryIO) -> Tuple[str, Dict]:
         """Extract text from plain text files."""
         try:
+            # No encoding needs more than 4 bytes per character
+            file_data = file_obj.read(self.max_text_length * 4)
+            truncated = bool(file_obj.read(1))
+
             # Try different encodings
             for encoding in ["utf-8", "utf-16", "latin-1"]:
                 try:
-                    text = file_data.decode(encoding)
+                    # A character cut off at the end of the read is not an error
+                    text = codecs.getincrementaldecoder(encoding)().decode(
+                        file_data, final=not truncated
+                    )
                     # Limit text length
-                    if len(text) > self.max_text_length:
+                    if truncated or len(text) > self.max_text_length:
                         text = text[: self.max_text_length] + "... [truncated]"
 
                     return text, {
@@ -94,118 +142,127 @@ class ContentExtractionService:
             logger.error(f"Error extracting text: {str(e)}")
             return "[TEXT: Could not process text file]", {"error": str(e)}
 
-    async def _extract_pdf_content(self, file_data: bytes) -> Tuple[str, Dict]:
-        """Extract text from PDF files."""
-        try:
-            # Try to import PyPDF2 or pdfplumber
-            try:
-                import io
-
-                import PyPDF2
-
-                pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_data))
-                text_content = []
-
-                for page_num, page in enumerate(pdf_reader.pages):
-                    try:
-                        text = page.extract_text()
-                        if text.strip():
-                            text_content.append(f"Page {page_num + 1}:\n{text}")
-                    except Exception as e:
-                        text_content.append(
-                            f"Page {page_num + 1}: [Could not extract text: {str(e)}]"
-                        )
-
-                full_text = "\n\n".join(text_content)
-
-                # Limit text length
-                if len(full_text) > self.max_text_length:
-                    full_text = full_text[: self.max_text_length] + "... [truncated]"
-
-                return full_text, {
-                    "type": "pdf",
-                    "page_count": len(pdf_reader.pages),
-                    "text_length": len(full_text),
-                    "word_count": len(full_text.split()),
-                }
-
-            except ImportError:
-                return (
-                    "[PDF: PyPDF2 not installed - install with: pip install PyPDF2]",
-                    {"error": "missing_dependency"},
-                )
-
-        except Exception as e:
-            logger.error(f"Error extracting PDF: {str(e)}")
-            return "[PDF: Could not process PDF file]", {"error": str(e)}
-
-    async def _extract_word_content(
-        self, file_data: bytes, content_type: str
-    ) -> Tuple[str, Dict]:
-        """Extract text from Word documents."""
-        try:
-            # Try to import python-docx
-            try:
-                import io
-
-                from docx import Document
-
-                doc = Document(io.BytesIO(file_data))
-                text_content = []
-
-                for paragraph in doc.paragraphs:
-                    if paragraph.text.strip():
-                        text_content.append(paragraph.text)
-
-                full_text = "\n".join(text_content)
-
-                # Limit text length
-                if len(full_text) > self.max_text_length:
-                    full_text = full_text[: self.max_text_length] + "... [truncated]"
-
-                return full_text, {
-                    "type": "word_document",
-                    "paragraph_count": len(doc.paragraphs),
-                    "text_length": len(full_text),
-                    "word_count": len(full_text.split()),
-                }
-
-            except ImportError:
-                return (
-                    "[WORD: python-docx not installed - install with: pip install python-docx]",
-                    {"error": "missing_dependency"},
-                )
-
-        except Exception as e:
-            logger.error(f"Error extracting Word content: {str(e)}")
-            return "[WORD: Could not process Word document]", {"error": str(e)}
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=settings.EXTRACTION_WORKERS,
+                # Forking would copy the event loop and its threads' locks
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker,
+                initargs=(settings.EXTRACTION_MEMORY_LIMIT_MB * 1024 * 1024,),
+            )
+        return self._pool
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(settings.EXTRACTION_WORKERS)
+        return self._slots
+
+    def shutdown(self) -> None:
+        """Stop the worker processes; a later extraction starts new ones."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        self._slots = None
+
+    def _retire_pool(self, pool: ProcessPoolExecutor) -> None:
+        """Send new jobs to a fresh pool; jobs running in the old one finish."""
+        if self._pool is pool:
+            self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self, job: functools.partial) -> Tuple[Optional[str], Dict]:
+        """Run job in the worker pool, or a thread if it has no workers.
+
+        Jobs wait for a free worker before they are submitted, so the backstop
+        only counts time spent running. A pool breaks when one of its workers
+        dies: a job that had outlived its timeout by then was killed by its
+        own watchdog; any other is run once more in a fresh pool.
+        """
+        # Workers time out on their own; this only catches one that cannot
+        backstop = (
+            2 * settings.EXTRACTION_TIMEOUT + BACKSTOP_GRACE
+            if settings.EXTRACTION_TIMEOUT
+            else None
+        )
+        if not settings.EXTRACTION_WORKERS:
+            return await asyncio.wait_for(asyncio.to_thread(job), backstop)
+
+        async with self._get_slots():
+            for attempt in range(2):
+                pool = self._get_pool()
+                started = time.perf_counter()
+                try:
+                    return await asyncio.wait_for(
+                        asyncio.get_running_loop().run_in_executor(pool, job),
+                        backstop,
+                    )
+                except asyncio.TimeoutError:
+                    self._retire_pool(pool)
+                    raise
+                except BrokenProcessPool:
+                    self._retire_pool(pool)
+                    ran = time.perf_counter() - started
+                    if settings.EXTRACTION_TIMEOUT and (
+                        ran >= settings.EXTRACTION_TIMEOUT
+                    ):
+                        raise ExtractionTimeout()
+                    if attempt:
+                        raise
+
+    async def _extract_in_worker(
+        self, file_obj: BinaryIO, content_type: str
+    ) -> Tuple[Optional[str], Dict]:
+        """Run a CPU-heavy extraction in the worker pool, off the event loop.
 
-    async def _extract_json_content(self, file_data: bytes) -> Tuple[str, Dict]:
-        """Extract and format JSON content."""
+        The file is copied to a temporary file that the worker reads, so it
+        is never held in memory. A worker killed by its limits is replaced.
+        """
+        kind, failure_text = WORKER_KINDS[content_type]
+        started = time.perf_counter()
+        outcome = "ok"
+        path = await asyncio.to_thread(_spill, file_obj)
         try:
-            import json
-
-            text = file_data.decode("utf-8")
-            json_data = json.loads(text)
-
-            # Pretty format the JSON for better readability
-            formatted_json = json.dumps(json_data, indent=2)
-
-            # Limit text length
-            if len(formatted_json) > self.max_text_length:
-                formatted_json = (
-                    formatted_json[: self.max_text_length] + "... [truncated]"
+            return await self._run(
+                functools.partial(
+                    run_job,
+                    path,
+                    content_type,
+                    self.max_text_length,
+                    settings.EXTRACTION_TIMEOUT,
                 )
+            )
 
-            return formatted_json, {
-                "type": "json",
-                "text_length": len(formatted_json),
-                "is_valid_json": True,
-            }
-
+        except (ExtractionTimeout, asyncio.TimeoutError):
+            outcome = "timeout"
+            logger.warning(
+                f"{kind} extraction timed out after {settings.EXTRACTION_TIMEOUT}s"
+            )
+            return failure_text, {"error": "extraction_timeout"}
+        except MemoryError:
+            outcome = "memory_limit"
+            logger.warning(
+                f"{kind} extraction exceeded {settings.EXTRACTION_MEMORY_LIMIT_MB}MB"
+            )
+            return failure_text, {"error": "extraction_memory_limit"}
+        except BrokenProcessPool:
+            outcome = "crashed"
+            logger.error(f"{kind} extraction worker died")
+            return failure_text, {"error": "extraction_crashed"}
         except Exception as e:
-            logger.error(f"Error extracting JSON: {str(e)}")
-            return "[JSON: Could not process JSON file]", {"error": str(e)}
+            outcome = "error"
+            logger.error(f"Error extracting {kind} content: {str(e)}")
+            return failure_text, {"error": str(e)}
+        finally:
+            os.unlink(path)
+            extraction_duration.observe(time.perf_counter() - started, kind=kind)
+            extractions.inc(kind=kind, outcome=outcome)
+
+
+def _spill(file_obj: BinaryIO) -> str:
+    with tempfile.NamedTemporaryFile(prefix="extract-", delete=False) as spilled:
+        shutil.copyfileobj(file_obj, spilled, settings.UPLOAD_CHUNK_SIZE)
+    return spilled.name
 
 
 # Global instance
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import select, tuple_, update
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.chat import Conversation, Message
+from app.services.llm_service import llm_service
+from app.services.tokenizer import count_message_tokens
+
+logger = logging.getLogger(__name__)
+
+
+def _text_tokens(messages: List[Message]) -> int:
+    return sum(count_message_tokens({"content": msg.content}) for msg in messages)
+
+
+class ContextSummaryService:
+    """Keeps a rolling LLM summary of each conversation's older turns.
+
+    Prompts send the summary plus the messages after it instead of the whole
+    history, so their size stays bounded however long a conversation grows.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._rerun: Set[int] = set()
+
+    def unsummarized_messages(
+        self, conversation_id: int, conversation: Optional[Conversation] = None
+    ):
+        """Select the messages the summary does not cover yet, oldest first.
+
+        Without the loaded conversation every message is selected.
+        """
+        query = select(Message).where(Message.conversation_id == conversation_id)
+        if conversation and conversation.context_summary_through_id is not None:
+            query = query.where(
+                tuple_(Message.created_at, Message.id)
+                > tuple_(
+                    conversation.context_summary_through_at,
+                    conversation.context_summary_through_id,
+                )
+            )
+        return query.order_by(Message.created_at, Message.id)
+
+    def schedule(self, conversation_id: int) -> None:
+        """Bring a conversation's summary up to date in the background.
+
+        At most one update runs per conversation; messages arriving meanwhile
+        trigger one more pass once it finishes.
+        """
+        if conversation_id in self._tasks:
+            self._rerun.add(conversation_id)
+            return
+        self._tasks[conversation_id] = asyncio.create_task(self._run(conversation_id))
+
+    async def wait_idle(self) -> None:
+        """Wait for every scheduled update to finish."""
+        while self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def stop(self) -> None:
+        """Cancel pending updates; summaries are rebuilt on the next message."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, conversation_id: int) -> None:
+        try:
+            while True:
+                self._rerun.discard(conversation_id)
+                try:
+                    await self.update_summary(conversation_id)
+                except Exception as e:
+                    logger.error(
+                        f"Error updating summary of conversation {conversation_id}: {str(e)}"
+                    )
+                if conversation_id not in self._rerun:
+                    break
+        finally:
+            self._tasks.pop(conversation_id, None)
+
+    async def update_summary(self, conversation_id: int) -> bool:
+        """Fold aged-out turns into the conversation's summary.
+
+        The newest CONVERSATION_SUMMARY_RECENT_TOKENS of history stay verbatim.
+        Older unsummarized turns are folded in once they add up to at least
+        CONVERSATION_SUMMARY_MIN_TOKENS, so the LLM is called in batches
+        rather than on every message. Returns whether the summary changed.
+        """
+        async with AsyncSessionLocal() as session:
+            conversation = await session.get(Conversation, conversation_id)
+            if not conversation:
+                return False
+            previous_summary = conversation.context_summary
+            previous_through_id = conversation.context_summary_through_id
+
+            result = await session.execute(
+                self.unsummarized_messages(conversation_id, conversation)
+            )
+            messages = list(result.scalars().all())
+
+        # Keep the newest turns that fit the recent budget out of the summary
+        recent_tokens = 0
+        split = len(messages)
+        while split > 0:
+            tokens = count_message_tokens({"content": messages[split - 1].content})
+            if recent_tokens + tokens > settings.CONVERSATION_SUMMARY_RECENT_TOKENS:
+                break
+            recent_tokens += tokens
+            split -= 1
+
+        older = messages[:split]
+        if not older or _text_tokens(older) < settings.CONVERSATION_SUMMARY_MIN_TOKENS:
+            return False
+
+        # No session is held while the LLM works
+        summary = await llm_service.summarize_conversation(previous_summary, older)
+        if not summary:
+            return False
+
+        through = older[-1]
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                update(Conversation)
+                .where(
+                    Conversation.id == conversation_id,
+                    # Skip if another update advanced the summary meanwhile
+                    Conversation.context_summary_through_id.is_not_distinct_from(
+                        previous_through_id
+                    ),
+                )
+                .values(
+                    context_summary=summary,
+                    context_summary_through_at=through.created_at,
+                    context_summary_through_id=through.id,
+                    # Keep the conversation's position in the sidebar
+                    updated_at=Conversation.updated_at,
+                )
+            )
+            await session.commit()
+            return result.rowcount > 0
+
+
+# Global instance
+context_summary_service = ContextSummaryService()
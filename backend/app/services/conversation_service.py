@@ -0,0 +1,69 @@
+from datetime import datetime
+
+from sqlalchemy import desc, func, inspect, select, update
+from sqlalchemy.sql import ClauseElement
+
+from app.core.database import AsyncSessionLocal
+from app.models.chat import PREVIEW_LENGTH, Conversation, Message
+
+
+class ConversationService:
+    """Service for keeping conversation rows in step with their messages."""
+
+    def record_message(self, conversation: Conversation, message: Message) -> None:
+        """Fold a newly added message into the conversation's summary columns.
+
+        Call this in the same session as the message insert so both land in
+        one transaction.
+        """
+        message_time = message.created_at or datetime.utcnow()
+
+        state = inspect(conversation)
+        if state.persistent:
+            # Incremented in SQL, so concurrent sends that loaded the same row
+            # do not overwrite each other's count; builds on an increment
+            # still waiting for the flush
+            count = state.dict.get("message_count")
+            if not isinstance(count, ClauseElement):
+                count = Conversation.message_count
+            conversation.message_count = count + 1
+        else:
+            conversation.message_count = (conversation.message_count or 0) + 1
+        conversation.last_message_preview = message.content[:PREVIEW_LENGTH]
+        conversation.last_message_at = message_time
+        conversation.updated_at = message_time
+
+    async def backfill_summaries(self) -> int:
+        """Recompute every conversation's summary columns from its messages.
+
+        Returns the number of conversations updated.
+        """
+        messages_of_conversation = Message.conversation_id == Conversation.id
+        latest_message = (
+            select(func.substr(Message.content, 1, PREVIEW_LENGTH))
+            .where(messages_of_conversation)
+            .order_by(desc(Message.created_at), desc(Message.id))
+            .limit(1)
+            .scalar_subquery()
+        )
+
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                update(Conversation).values(
+                    message_count=select(func.count(Message.id))
+                    .where(messages_of_conversation)
+                    .scalar_subquery(),
+                    last_message_at=select(func.max(Message.created_at))
+                    .where(messages_of_conversation)
+                    .scalar_subquery(),
+                    last_message_preview=latest_message,
+                    # Keep the existing sort position of every conversation
+                    updated_at=Conversation.updated_at,
+                )
+            )
+            await session.commit()
+            return result.rowcount
+
+
+# Global instance
+conversation_service = ConversationService()
@@ -0,0 +1,81 @@
+import asyncio
+import io
+import logging
+from typing import Optional
+
+from botocore.exceptions import ClientError
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+
+from app.core.database import AsyncSessionLocal
+from app.models.file import FileDerivative
+from app.services.s3_service import s3_service
+
+logger = logging.getLogger(__name__)
+
+
+def derivative_key(s3_key: str, kind: str) -> str:
+    """The S3 key of a derivative, next to the original it was made from."""
+    return f"{s3_key}.derivative/{kind}"
+
+
+class DerivativeStore:
+    """Large artifacts derived from stored files, kept out of file_metadata.
+
+    The bytes live in S3 beside the original; a file_derivatives row records
+    which exist, so a miss needs no S3 request. Derivatives can always be
+    rebuilt from the original, so they are only read when needed.
+    """
+
+    async def get(self, s3_key: str, kind: str) -> Optional[bytes]:
+        key = derivative_key(s3_key, kind)
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(FileDerivative.key).where(FileDerivative.key == key)
+            )
+            if result.scalar_one_or_none() is None:
+                return None
+        try:
+            return await asyncio.to_thread(s3_service.download_file, key)
+        except ClientError as e:
+            logger.warning(f"Could not read derivative {key}: {e}")
+            return None
+
+    async def put(self, s3_key: str, kind: str, data: bytes, content_type: str) -> None:
+        key = derivative_key(s3_key, kind)
+        await asyncio.to_thread(
+            s3_service.put_file, io.BytesIO(data), key, content_type
+        )
+        async with AsyncSessionLocal() as session:
+            session.add(FileDerivative(key=key, kind=kind, size=len(data)))
+            try:
+                await session.commit()
+            except IntegrityError:
+                # Another request stored the same derivative first
+                await session.rollback()
+
+    async def delete_for_file(self, s3_key: str) -> int:
+        """Drop every derivative of the original at s3_key."""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(FileDerivative.key).where(
+                    FileDerivative.key.startswith(
+                        derivative_key(s3_key, ""), autoescape=True
+                    )
+                )
+            )
+            keys = result.scalars().all()
+            if not keys:
+                return 0
+            await asyncio.gather(
+                *(asyncio.to_thread(s3_service.delete_file, key) for key in keys)
+            )
+            await session.execute(
+                delete(FileDerivative).where(FileDerivative.key.in_(keys))
+            )
+            await session.commit()
+            return len(keys)
+
+
+# Global instance
+derivative_store = DerivativeStore()
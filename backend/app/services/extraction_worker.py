@@ -0,0 +1,167 @@
+"""Content extraction jobs that run in worker processes.
+
+Nothing from the app is imported here, so spawning a worker stays cheap.
+Each job is stopped after its timeout, a worker stuck past twice the timeout
+is killed, and the memory limit set when the worker starts turns runaway
+allocations into MemoryError.
+"""
+
+import json
+import os
+import resource
+import signal
+import threading
+from typing import BinaryIO, Dict, Optional, Tuple
+
+
+class ExtractionTimeout(Exception):
+    """An extraction job ran longer than its timeout."""
+
+
+def init_worker(memory_limit_bytes: int) -> None:
+    """Cap the worker's address space; 0 leaves it unlimited."""
+    if memory_limit_bytes:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit_bytes, memory_limit_bytes))
+
+
+def _raise_timeout(signum, frame):
+    raise ExtractionTimeout()
+
+
+def _kill_self() -> None:
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def _cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run_job(
+    path: str, content_type: str, max_text_length: int, timeout: float
+) -> Tuple[Optional[str], Dict]:
+    """Extract the file at path, raising ExtractionTimeout after timeout seconds.
+
+    A wall-clock timer interrupts the job between Python instructions. If it
+    is stuck in C code instead, a CPU limit of twice the timeout kills the
+    worker, and so does a watchdog thread after twice the timeout of wall
+    time, for a job blocked without using CPU. Without a main thread to
+    signal (EXTRACTION_WORKERS=0) the caller's timeout is the only one.
+    """
+    limited = timeout and threading.current_thread() is threading.main_thread()
+    if limited:
+        watchdog = threading.Timer(2 * timeout, _kill_self)
+        watchdog.daemon = True
+        watchdog.start()
+        cpu_limits = resource.getrlimit(resource.RLIMIT_CPU)
+        cpu_limit = int(_cpu_seconds() + 2 * timeout) + 1
+        if cpu_limits[1] != resource.RLIM_INFINITY:
+            cpu_limit = min(cpu_limit, cpu_limits[1])
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit, cpu_limits[1]))
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+
+    try:
+        with open(path, "rb") as file_obj:
+            return extract(file_obj, content_type, max_text_length)
+    finally:
+        if limited:
+            watchdog.cancel()
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            resource.setrlimit(resource.RLIMIT_CPU, cpu_limits)
+
+
+def extract(
+    file_obj: BinaryIO, content_type: str, max_text_length: int
+) -> Tuple[Optional[str], Dict]:
+    if content_type == "application/pdf":
+        return extract_pdf(file_obj, max_text_length)
+    if content_type == "application/json":
+        return extract_json(file_obj, max_text_length)
+    return extract_word(file_obj, max_text_length)
+
+
+def _truncate(text: str, max_text_length: int) -> str:
+    if len(text) > max_text_length:
+        return text[:max_text_length] + "... [truncated]"
+    return text
+
+
+def extract_pdf(file_obj: BinaryIO, max_text_length: int) -> Tuple[str, Dict]:
+    """Extract text from PDF files."""
+    try:
+        import PyPDF2
+    except ImportError:
+        return (
+            "[PDF: PyPDF2 not installed - install with: pip install PyPDF2]",
+            {"error": "missing_dependency"},
+        )
+
+    pdf_reader = PyPDF2.PdfReader(file_obj)
+    text_content = []
+
+    for page_num, page in enumerate(pdf_reader.pages):
+        try:
+            text = page.extract_text()
+            if text.strip():
+                text_content.append(f"Page {page_num + 1}:\n{text}")
+        except (ExtractionTimeout, MemoryError):
+            raise
+        except Exception as e:
+            text_content.append(
+                f"Page {page_num + 1}: [Could not extract text: {str(e)}]"
+            )
+
+        # Later pages would only be truncated away
+        if sum(len(text) for text in text_content) > max_text_length:
+            break
+
+    full_text = _truncate("\n\n".join(text_content), max_text_length)
+
+    return full_text, {
+        "type": "pdf",
+        "page_count": len(pdf_reader.pages),
+        "text_length": len(full_text),
+        "word_count": len(full_text.split()),
+    }
+
+
+def extract_word(file_obj: BinaryIO, max_text_length: int) -> Tuple[str, Dict]:
+    """Extract text from Word documents."""
+    try:
+        from docx import Document
+    except ImportError:
+        return (
+            "[WORD: python-docx not installed - install with: pip install python-docx]",
+            {"error": "missing_dependency"},
+        )
+
+    doc = Document(file_obj)
+    text_content = []
+
+    for paragraph in doc.paragraphs:
+        if paragraph.text.strip():
+            text_content.append(paragraph.text)
+
+    full_text = _truncate("\n".join(text_content), max_text_length)
+
+    return full_text, {
+        "type": "word_document",
+        "paragraph_count": len(doc.paragraphs),
+        "text_length": len(full_text),
+        "word_count": len(full_text.split()),
+    }
+
+
+def extract_json(file_obj: BinaryIO, max_text_length: int) -> Tuple[str, Dict]:
+    """Extract and format JSON content."""
+    json_data = json.loads(file_obj.read().decode("utf-8"))
+
+    # Pretty format the JSON for better readability
+    formatted_json = _truncate(json.dumps(json_data, indent=2), max_text_length)
+
+    return formatted_json, {
+        "type": "json",
+        "text_length": len(formatted_json),
+        "is_valid_json": True,
+    }
@@ -1,16 +1,75 @@
+import asyncio
 import hashlib
 import json
 import uuid
-from typing import Dict, List, Optional
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
 
 from fastapi import HTTPException, UploadFile
 from sqlalchemy import select
 
+from app.core.cache import LRUCache
+from app.core.config import settings
 from app.core.database import AsyncSessionLocal
 from app.models.file import StoredFile
 from app.services.content_extraction import content_extraction_service
+from app.services.derivative_store import derivative_store
+from app.services.image_service import image_service
 from app.services.s3_service import s3_service
 
+# LLM-ready content of stored files keyed by file ID; each entry keeps the
+# file's hash and is dropped when the file is deleted
+file_content_cache = LRUCache(
+    "file_content",
+    max_entries=settings.FILE_CONTENT_CACHE_MAX_ENTRIES,
+    max_bytes=settings.FILE_CONTENT_CACHE_MAX_BYTES,
+    ttl_seconds=settings.FILE_CONTENT_CACHE_TTL,
+)
+
+
+# Longest string kept in file_metadata; larger values belong in the derivative store
+MAX_METADATA_STRING_LENGTH = 256
+
+
+def small_metadata(metadata: Dict) -> Dict:
+    """The scalar fields of metadata that are cheap to store, parse and return."""
+    return {
+        key: value
+        for key, value in metadata.items()
+        if value is None
+        or isinstance(value, (bool, int, float))
+        or (isinstance(value, str) and len(value) <= MAX_METADATA_STRING_LENGTH)
+    }
+
+
+def file_id_from_url(url: str) -> Optional[int]:
+    """Return the stored file ID referenced by an /api/files/<id> URL, if any."""
+    if "/api/files/" not in url:
+        return None
+    try:
+        return int(url.split("/api/files/")[-1])
+    except (ValueError, IndexError):
+        return None
+
+
+@dataclass
+class _Upload:
+    """One file of an upload batch as it moves through upload_files."""
+
+    file: UploadFile
+    content_type: str
+    extension: str
+    unique_filename: str
+    s3_key: str
+    file_hash: str = ""
+    file_size: int = 0
+    extracted_text: Optional[str] = None
+    metadata: Dict = field(default_factory=dict)
+    # Whether its S3 object exists, and whether it is kept as a new file
+    streamed: bool = False
+    stored: bool = False
+
 
 class FileService:
     """Service for handling file uploads and storage in database as BLOBs."""
@@ -58,19 +117,19 @@ class FileService:
         """Extract file extension from filename."""
         return filename.split(".")[-1].lower() if "." in filename else ""
 
-    def _calculate_file_hash(self, file_data: bytes) -> str:
-        """Calculate SHA-256 hash of file data for deduplication."""
-        return hashlib.sha256(file_data).hexdigest()
-
-    def _validate_file(self, file: UploadFile, file_data: bytes) -> None:
-        """Validate file size, extension, and content type."""
-        # Check file size
-        if len(file_data) > self.max_file_size:
+    def _check_size(self, size: int) -> None:
+        if size > self.max_file_size:
             raise HTTPException(
                 status_code=413,
-                detail=f"File size ({len(file_data)} bytes) exceeds maximum allowed size ({self.max_file_size} bytes)",
+                detail=f"File size ({size} bytes) exceeds maximum allowed size ({self.max_file_size} bytes)",
             )
 
+    def _validate_file(self, file: UploadFile) -> None:
+        """Validate extension, content type and declared size before reading."""
+        # Check file size, if the client declared it
+        if file.size is not None:
+            self._check_size(file.size)
+
         # Check file extension
         extension = self._get_file_extension(file.filename or "")
         if extension not in self.allowed_extensions:
@@ -86,118 +145,245 @@ class FileService:
                 detail=f"MIME type '{file.content_type}' is not allowed",
             )
 
-    async def upload_files(self, files: List[UploadFile]) -> List[Dict]:
-        """Upload files to S3 and store metadata in the database."""
-        uploaded_files = []
-
-        async with AsyncSessionLocal() as session:
-            for file in files:
-                try:
-                    # Read file data
-                    file_data = await file.read()
-
-                    # Validate file
-                    self._validate_file(file, file_data)
-
-                    # Calculate hash for deduplication
-                    file_hash = self._calculate_file_hash(file_data)
+    async def _stream_to_s3(
+        self, file: UploadFile, key: str, content_type: str
+    ) -> Tuple[str, int]:
+        """Copy an upload to S3 chunk by chunk; returns its SHA-256 hash and size.
+
+        Files smaller than one part are sent in a single request. Larger ones
+        become a multipart upload whose next part is read while the previous
+        one is sent, so at most two parts are held in memory. The upload is
+        aborted as soon as the file turns out to be too big.
+        """
+        hasher = hashlib.sha256()
+        size = 0
+        buffer = bytearray()
+        upload_id: Optional[str] = None
+        etags: List[str] = []
+        sending: Optional[asyncio.Task] = None
+
+        async def send_part(data: bytes) -> None:
+            nonlocal sending
+            if sending is not None:
+                etags.append(await sending)
+            sending = asyncio.create_task(
+                asyncio.to_thread(
+                    s3_service.upload_part, key, upload_id, len(etags) + 1, data
+                )
+            )
 
-                    # Check if file already exists (deduplication)
-                    existing_file = await session.execute(
-                        select(StoredFile).where(StoredFile.file_hash == file_hash)
-                    )
-                    existing_file = existing_file.scalar_one_or_none()
-
-                    if existing_file:
-                        # File already exists, return existing file info
-                        uploaded_files.append(
-                            {
-                                "id": existing_file.id,
-                                "fileName": existing_file.original_filename,
-                                "fileUrl": s3_service.get_s3_url(existing_file.s3_key),
-                                "fileSize": existing_file.file_size,
-                                "mimeType": existing_file.content_type,
-                                "metadata": json.loads(existing_file.file_metadata)
-                                if existing_file.file_metadata
-                                else None,
-                                "isDuplicate": True,
-                            }
+        try:
+            while chunk := await file.read(settings.UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                self._check_size(size)
+                hasher.update(chunk)
+                buffer += chunk
+
+                if len(buffer) >= settings.UPLOAD_PART_SIZE:
+                    if upload_id is None:
+                        upload_id = await asyncio.to_thread(
+                            s3_service.create_multipart_upload, key, content_type
                         )
-                        continue
+                    await send_part(bytes(buffer))
+                    buffer.clear()
 
-                    # Extract content from file
-                    (
-                        extracted_text,
-                        extraction_metadata,
-                    ) = await content_extraction_service.extract_content(
-                        file_data,
-                        file.content_type or "application/octet-stream",
-                        file.filename or "unknown",
-                    )
+            if upload_id is None:
+                await asyncio.to_thread(
+                    s3_service.put_file, BytesIO(buffer), key, content_type
+                )
+            else:
+                if buffer:
+                    await send_part(bytes(buffer))
+                etags.append(await sending)
+                sending = None
+                await asyncio.to_thread(
+                    s3_service.complete_multipart_upload, key, upload_id, etags
+                )
+        except BaseException:
+            if sending is not None:
+                # The part's thread cannot be interrupted; let it finish first
+                await asyncio.gather(sending, return_exceptions=True)
+            if upload_id is not None:
+                await asyncio.to_thread(
+                    s3_service.abort_multipart_upload, key, upload_id
+                )
+            raise
 
-                    # Generate unique filename
-                    extension = self._get_file_extension(file.filename or "")
-                    unique_filename = (
-                        f"{uuid.uuid4()}.{extension}"
-                        if extension
-                        else str(uuid.uuid4())
-                    )
+        return hasher.hexdigest(), size
 
-                    # Upload to S3
-                    from io import BytesIO
+    def _start_upload(self, file: UploadFile) -> _Upload:
+        self._validate_file(file)
+        extension = self._get_file_extension(file.filename or "")
+        unique_filename = (
+            f"{uuid.uuid4()}.{extension}" if extension else str(uuid.uuid4())
+        )
+        return _Upload(
+            file=file,
+            content_type=file.content_type or "application/octet-stream",
+            extension=extension,
+            unique_filename=unique_filename,
+            s3_key=s3_service.new_key(unique_filename),
+        )
+
+    async def _process_upload(self, upload: _Upload) -> None:
+        """Stream one file to S3 and extract its content."""
+        file = upload.file
+        try:
+            # Upload to S3 while hashing for deduplication
+            upload.file_hash, upload.file_size = await self._stream_to_s3(
+                file, upload.s3_key, upload.content_type
+            )
+            upload.streamed = True
+
+            # Extract content from the spooled upload, which Starlette keeps on
+            # disk once it outgrows memory
+            await file.seek(0)
+            (
+                upload.extracted_text,
+                extraction_metadata,
+            ) = await content_extraction_service.extract_content(
+                file.file, upload.content_type, file.filename or "unknown"
+            )
 
-                    s3_key = s3_service.upload_file(
-                        BytesIO(file_data),
-                        unique_filename,
-                        file.content_type or "application/octet-stream",
-                    )
+            # Prepare metadata (combine extraction metadata with basic info)
+            upload.metadata = small_metadata(
+                {
+                    "upload_timestamp": upload.file_hash[:16],
+                    "original_size": upload.file_size,
+                    "extension": upload.extension,
+                    **extraction_metadata,  # Include extraction results
+                }
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            print(f"Error uploading file {file.filename}: {str(e)}")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to upload file {file.filename}: {str(e)}",
+            )
 
-                    # Prepare metadata (combine extraction metadata with basic info)
-                    metadata = {
-                        "upload_timestamp": str(
-                            hashlib.sha256(file_data).hexdigest()[:16]
-                        ),
-                        "original_size": len(file_data),
-                        "extension": extension,
-                        **extraction_metadata,  # Include extraction results
-                    }
+    async def _delete_objects(self, keys: List[str]) -> None:
+        await asyncio.gather(
+            *(asyncio.to_thread(s3_service.delete_file, key) for key in keys)
+        )
 
-                    # Create database record
-                    stored_file = StoredFile(
-                        filename=unique_filename,
-                        original_filename=file.filename or "unknown",
-                        content_type=file.content_type or "application/octet-stream",
-                        file_size=len(file_data),
-                        s3_key=s3_key,
-                        file_hash=file_hash,
-                        extracted_text=extracted_text,  # Store extracted content
-                        file_metadata=json.dumps(metadata),
+    async def upload_files(self, files: List[UploadFile]) -> List[Dict]:
+        """Stream a batch of files to S3 and store their metadata atomically.
+
+        Up to UPLOAD_CONCURRENCY files are streamed and extracted at once.
+        Their hashes are then checked against stored files in one query, and
+        the new files are inserted in one transaction. If any file fails,
+        nothing is stored and the batch's S3 objects are removed.
+        """
+        # Reject disallowed files before uploading any of them
+        uploads = [self._start_upload(file) for file in files]
+        semaphore = asyncio.Semaphore(settings.UPLOAD_CONCURRENCY)
+
+        async def process(upload: _Upload) -> None:
+            async with semaphore:
+                await self._process_upload(upload)
+
+        new_files: Dict[str, StoredFile] = {}
+        try:
+            results = await asyncio.gather(
+                *(process(upload) for upload in uploads), return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+
+            async with AsyncSessionLocal() as session:
+                # Check which files already exist (deduplication)
+                result = await session.execute(
+                    select(StoredFile).where(
+                        StoredFile.file_hash.in_(
+                            {upload.file_hash for upload in uploads}
+                        )
                     )
-
-                    session.add(stored_file)
-                    await session.flush()  # Get the ID
-
-                    uploaded_files.append(
-                        {
-                            "id": stored_file.id,
-                            "fileName": stored_file.original_filename,
-                            "fileUrl": s3_service.get_s3_url(stored_file.s3_key),
-                            "fileSize": stored_file.file_size,
-                            "mimeType": stored_file.content_type,
-                            "metadata": metadata,
-                            "hasExtractedContent": extracted_text is not None,
-                            "isDuplicate": False,
-                        }
+                )
+                existing_files = {
+                    file.file_hash: file for file in result.scalars().all()
+                }
+
+                # The first copy of each new file in the batch is stored
+                for upload in uploads:
+                    if (
+                        upload.file_hash in existing_files
+                        or upload.file_hash in new_files
+                    ):
+                        continue
+                    new_files[upload.file_hash] = StoredFile(
+                        filename=upload.unique_filename,
+                        original_filename=upload.file.filename or "unknown",
+                        content_type=upload.content_type,
+                        file_size=upload.file_size,
+                        s3_key=upload.s3_key,
+                        file_hash=upload.file_hash,
+                        extracted_text=upload.extracted_text,  # Store extracted content
+                        file_metadata=json.dumps(upload.metadata),
                     )
+                    upload.stored = True
 
-                except Exception as e:
-                    print(f"Error uploading file {file.filename}: {str(e)}")
-                    raise HTTPException(
-                        status_code=500,
-                        detail=f"Failed to upload file {file.filename}: {str(e)}",
-                    )
+                session.add_all(new_files.values())
+                await session.commit()
+        except BaseException:
+            await self._delete_objects(
+                [upload.s3_key for upload in uploads if upload.streamed]
+            )
+            raise
+
+        async def prepare_image(upload: _Upload) -> None:
+            await upload.file.seek(0)
+            await image_service.prepare_upload(upload.s3_key, upload.file.file)
+
+        await asyncio.gather(
+            # Copies of files that were already stored
+            self._delete_objects(
+                [upload.s3_key for upload in uploads if not upload.stored]
+            ),
+            *(
+                prepare_image(upload)
+                for upload in uploads
+                if upload.stored and upload.content_type.startswith("image/")
+            ),
+        )
 
-            await session.commit()
+        uploaded_files = []
+        for upload in uploads:
+            if upload.stored:
+                stored_file = new_files[upload.file_hash]
+                uploaded_files.append(
+                    {
+                        "id": stored_file.id,
+                        "fileName": stored_file.original_filename,
+                        "fileUrl": s3_service.get_s3_url(stored_file.s3_key),
+                        "fileSize": stored_file.file_size,
+                        "mimeType": stored_file.content_type,
+                        "metadata": upload.metadata,
+                        "hasExtractedContent": upload.extracted_text is not None,
+                        "isDuplicate": False,
+                    }
+                )
+                continue
+
+            # File already exists, return existing file info
+            existing_file = existing_files.get(upload.file_hash) or new_files.get(
+                upload.file_hash
+            )
+            uploaded_files.append(
+                {
+                    "id": existing_file.id,
+                    "fileName": existing_file.original_filename,
+                    "fileUrl": s3_service.get_s3_url(existing_file.s3_key),
+                    "fileSize": existing_file.file_size,
+                    "mimeType": existing_file.content_type,
+                    "metadata": json.loads(existing_file.file_metadata)
+                    if existing_file.file_metadata
+                    else None,
+                    "isDuplicate": True,
+                }
+            )
 
         return uploaded_files
 
@@ -210,28 +396,48 @@ class FileService:
             return result.scalar_one_or_none()
 
     async def get_files_content(self, file_ids: List[int]) -> List[Dict]:
-        """Get extracted content for multiple files for LLM processing."""
-        async with AsyncSessionLocal() as session:
-            result = await session.execute(
-                select(StoredFile).where(StoredFile.id.in_(file_ids))
-            )
-            files = result.scalars().all()
+        """Get extracted content for multiple files for LLM processing.
+
+        Cached files are served from memory and the rest are loaded in a single
+        query. Results follow the order of file_ids; unknown IDs are skipped.
+        """
+        contents = {}
+        missing = []
+        for file_id in dict.fromkeys(file_ids):
+            cached = file_content_cache.get(file_id)
+            if cached is None:
+                missing.append(file_id)
+            else:
+                contents[file_id] = cached
+
+        if missing:
+            versions = {
+                file_id: file_content_cache.version([file_id]) for file_id in missing
+            }
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(
+                    select(StoredFile).where(StoredFile.id.in_(missing))
+                )
+                files = result.scalars().all()
 
-            content_list = []
             for file in files:
-                content_list.append(
-                    {
-                        "id": file.id,
-                        "filename": file.original_filename,
-                        "content_type": file.content_type,
-                        "extracted_text": file.extracted_text,
-                        "metadata": json.loads(file.file_metadata)
-                        if file.file_metadata
-                        else {},
-                    }
+                content = {
+                    "id": file.id,
+                    "file_hash": file.file_hash,
+                    "filename": file.original_filename,
+                    "content_type": file.content_type,
+                    "s3_key": file.s3_key,
+                    "extracted_text": file.extracted_text,
+                    "metadata": json.loads(file.file_metadata)
+                    if file.file_metadata
+                    else {},
+                }
+                contents[file.id] = content
+                file_content_cache.set(
+                    file.id, content, tags=[file.id], version=versions[file.id]
                 )
 
-            return content_list
+        return [contents[file_id] for file_id in file_ids if file_id in contents]
 
     async def delete_file(self, file_id: int) -> bool:
         """Delete a file from S3 and the database."""
@@ -248,6 +454,9 @@ class FileService:
             s3_service.delete_file(file.s3_key)
             await session.delete(file)
             await session.commit()
+            file_content_cache.invalidate(file_id)
+
+            await derivative_store.delete_for_file(file.s3_key)
             return True
 
     async def get_file_info(self, file_id: int) -> Optional[Dict]:
@@ -0,0 +1,205 @@
+import asyncio
+import logging
+from typing import Callable, List, Optional
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.metrics import counter, gauge
+from app.models.chat import Conversation, GenerationJob, GenerationStatus, Message
+from app.services.context_summary_service import context_summary_service
+from app.services.conversation_service import conversation_service
+from app.services.llm_metrics import LLMCallStats
+from app.services.llm_service import llm_service
+
+logger = logging.getLogger(__name__)
+
+UNFINISHED_STATUSES = (GenerationStatus.PENDING.value, GenerationStatus.RUNNING.value)
+
+generation_jobs_finished = counter(
+    "generation_jobs_finished_total",
+    "Asynchronous agent replies that finished, by final status",
+    labelnames=("status",),
+)
+
+
+class GenerationService:
+    """Generates agent replies in the background from the generation_jobs table.
+
+    A fixed pool of workers pulls job IDs from an in-memory queue, which bounds
+    how many replies are generated at once. The table is the source of truth:
+    `start` re-queues every job that was pending or running when the previous
+    process stopped.
+    """
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._reply_listeners: List[Callable[[int], None]] = []
+        gauge(
+            "generation_jobs_queued",
+            "Asynchronous agent replies waiting for a worker",
+            callback=lambda: self._queue.qsize() if self._queue else 0,
+        )
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    async def start(self, workers: Optional[int] = None) -> int:
+        """Start the workers and re-queue unfinished jobs; returns how many."""
+        if self._workers:
+            return 0
+
+        self._queue = asyncio.Queue()
+        self._workers = [
+            asyncio.create_task(self._worker(self._queue))
+            for _ in range(workers or settings.GENERATION_WORKERS)
+        ]
+
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(GenerationJob.id)
+                .where(GenerationJob.status.in_(UNFINISHED_STATUSES))
+                .order_by(GenerationJob.id)
+            )
+            job_ids = list(result.scalars().all())
+
+        for job_id in job_ids:
+            self._queue.put_nowait(job_id)
+        if job_ids:
+            logger.info(f"Re-queued {len(job_ids)} unfinished generation jobs")
+        return len(job_ids)
+
+    async def stop(self) -> None:
+        """Cancel the workers; jobs they were running are re-queued on start."""
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self._queue = None
+
+    def on_reply(self, listener: Callable[[int], None]) -> None:
+        """Call listener with the conversation ID after each stored reply."""
+        self._reply_listeners.append(listener)
+
+    def submit(self, job_id: int) -> None:
+        """Queue a committed job. Without running workers it waits for `start`."""
+        if self._queue is None:
+            logger.warning(f"Generation workers not running, job {job_id} deferred")
+            return
+        self._queue.put_nowait(job_id)
+
+    async def wait_idle(self) -> None:
+        """Wait until every queued job has been processed."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            job_id = await queue.get()
+            try:
+                await self.process(job_id)
+            except Exception as e:
+                logger.error(f"Error processing generation job {job_id}: {str(e)}")
+                try:
+                    await self._finish(job_id, GenerationStatus.FAILED, error=str(e))
+                except Exception as finish_error:
+                    logger.error(
+                        f"Error failing generation job {job_id}: {str(finish_error)}"
+                    )
+            finally:
+                queue.task_done()
+
+    async def process(self, job_id: int) -> None:
+        """Generate and store the reply for one job."""
+        async with AsyncSessionLocal() as session:
+            job = await session.get(GenerationJob, job_id)
+            if job is None or job.status not in UNFINISHED_STATUSES:
+                return
+
+            if job.attempts >= settings.GENERATION_MAX_ATTEMPTS:
+                job.status = GenerationStatus.FAILED.value
+                job.error = f"Gave up after {job.attempts} attempts"
+                await session.commit()
+                generation_jobs_finished.inc(status=job.status)
+                return
+
+            job.status = GenerationStatus.RUNNING.value
+            job.attempts += 1
+            await session.commit()
+
+            conversation = await session.get(Conversation, job.conversation_id)
+            user_message = await session.get(Message, job.user_message_id)
+            result = await session.execute(
+                context_summary_service.unsummarized_messages(
+                    job.conversation_id, conversation
+                )
+            )
+            # Only what the user had seen when sending the message
+            history = [
+                msg
+                for msg in result.scalars().all()
+                if (msg.created_at, msg.id) < (user_message.created_at, user_message.id)
+            ]
+            summary = conversation.context_summary if conversation else None
+
+        # No session is held while the LLM works
+        stats = LLMCallStats()
+        # Errors propagate so the worker marks the job failed
+        ai_response = await llm_service.complete_response(
+            user_message=user_message.content,
+            conversation_history=history,
+            attachments=user_message.attachments,
+            summary=summary,
+            stats=stats,
+        )
+        if ai_response is None:
+            raise ValueError("No response choices returned from LLM")
+
+        await self._finish(
+            job_id, GenerationStatus.COMPLETED, reply=ai_response, stats=stats
+        )
+
+    async def _finish(
+        self,
+        job_id: int,
+        status: GenerationStatus,
+        reply: Optional[str] = None,
+        error: Optional[str] = None,
+        stats: Optional[LLMCallStats] = None,
+    ) -> None:
+        async with AsyncSessionLocal() as session:
+            job = await session.get(GenerationJob, job_id)
+            if job is None:
+                return
+
+            if reply is not None:
+                # Store the reply and finish the job in one transaction
+                ai_message = Message(
+                    conversation_id=job.conversation_id,
+                    type="agent",
+                    content=reply,
+                    generation_stats=stats.as_stored() if stats else None,
+                )
+                session.add(ai_message)
+                conversation = await session.get(Conversation, job.conversation_id)
+                if conversation:
+                    conversation_service.record_message(conversation, ai_message)
+                await session.flush()
+                job.agent_message_id = ai_message.id
+
+            job.status = status.value
+            job.error = error
+            await session.commit()
+
+        generation_jobs_finished.inc(status=status.value)
+        if reply is not None:
+            for listener in self._reply_listeners:
+                listener(job.conversation_id)
+            context_summary_service.schedule(job.conversation_id)
+
+
+# Global instance
+generation_service = GenerationService()
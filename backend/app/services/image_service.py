@@ -0,0 +1,128 @@
+import asyncio
+import base64
+import io
+import logging
+from typing import BinaryIO, Dict, Optional, Tuple, Union
+
+from PIL import Image, ImageOps
+
+from app.core.cache import LRUCache, SingleFlight
+from app.core.config import settings
+from app.services.derivative_store import derivative_key, derivative_store
+from app.services.s3_service import s3_service
+
+logger = logging.getLogger(__name__)
+
+# Data URLs of downscaled images by derivative key, which covers the file and
+# the downscaling settings
+image_cache = LRUCache(
+    "llm_image",
+    max_entries=settings.IMAGE_CACHE_MAX_ENTRIES,
+    max_bytes=settings.IMAGE_CACHE_MAX_BYTES,
+    ttl_seconds=settings.IMAGE_CACHE_TTL,
+)
+image_single_flight = SingleFlight("llm_image")
+
+
+def _open(source: Union[bytes, BinaryIO]) -> Image.Image:
+    return Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+
+
+def image_size(source: Union[bytes, BinaryIO]) -> Tuple[int, int, str]:
+    """Width, height and format of an image, read from its header."""
+    with _open(source) as image:
+        return image.width, image.height, image.format or "unknown"
+
+
+def downscale_image(
+    source: Union[bytes, BinaryIO], max_dimension: int, quality: int
+) -> bytes:
+    """Fit an image within max_dimension pixels and recompress it as JPEG.
+
+    Honours EXIF orientation, keeps the first frame of animations and puts
+    transparent images on a white background.
+    """
+    with _open(source) as image:
+        image.seek(0)
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=quality, optimize=True)
+        return output.getvalue()
+
+
+class ImageService:
+    """Prepares image attachments as content parts for vision models."""
+
+    def _kind(self) -> str:
+        return (
+            f"llm_image/{settings.LLM_IMAGE_MAX_DIMENSION}"
+            f"/{settings.LLM_IMAGE_JPEG_QUALITY}"
+        )
+
+    async def _downscale(self, source: Union[bytes, BinaryIO]) -> bytes:
+        return await asyncio.to_thread(
+            downscale_image,
+            source,
+            settings.LLM_IMAGE_MAX_DIMENSION,
+            settings.LLM_IMAGE_JPEG_QUALITY,
+        )
+
+    def _data_url(self, jpeg: bytes) -> str:
+        return f"data:image/jpeg;base64,{base64.b64encode(jpeg).decode()}"
+
+    async def prepare_upload(self, s3_key: str, source: Union[bytes, BinaryIO]) -> None:
+        """Store the derivative of a just-uploaded image while its bytes are at hand."""
+        kind = self._kind()
+        try:
+            jpeg = await self._downscale(source)
+            await derivative_store.put(s3_key, kind, jpeg, "image/jpeg")
+            image_cache.set(derivative_key(s3_key, kind), self._data_url(jpeg))
+        except Exception as e:
+            logger.warning(f"Could not downscale uploaded image {s3_key}: {e}")
+
+    async def image_part(self, file_content: Dict) -> Optional[Dict]:
+        """An image_url content part for a stored image, or None if it cannot be read.
+
+        Misses read the stored derivative, or else download the original from
+        S3 and store its derivative, once however many prompts ask at a time.
+        """
+        s3_key = file_content["s3_key"]
+        kind = self._kind()
+        key = derivative_key(s3_key, kind)
+        url = image_cache.get(key)
+        if url is None:
+
+            async def load() -> str:
+                jpeg = await derivative_store.get(s3_key, kind)
+                if jpeg is None:
+                    data = await asyncio.to_thread(s3_service.download_file, s3_key)
+                    jpeg = await self._downscale(data)
+                    await derivative_store.put(s3_key, kind, jpeg, "image/jpeg")
+
+                url = self._data_url(jpeg)
+                image_cache.set(key, url)
+                return url
+
+            try:
+                url = await image_single_flight.do(key, load)
+            except Exception as e:
+                logger.warning(
+                    f"Could not prepare image {file_content.get('filename')}: {e}"
+                )
+                return None
+
+        return {"type": "image_url", "image_url": {"url": url}}
+
+
+# Global instance
+image_service = ImageService()
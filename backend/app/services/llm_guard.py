@@ -0,0 +1,368 @@
+import asyncio
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Optional, TypeVar
+
+import litellm
+
+from app.core.config import settings
+from app.core.metrics import counter, gauge, histogram
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+queue_wait = histogram(
+    "llm_queue_wait_seconds",
+    "Seconds an LLM call waited for the rate limits and a concurrency slot",
+)
+retries = counter(
+    "llm_retries_total",
+    "LLM calls retried after a provider error, by cause",
+    labelnames=("reason",),
+)
+rejected = counter(
+    "llm_rejected_total",
+    "LLM calls refused without reaching the provider, by cause",
+    labelnames=("reason",),
+)
+circuit_transitions = counter(
+    "llm_circuit_transitions_total",
+    "LLM circuit breaker state changes, by new state",
+    labelnames=("state",),
+)
+
+
+class LLMUnavailableError(Exception):
+    """The call was refused locally: circuit open or queued for too long."""
+
+
+class TokenBucket:
+    """Allows `rate` units per second on average, with bursts up to `capacity`.
+
+    A rate of 0 disables the limit. Waiters are served in arrival order.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated_at = clock()
+        self._lock = asyncio.Lock()
+
+    @property
+    def available(self) -> float:
+        self._refill()
+        return self._tokens
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+    async def acquire(self, amount: float = 1) -> None:
+        if self.rate <= 0:
+            return
+        # A request bigger than the bucket waits for a full bucket, not forever
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((amount - self._tokens) / self.rate)
+
+
+class CircuitBreaker:
+    """Stops calling a provider after consecutive failures.
+
+    After `failure_threshold` failures in a row the circuit opens and calls are
+    refused for `reset_seconds`. It then half-opens: a single probe call is let
+    through, and its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+
+    def __init__(
+        self,
+        failure_threshold: int,
+        reset_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        state = self.peek()
+        if state != self._state:
+            self._transition(state)
+        return state
+
+    def peek(self) -> str:
+        """The state, without recording an open circuit's move to half-open."""
+        if (
+            self._state == self.OPEN
+            and self._clock() >= self._opened_at + self.reset_seconds
+        ):
+            return self.HALF_OPEN
+        return self._state
+
+    @property
+    def retry_in(self) -> float:
+        """Seconds until an open circuit lets a probe through."""
+        if self.state != self.OPEN:
+            return 0.0
+        return self._opened_at + self.reset_seconds - self._clock()
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def release(self) -> None:
+        """End a probe that finished without a recorded outcome (e.g. cancelled)."""
+        self._probing = False
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._probing = False
+        if self._state != self.CLOSED:
+            self._transition(self.CLOSED)
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._probing = False
+        if self._state == self.HALF_OPEN or (
+            self._state == self.CLOSED and self._failures >= self.failure_threshold
+        ):
+            self._opened_at = self._clock()
+            self._transition(self.OPEN)
+
+    def _transition(self, state: str) -> None:
+        logger.warning(f"LLM circuit {self._state} -> {state}")
+        self._state = state
+        circuit_transitions.inc(state=state)
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, provider-side errors and network failures are worth retrying."""
+    if isinstance(error, (litellm.Timeout, litellm.APIConnectionError)):
+        return True
+    status_code = getattr(error, "status_code", None)
+    return isinstance(status_code, int) and (status_code == 429 or status_code >= 500)
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """The provider's Retry-After hint in seconds, if it sent one."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMGuard:
+    """Protects the LLM provider, and this process, from overload.
+
+    Every call passes the circuit breaker, a requests-per-minute and a
+    tokens-per-minute bucket, and then waits for one of `max_concurrent` slots.
+    429/5xx responses are retried with jittered exponential backoff; the
+    backoff is shared, so one rate-limited call slows every caller down.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        max_retries: int,
+        backoff_base: float,
+        backoff_max: float,
+        queue_timeout: float,
+        breaker: CircuitBreaker,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.queue_timeout = queue_timeout
+        self.breaker = breaker
+        self.requests = TokenBucket(
+            requests_per_minute / 60, max(requests_per_minute, 1), clock
+        )
+        self.tokens = TokenBucket(
+            tokens_per_minute / 60, max(tokens_per_minute, 1), clock
+        )
+        self._clock = clock
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._cooldown_until = 0.0
+        self.in_flight = 0
+        self.waiting = 0
+
+        gauge(
+            "llm_in_flight_requests",
+            "LLM calls currently holding a concurrency slot",
+            callback=lambda: self.in_flight,
+        )
+        gauge(
+            "llm_waiting_requests",
+            "LLM calls waiting for the rate limits or a concurrency slot",
+            callback=lambda: self.waiting,
+        )
+        gauge(
+            "llm_circuit_state",
+            "LLM circuit breaker state: 0 closed, 1 half-open, 2 open",
+            callback=lambda: (
+                CircuitBreaker.CLOSED,
+                CircuitBreaker.HALF_OPEN,
+                CircuitBreaker.OPEN,
+            ).index(self.breaker.peek()),
+        )
+        gauge(
+            "llm_backoff_seconds",
+            "Seconds left before LLM calls resume after a 429/5xx",
+            callback=lambda: max(0.0, self._cooldown_until - self._clock()),
+        )
+        gauge(
+            "llm_rate_limit_tokens_available",
+            "Tokens left in the tokens-per-minute bucket",
+            callback=lambda: self.tokens.available,
+        )
+
+    @classmethod
+    def from_settings(cls) -> "LLMGuard":
+        return cls(
+            max_concurrent=settings.LLM_MAX_CONCURRENT_REQUESTS,
+            requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+            tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+            max_retries=settings.LLM_MAX_RETRIES,
+            backoff_base=settings.LLM_BACKOFF_BASE_SECONDS,
+            backoff_max=settings.LLM_BACKOFF_MAX_SECONDS,
+            queue_timeout=settings.LLM_QUEUE_TIMEOUT,
+            breaker=CircuitBreaker(
+                settings.LLM_CIRCUIT_FAILURE_THRESHOLD,
+                settings.LLM_CIRCUIT_RESET_SECONDS,
+            ),
+        )
+
+    @asynccontextmanager
+    async def limit(self, tokens: int) -> AsyncIterator[None]:
+        """Hold a concurrency slot for a call estimated at `tokens` tokens.
+
+        Raises LLMUnavailableError when the circuit is open or the limits keep
+        the call waiting longer than `queue_timeout`.
+        """
+        probe = self.breaker.state == CircuitBreaker.HALF_OPEN
+        if not self.breaker.allow():
+            rejected.inc(reason="circuit_open")
+            raise LLMUnavailableError(
+                f"LLM provider unavailable, retrying in {self.breaker.retry_in:.0f}s"
+            )
+
+        try:
+            await self._acquire(tokens)
+            self.in_flight += 1
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+                self._slots.release()
+        finally:
+            if probe:
+                self.breaker.release()
+
+    async def retry(self, call: Callable[[], Awaitable[T]]) -> T:
+        """Run `call` inside `limit`, retrying retryable provider errors.
+
+        `limit` paid for the first request; each retry takes its own token
+        from the requests-per-minute bucket.
+        """
+        attempt = 0
+        while True:
+            await self._wait_cooldown()
+            if attempt:
+                await self.requests.acquire(1)
+            try:
+                result = await call()
+            except Exception as e:
+                if not is_retryable(e):
+                    # The provider answered, so it is up; the request was bad
+                    self.breaker.record_success()
+                    raise
+                if (
+                    attempt >= self.max_retries
+                    or self.breaker.state != CircuitBreaker.CLOSED
+                ):
+                    # Out of retries, or other calls already gave up on the provider
+                    self.breaker.record_failure()
+                    raise
+
+                delay = self._backoff(attempt, retry_after(e))
+                self._cooldown_until = max(self._cooldown_until, self._clock() + delay)
+                retries.inc(reason=str(getattr(e, "status_code", type(e).__name__)))
+                logger.warning(f"LLM call failed ({e}), retrying in {delay:.1f}s")
+                attempt += 1
+                continue
+
+            self.breaker.record_success()
+            return result
+
+    async def _acquire(self, tokens: int) -> None:
+        started = time.perf_counter()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._wait_for_capacity(tokens), self.queue_timeout)
+        except asyncio.TimeoutError:
+            rejected.inc(reason="queue_timeout")
+            raise LLMUnavailableError(
+                f"LLM provider busy: no capacity within {self.queue_timeout}s"
+            )
+        finally:
+            self.waiting -= 1
+        queue_wait.observe(time.perf_counter() - started)
+
+    async def _wait_for_capacity(self, tokens: int) -> None:
+        await self.requests.acquire(1)
+        await self.tokens.acquire(tokens)
+        await self._slots.acquire()
+
+    async def _wait_cooldown(self) -> None:
+        delay = self._cooldown_until - self._clock()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _backoff(self, attempt: int, hint: Optional[float]) -> float:
+        if hint is not None:
+            return min(hint, self.backoff_max)
+        delay = min(self.backoff_max, self.backoff_base * 2**attempt)
+        # Jitter keeps callers that failed together from retrying together
+        return delay * random.uniform(0.5, 1)
+
+
+# Global instance
+llm_guard = LLMGuard.from_settings()
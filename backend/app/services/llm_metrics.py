@@ -0,0 +1,115 @@
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+
+import litellm
+
+from app.core.config import settings
+from app.core.metrics import counter, histogram
+
+LABELS = ("model", "operation")
+
+calls = counter(
+    "llm_calls_total",
+    "LLM calls by outcome: ok, cached, coalesced (shared an identical call), "
+    "cancelled or error",
+    labelnames=(*LABELS, "outcome"),
+)
+call_duration = histogram(
+    "llm_call_duration_seconds",
+    "Wall time of each LLM call, including queueing and retries",
+    labelnames=LABELS,
+)
+queue_wait = histogram(
+    "llm_call_queue_wait_seconds",
+    "Seconds each LLM call waited for the rate limits and a concurrency slot",
+    labelnames=LABELS,
+)
+time_to_first_token = histogram(
+    "llm_time_to_first_token_seconds",
+    "Seconds from starting an LLM call to its first token; the whole response unless streamed",
+    labelnames=LABELS,
+)
+tokens = counter(
+    "llm_tokens_total",
+    "Tokens sent to and generated by the provider, by kind (prompt or completion)",
+    labelnames=(*LABELS, "kind"),
+)
+cost = counter(
+    "llm_cost_usd_total",
+    "Estimated provider cost in US dollars, for models with known prices",
+    labelnames=LABELS,
+)
+
+
+@dataclass
+class LLMCallStats:
+    """Where the time and money of one LLM call went.
+
+    Token counts and cost only cover what the provider was asked for: calls
+    answered from the response cache or by an identical in-flight call cost 0.
+    Tokens come from the provider's usage report, or the local tokenizer when
+    it sends none.
+    """
+
+    operation: str = ""
+    model: Optional[str] = None
+    outcome: str = "ok"
+    duration_seconds: float = 0.0
+    queue_wait_seconds: float = 0.0
+    time_to_first_token_seconds: Optional[float] = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost_usd: Optional[float] = None
+
+    def set_usage(self, usage: Any, prompt_tokens: int, completion_tokens: int):
+        """Take token counts from a provider usage object, else the estimates."""
+        reported_prompt = getattr(usage, "prompt_tokens", None)
+        reported_completion = getattr(usage, "completion_tokens", None)
+        self.prompt_tokens = (
+            reported_prompt if isinstance(reported_prompt, int) else prompt_tokens
+        )
+        self.completion_tokens = (
+            reported_completion
+            if isinstance(reported_completion, int)
+            else completion_tokens
+        )
+        self.cost_usd = estimate_cost(
+            self.model, self.prompt_tokens, self.completion_tokens
+        )
+
+    def as_stored(self) -> Optional[Dict[str, Any]]:
+        """What to keep on the agent message, if LLM_STORE_CALL_STATS is set."""
+        return asdict(self) if settings.LLM_STORE_CALL_STATS else None
+
+    def record(self) -> None:
+        """Export the call as llm_* metrics."""
+        labels = {"model": self.model or "unknown", "operation": self.operation}
+        calls.inc(outcome=self.outcome, **labels)
+        call_duration.observe(self.duration_seconds, **labels)
+        if self.time_to_first_token_seconds is not None:
+            time_to_first_token.observe(self.time_to_first_token_seconds, **labels)
+        if self.outcome in ("cached", "coalesced"):
+            return
+
+        # Failed and cancelled calls count whatever the provider already did
+        queue_wait.observe(self.queue_wait_seconds, **labels)
+        tokens.inc(self.prompt_tokens, kind="prompt", **labels)
+        tokens.inc(self.completion_tokens, kind="completion", **labels)
+        if self.cost_usd is not None:
+            cost.inc(self.cost_usd, **labels)
+
+
+def estimate_cost(
+    model: Optional[str], prompt_tokens: int, completion_tokens: int
+) -> Optional[float]:
+    """Price a call from LiteLLM's model price list; None for unknown models."""
+    if not model:
+        return None
+    prices = litellm.model_cost.get(model) or litellm.model_cost.get(
+        model.split("/", 1)[-1]
+    )
+    if not prices:
+        return None
+    return prompt_tokens * prices.get(
+        "input_cost_per_token", 0
+    ) + completion_tokens * prices.get("output_cost_per_token", 0)
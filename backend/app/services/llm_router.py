@@ -0,0 +1,233 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+
+from app.core.config import settings
+from app.core.metrics import counter, gauge, histogram
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+endpoint_latency = histogram(
+    "llm_endpoint_latency_seconds",
+    "Seconds per successful non-streamed LLM call, by endpoint",
+    labelnames=("endpoint",),
+)
+endpoint_latency_ewma = gauge(
+    "llm_endpoint_latency_ewma_seconds",
+    "Recent latency estimate used to rank each LLM endpoint",
+    labelnames=("endpoint",),
+)
+endpoint_failures = counter(
+    "llm_endpoint_failures_total",
+    "Failed LLM calls, by endpoint",
+    labelnames=("endpoint",),
+)
+hedged_requests = counter(
+    "llm_hedged_requests_total",
+    "LLM calls that outlived the p95 and were duplicated, by which call won",
+    labelnames=("winner",),
+)
+
+
+def is_client_error(error: Exception) -> bool:
+    """A 4xx other than a timeout (408) or rate limit (429)."""
+    status_code = getattr(error, "status_code", None)
+    return (
+        isinstance(status_code, int)
+        and 400 <= status_code < 500
+        and status_code not in (408, 429)
+    )
+
+
+@dataclass
+class Endpoint:
+    model: str
+    base_url: Optional[str] = None
+    api_key: Optional[str] = None
+    # Exponentially weighted moving average of recent latencies, in seconds
+    ewma: Optional[float] = None
+    # When ewma last changed, or a probe was last sent, on the pool's clock
+    sampled_at: Optional[float] = None
+
+    @property
+    def name(self) -> str:
+        return f"{self.model}@{self.base_url}" if self.base_url else self.model
+
+
+class EndpointPool:
+    """Interchangeable LLM endpoints, ranked by their recent latency.
+
+    Calls go to the endpoint with the lowest EWMA latency; endpoints without
+    measurements yet are tried first so every endpoint gets measured. An
+    endpoint that has not been sampled for probe_interval seconds is probed
+    with one call, so one that ranked last after failures can recover. A hedged
+    call that is still running after the pool's observed p95 is duplicated on
+    the next-best endpoint, and whichever answers first wins.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        endpoints: List[Endpoint],
+        alpha: float = 0.2,
+        window: int = 200,
+        failure_penalty: float = 60,
+        probe_interval: float = 30,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if not endpoints:
+            raise ValueError(f"LLM endpoint pool {name} has no endpoints")
+        self.name = name
+        self.endpoints = endpoints
+        self.alpha = alpha
+        self.failure_penalty = failure_penalty
+        self.probe_interval = probe_interval
+        self._clock = clock
+        self._latencies: Deque[float] = deque(maxlen=window)
+
+    @classmethod
+    def from_config(cls, name: str, configs: List[Dict[str, str]]) -> "EndpointPool":
+        """Build a pool from endpoint dicts, defaulting to the LITELLM_* endpoint."""
+        endpoints = [
+            Endpoint(
+                model=config["model"],
+                base_url=config.get("base_url"),
+                api_key=config.get("api_key", settings.LITELLM_API_KEY),
+            )
+            for config in configs
+        ] or [
+            Endpoint(
+                model=settings.LITELLM_MODEL,
+                base_url=settings.LITELLM_BASE_URL,
+                api_key=settings.LITELLM_API_KEY,
+            )
+        ]
+        return cls(
+            name,
+            endpoints,
+            alpha=settings.LLM_LATENCY_EWMA_ALPHA,
+            failure_penalty=settings.LITELLM_TIMEOUT,
+            probe_interval=settings.LLM_ENDPOINT_PROBE_SECONDS,
+        )
+
+    def ranked(self) -> List[Endpoint]:
+        return sorted(
+            self.endpoints,
+            key=lambda endpoint: (endpoint.ewma is not None, endpoint.ewma or 0),
+        )
+
+    def route(self) -> List[Endpoint]:
+        """Endpoints to call in order: ranked, with a stale one probed first."""
+        ranked = self.ranked()
+        now = self._clock()
+        for endpoint in ranked[1:]:
+            if (
+                self.probe_interval
+                and endpoint.sampled_at is not None
+                and now - endpoint.sampled_at >= self.probe_interval
+            ):
+                # Claimed, so concurrent calls keep going to the best endpoint
+                endpoint.sampled_at = now
+                logger.info(f"Probing LLM endpoint {endpoint.name}")
+                ranked.remove(endpoint)
+                return [endpoint, *ranked]
+        return ranked
+
+    def p95(self) -> Optional[float]:
+        if len(self._latencies) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        latencies = sorted(self._latencies)
+        return latencies[math.ceil(0.95 * len(latencies)) - 1]
+
+    def observe(self, endpoint: Endpoint, seconds: float) -> None:
+        self._latencies.append(seconds)
+        endpoint_latency.observe(seconds, endpoint=endpoint.name)
+        self._update_ewma(endpoint, seconds)
+
+    def record_failure(self, endpoint: Endpoint, error: Exception) -> None:
+        # A failing endpoint ranks as if it had timed out, until it recovers.
+        # Requests it rejects as invalid say nothing about its health
+        endpoint_failures.inc(endpoint=endpoint.name)
+        if not is_client_error(error):
+            self._update_ewma(endpoint, self.failure_penalty)
+
+    def _update_ewma(self, endpoint: Endpoint, seconds: float) -> None:
+        if endpoint.ewma is None:
+            endpoint.ewma = seconds
+        else:
+            endpoint.ewma = self.alpha * seconds + (1 - self.alpha) * endpoint.ewma
+        endpoint.sampled_at = self._clock()
+        endpoint_latency_ewma.set(endpoint.ewma, endpoint=endpoint.name)
+
+    async def call(
+        self, request: Callable[[Endpoint], Awaitable[T]], hedge: bool = False
+    ) -> T:
+        """Run `request` against the best endpoint, hedging past the p95."""
+        ranked = self.route()
+        primary = asyncio.ensure_future(self._timed(ranked[0], request))
+        backup = None
+        try:
+            delay = self.p95() if hedge else None
+            if delay is None:
+                return await primary
+
+            delay = max(delay, settings.LLM_HEDGE_MIN_DELAY_SECONDS)
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                return primary.result()
+
+            backup_endpoint = ranked[1] if len(ranked) > 1 else ranked[0]
+            logger.info(
+                f"LLM call slower than {delay:.2f}s, hedging on {backup_endpoint.name}"
+            )
+            backup = asyncio.ensure_future(self._timed(backup_endpoint, request))
+
+            pending = {primary, backup}
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        hedged_requests.inc(
+                            winner="hedge" if task is backup else "primary"
+                        )
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            # The slower call, or both if our caller went away
+            for task in (primary, backup):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def _timed(
+        self, endpoint: Endpoint, request: Callable[[Endpoint], Awaitable[T]]
+    ) -> T:
+        started = time.perf_counter()
+        try:
+            result = await request(endpoint)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.record_failure(endpoint, e)
+            raise
+        self.observe(endpoint, time.perf_counter() - started)
+        return result
+
+
+# Global instances
+llm_pool = EndpointPool.from_config("default", settings.LLM_ENDPOINTS)
+# Titles are short and simple, so they can go to a cheaper, faster model
+title_pool = (
+    EndpointPool.from_config("title", settings.LLM_TITLE_ENDPOINTS)
+    if settings.LLM_TITLE_ENDPOINTS
+    else llm_pool
+)
@@ -1,14 +1,71 @@
+import asyncio
+import hashlib
+import json
 import logging
-from typing import List, Optional
+import time
+from typing import AsyncIterator, Dict, Iterable, List, NamedTuple, Optional, Union
 
 import litellm
 from litellm import acompletion
 
+from app.core.cache import LRUCache, SingleFlight
 from app.core.config import settings
+from app.core.metrics import histogram
 from app.models.chat import Message
+from app.services.llm_guard import llm_guard
+from app.services.llm_metrics import LLMCallStats
+from app.services.llm_router import Endpoint, EndpointPool, llm_pool, title_pool
+from app.services.tokenizer import count_message_tokens, count_tokens
 
 logger = logging.getLogger(__name__)
 
+prompt_tokens = histogram(
+    "llm_prompt_tokens",
+    "Estimated tokens in each prompt sent to the LLM",
+    buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000),
+)
+
+
+# (text, model) of completed non-streamed responses, keyed by response_cache_key
+llm_response_cache = LRUCache(
+    "llm_response",
+    max_entries=settings.LLM_RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=settings.LLM_RESPONSE_CACHE_MAX_BYTES,
+    ttl_seconds=settings.LLM_RESPONSE_CACHE_TTL,
+)
+llm_single_flight = SingleFlight("llm")
+
+# Parameters that change how long a call may take, not what it returns
+UNCACHED_PARAMETERS = {"timeout"}
+
+
+def response_cache_key(
+    messages: List[dict], pool: Optional[EndpointPool] = None, **parameters
+) -> str:
+    """Hash everything that determines an LLM response.
+
+    Endpoints of a pool serve the same kind of model, so any of them may
+    answer for the pool.
+    """
+    payload = {
+        "endpoints": [endpoint.name for endpoint in (pool or llm_pool).endpoints],
+        "messages": messages,
+        **{
+            name: value
+            for name, value in parameters.items()
+            if name not in UNCACHED_PARAMETERS
+        },
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class Prompt(NamedTuple):
+    messages: List[dict]
+    token_count: int
+    # History messages left out because they did not fit the token budget
+    dropped_messages: int
+
 
 class LLMService:
     def __init__(self):
@@ -26,6 +83,8 @@ class LLMService:
         conversation_history: Optional[List[Message]] = None,
         context: Optional[str] = None,
         attachments: Optional[List[dict]] = None,
+        summary: Optional[str] = None,
+        stats: Optional[LLMCallStats] = None,
     ) -> str:
         """
         Generate an AI response using LiteLLM with Grok.
@@ -35,30 +94,19 @@ class LLMService:
             conversation_history: Previous messages in the conversation
             context: Additional context (e.g., document content)
             attachments: List of attachments with the message
+            summary: Rolling summary of the turns before conversation_history
+            stats: Filled in with the call's latency, token usage and cost
 
         Returns:
             AI-generated response
         """
         try:
-            # Build messages for the API call
-            messages = await self._build_messages(
-                user_message, conversation_history, context, attachments
-            )
-
-            # Make the API call
-            response = await acompletion(
-                model=settings.LITELLM_MODEL,
-                messages=messages,
-                max_tokens=settings.LITELLM_MAX_TOKENS,
-                temperature=settings.LITELLM_TEMPERATURE,
-                timeout=settings.LITELLM_TIMEOUT,
-                api_key=settings.LITELLM_API_KEY,
-                base_url=settings.LITELLM_BASE_URL,
+            content = await self.complete_response(
+                user_message, conversation_history, context, attachments, summary, stats
             )
 
-            # Extract the response content
-            if response.choices and len(response.choices) > 0:
-                return response.choices[0].message.content.strip()
+            if content is not None:
+                return content
             else:
                 logger.warning("No response choices returned from LLM")
                 return "I apologize, but I couldn't generate a response at this time. Please try again."
@@ -67,14 +115,236 @@ class LLMService:
             logger.error(f"Error generating LLM response: {str(e)}")
             return f"I encountered an error while processing your request: {str(e)}"
 
+    async def complete_response(
+        self,
+        user_message: str,
+        conversation_history: Optional[List[Message]] = None,
+        context: Optional[str] = None,
+        attachments: Optional[List[dict]] = None,
+        summary: Optional[str] = None,
+        stats: Optional[LLMCallStats] = None,
+    ) -> Optional[str]:
+        """
+        Generate an AI response like generate_response, but let errors raise.
+
+        Returns None when the LLM sends no content, so callers that retry or
+        record failures can tell both apart from a reply.
+        """
+        stats = stats if stats is not None else LLMCallStats()
+        stats.operation = "response"
+        # Build messages for the API call
+        prompt = await self._build_prompt(
+            user_message, conversation_history, context, attachments, summary
+        )
+
+        # Make the API call
+        content = await self._complete(
+            prompt.messages,
+            max_tokens=settings.LITELLM_MAX_TOKENS,
+            prompt_tokens=prompt.token_count,
+            stats=stats,
+            temperature=settings.LITELLM_TEMPERATURE,
+            timeout=settings.LITELLM_TIMEOUT,
+        )
+        return content.strip() if content is not None else None
+
+    async def stream_response(
+        self,
+        user_message: str,
+        conversation_history: Optional[List[Message]] = None,
+        context: Optional[str] = None,
+        attachments: Optional[List[dict]] = None,
+        summary: Optional[str] = None,
+        stats: Optional[LLMCallStats] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Stream an AI response, yielding token deltas as the provider sends them.
+
+        Takes the same arguments as generate_response. If the call fails before
+        any delta arrives, the error message is yielded as the response instead.
+        """
+        stats = stats if stats is not None else LLMCallStats()
+        stats.operation = "stream"
+        started = time.perf_counter()
+        streamed = []
+        usage = None
+        prompt = None
+        try:
+            prompt = await self._build_prompt(
+                user_message, conversation_history, context, attachments, summary
+            )
+
+            # The concurrency slot is held until the stream is fully read
+            waited = time.perf_counter()
+            async with llm_guard.limit(
+                prompt.token_count + settings.LITELLM_MAX_TOKENS
+            ):
+                stats.queue_wait_seconds = time.perf_counter() - waited
+                # Streams go to the fastest endpoint but are not hedged, and
+                # their latency is not comparable with whole completions
+                endpoint = llm_pool.ranked()[0]
+                stats.model = endpoint.model
+                response = await llm_guard.retry(
+                    lambda: acompletion(
+                        model=endpoint.model,
+                        messages=prompt.messages,
+                        max_tokens=settings.LITELLM_MAX_TOKENS,
+                        temperature=settings.LITELLM_TEMPERATURE,
+                        timeout=settings.LITELLM_TIMEOUT,
+                        api_key=endpoint.api_key,
+                        base_url=endpoint.base_url,
+                        stream=True,
+                        # OpenAI-compatible providers only report usage
+                        # on streams when asked, in a final chunk
+                        stream_options={"include_usage": True},
+                    )
+                )
+
+                async for chunk in response:
+                    # The usage chunk comes last, without choices
+                    usage = getattr(chunk, "usage", None) or usage
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if not delta:
+                        continue
+
+                    if not streamed:
+                        stats.time_to_first_token_seconds = (
+                            time.perf_counter() - started
+                        )
+                    streamed.append(delta)
+                    yield delta
+
+        except (asyncio.CancelledError, GeneratorExit):
+            stats.outcome = "cancelled"
+            raise
+
+        except Exception as e:
+            logger.error(f"Error streaming LLM response: {str(e)}")
+            stats.outcome = "error"
+            if not streamed:
+                yield f"I encountered an error while processing your request: {str(e)}"
+            return
+
+        finally:
+            # Also runs when the reader stops early, e.g. on a client disconnect
+            stats.duration_seconds = time.perf_counter() - started
+            if prompt is not None:
+                stats.set_usage(
+                    usage, prompt.token_count, count_tokens("".join(streamed))
+                )
+            stats.record()
+
+        if not streamed:
+            logger.warning("No content streamed from LLM")
+            yield "I apologize, but I couldn't generate a response at this time. Please try again."
+
+    async def _complete(
+        self,
+        messages: List[dict],
+        max_tokens: int,
+        prompt_tokens: Optional[int] = None,
+        pool: Optional[EndpointPool] = None,
+        stats: Optional[LLMCallStats] = None,
+        **kwargs,
+    ) -> Optional[str]:
+        """Call acompletion through llm_guard and return the first choice's text.
+
+        Identical requests share one call while it is in flight, and completed
+        texts are served from llm_response_cache. Otherwise the call waits
+        for a concurrency slot and the rate limits, goes to the pool's fastest
+        endpoint (hedged when LLM_HEDGE_REQUESTS is set), and 429/5xx errors
+        are retried with backoff. While the circuit is open it raises
+        LLMUnavailableError at once, so callers fall back without waiting.
+        Returns None when the provider sent no choices. The call is recorded
+        in `stats` and exported as llm_* metrics.
+        """
+        pool = pool or llm_pool
+        stats = stats if stats is not None else LLMCallStats()
+        started = time.perf_counter()
+        key = response_cache_key(messages, pool=pool, max_tokens=max_tokens, **kwargs)
+
+        if prompt_tokens is None:
+            prompt_tokens = sum(count_message_tokens(message) for message in messages)
+
+        async def request(endpoint: Endpoint):
+            response = await acompletion(
+                model=endpoint.model,
+                messages=messages,
+                max_tokens=max_tokens,
+                api_key=endpoint.api_key,
+                base_url=endpoint.base_url,
+                **kwargs,
+            )
+            return endpoint, response
+
+        async def call():
+            # Only runs for the caller that reaches the provider
+            stats.outcome = "ok"
+            waited = time.perf_counter()
+            async with llm_guard.limit(prompt_tokens + max_tokens):
+                stats.queue_wait_seconds = time.perf_counter() - waited
+                endpoint, response = await llm_guard.retry(
+                    lambda: pool.call(request, hedge=settings.LLM_HEDGE_REQUESTS)
+                )
+            stats.model = endpoint.model
+            content = response.choices[0].message.content if response.choices else None
+            stats.set_usage(
+                getattr(response, "usage", None), prompt_tokens, count_tokens(content)
+            )
+            if content is not None:
+                llm_response_cache.set(key, (content, endpoint.model))
+            return content, endpoint.model
+
+        try:
+            cached = llm_response_cache.get(key)
+            if cached is not None:
+                stats.outcome = "cached"
+            else:
+                stats.outcome = "coalesced"
+                cached = await llm_single_flight.do(key, call)
+            content, stats.model = cached
+            stats.time_to_first_token_seconds = time.perf_counter() - started
+            return content
+        except asyncio.CancelledError:
+            stats.outcome = "cancelled"
+            raise
+        except Exception:
+            stats.outcome = "error"
+            raise
+        finally:
+            stats.duration_seconds = time.perf_counter() - started
+            stats.record()
+
     async def _build_messages(
         self,
         user_message: str,
         conversation_history: Optional[List[Message]] = None,
         context: Optional[str] = None,
         attachments: Optional[List[dict]] = None,
+        summary: Optional[str] = None,
     ) -> List[dict]:
         """Build the messages array for the LLM API call."""
+        prompt = await self._build_prompt(
+            user_message, conversation_history, context, attachments, summary
+        )
+        return prompt.messages
+
+    async def _build_prompt(
+        self,
+        user_message: str,
+        conversation_history: Optional[List[Message]] = None,
+        context: Optional[str] = None,
+        attachments: Optional[List[dict]] = None,
+        summary: Optional[str] = None,
+    ) -> Prompt:
+        """Build the prompt within settings.LLM_CONTEXT_TOKEN_BUDGET.
+
+        The system prompt, context and current message are always included;
+        history fills the remaining budget newest-first and stops at the first
+        message that does not fit, so the kept turns stay contiguous.
+        """
         messages = [
             {
                 "role": "system",
@@ -91,70 +361,200 @@ class LLMService:
                 }
             )
 
-        # Add conversation history (limit to last 10 messages to avoid token limits)
-        if conversation_history:
-            recent_history = conversation_history[-10:]
-            for msg in recent_history:
-                role = "user" if msg.type == "user" else "assistant"
-                content = msg.content
-
-                # Add attachment content to message if available
-                if msg.attachments:
-                    attachment_content = await self._get_attachments_content(
-                        msg.attachments
-                    )
-                    if attachment_content:
-                        content = f"{content}\n\n{attachment_content}"
+        # Stand in for the turns that were folded into the rolling summary
+        if summary:
+            messages.append(
+                {
+                    "role": "system",
+                    "content": f"Summary of the earlier conversation: {summary}",
+                }
+            )
 
-                messages.append(
-                    {
-                        "role": role,
-                        "content": content,
-                    }
-                )
+        all_history = list(conversation_history or [])
+
+        # Older messages cannot fit even before their attachments are added,
+        # so only the candidates' files need resolving
+        base_tokens = sum(count_message_tokens(message) for message in messages)
+        base_tokens += count_message_tokens({"content": user_message})
+        candidates = self._history_candidates(
+            all_history, settings.LLM_CONTEXT_TOKEN_BUDGET - base_tokens
+        )
+
+        # Resolve every attachment the prompt may include in one batch
+        files_by_id = await self._load_attachment_files(
+            [attachments or [], *(msg.attachments or [] for msg in candidates)]
+        )
 
         # Add attachments content to current user message if provided
-        current_message_content = user_message
-        if attachments:
-            attachment_content = await self._get_attachments_content(attachments)
-            if attachment_content:
-                current_message_content = f"{user_message}\n\n{attachment_content}"
-
-        # Add the current user message
-        messages.append(
-            {
-                "role": "user",
-                "content": current_message_content,
+        current_message = {
+            "role": "user",
+            "content": await self._with_attachments(
+                user_message, attachments, files_by_id
+            ),
+        }
+
+        token_count = sum(
+            count_message_tokens(message) for message in [*messages, current_message]
+        )
+
+        # Add conversation history, newest first, while it fits the budget
+        history = []
+        remaining_history = list(candidates)
+        while remaining_history:
+            msg = remaining_history[-1]
+            role = "user" if msg.type == "user" else "assistant"
+
+            history_message = {
+                "role": role,
+                "content": await self._with_attachments(
+                    msg.content, msg.attachments, files_by_id
+                ),
             }
+            message_tokens = count_message_tokens(history_message)
+            if token_count + message_tokens > settings.LLM_CONTEXT_TOKEN_BUDGET:
+                break
+
+            token_count += message_tokens
+            history.append(history_message)
+            remaining_history.pop()
+
+        messages.extend(reversed(history))
+        messages.append(current_message)
+
+        dropped_messages = len(all_history) - len(history)
+        prompt_tokens.observe(token_count)
+        logger.debug(
+            f"Prompt uses {token_count} tokens with {len(history)} history "
+            f"messages ({dropped_messages} dropped)"
+        )
+        return Prompt(messages, token_count, dropped_messages)
+
+    def _history_candidates(self, history: List[Message], budget: int) -> List[Message]:
+        """The newest history messages whose text alone fits within the budget."""
+        tokens = 0
+        for index in range(len(history) - 1, -1, -1):
+            tokens += count_message_tokens({"content": history[index].content})
+            if tokens > budget:
+                return history[index + 1 :]
+        return history
+
+    def _attachment_file_ids(self, attachments: List[dict]) -> List[int]:
+        """Stored file IDs referenced by attachment URLs."""
+        if not attachments:
+            return []
+
+        # Import here to avoid circular imports
+        from app.services.file_service import file_id_from_url
+
+        file_ids = []
+        for att in attachments:
+            file_id = file_id_from_url(att.get("url", ""))
+            if file_id is not None:
+                file_ids.append(file_id)
+        return file_ids
+
+    async def _load_attachment_files(
+        self, attachment_lists: Iterable[List[dict]]
+    ) -> Dict[int, dict]:
+        """Fetch the content of every file the attachments reference in one call."""
+        file_ids = [
+            file_id
+            for attachments in attachment_lists
+            for file_id in self._attachment_file_ids(attachments)
+        ]
+        if not file_ids:
+            return {}
+
+        from app.services.file_service import file_service
+
+        files_content = await file_service.get_files_content(file_ids)
+        return {file_content["id"]: file_content for file_content in files_content}
+
+    async def _with_attachments(
+        self,
+        text: str,
+        attachments: Optional[List[dict]],
+        files_by_id: Dict[int, dict],
+    ) -> Union[str, List[dict]]:
+        """Message content for text and its attachments.
+
+        Plain text unless an attached image can be shown to the model, in
+        which case a list of text and image_url content parts.
+        """
+        if not attachments:
+            return text
+
+        attachment_content = await self._get_attachments_content(
+            attachments, files_by_id
+        )
+        if attachment_content:
+            text = f"{text}\n\n{attachment_content}"
+
+        image_parts = await self._get_image_parts(attachments, files_by_id)
+        if not image_parts:
+            return text
+        return [{"type": "text", "text": text}, *image_parts]
+
+    async def _attachment_files(
+        self, file_ids: List[int], files_by_id: Optional[Dict[int, dict]]
+    ) -> List[dict]:
+        if files_by_id is None:
+            from app.services.file_service import file_service
+
+            return await file_service.get_files_content(file_ids)
+        return [files_by_id[file_id] for file_id in file_ids if file_id in files_by_id]
+
+    async def _get_image_parts(
+        self,
+        attachments: List[dict],
+        files_by_id: Optional[Dict[int, dict]] = None,
+    ) -> List[dict]:
+        """Downscaled image_url content parts for the attached images."""
+        if not settings.LLM_IMAGE_INPUT:
+            return []
+
+        files_content = await self._attachment_files(
+            self._attachment_file_ids(attachments), files_by_id
+        )
+        images = [
+            file_content
+            for file_content in files_content
+            if file_content["content_type"].startswith("image/")
+            and file_content.get("s3_key")
+        ]
+        if not images:
+            return []
+
+        from app.services.image_service import image_service
+
+        parts = await asyncio.gather(
+            *(image_service.image_part(file_content) for file_content in images)
         )
+        return [part for part in parts if part is not None]
 
-        return messages
+    async def _get_attachments_content(
+        self,
+        attachments: List[dict],
+        files_by_id: Optional[Dict[int, dict]] = None,
+    ) -> str:
+        """Get the actual content of attachments for LLM processing.
 
-    async def _get_attachments_content(self, attachments: List[dict]) -> str:
-        """Get the actual content of attachments for LLM processing."""
+        Pass files_by_id from _load_attachment_files to format already fetched
+        files instead of querying for them. Images are only described here;
+        _get_image_parts attaches the pictures themselves.
+        """
         if not attachments:
             return ""
 
         # Extract file IDs from attachment URLs
-        file_ids = []
-        for att in attachments:
-            url = att.get("url", "")
-            if "/api/files/" in url:
-                try:
-                    file_id = int(url.split("/api/files/")[-1])
-                    file_ids.append(file_id)
-                except (ValueError, IndexError):
-                    continue
+        file_ids = self._attachment_file_ids(attachments)
 
         if not file_ids:
             # Fallback to basic metadata if no file IDs found
             return self._format_attachments_for_context(attachments)
 
-        # Import here to avoid circular imports
-        from app.services.file_service import file_service
-
         # Get actual file content
-        files_content = await file_service.get_files_content(file_ids)
+        files_content = await self._attachment_files(file_ids, files_by_id)
 
         content_parts = []
         for file_content in files_content:
@@ -165,11 +565,10 @@ class LLMService:
 
             if extracted_text:
                 if content_type.startswith("image/"):
-                    # For images, include description and metadata
+                    # The image itself follows as a content part
                     content_parts.append(
                         f"--- Attachment: {filename} ({content_type}) ---\n"
                         f"This is an image file. {extracted_text}\n"
-                        f"Metadata: {metadata}\n"
                     )
                 else:
                     # For text-based files, include the actual content
@@ -211,6 +610,51 @@ class LLMService:
 
         return "Attachments:\n" + "\n".join(attachment_descriptions)
 
+    async def summarize_conversation(
+        self, previous_summary: Optional[str], messages: List[Message]
+    ) -> Optional[str]:
+        """Fold older messages into the running summary of a conversation.
+
+        Returns None if the summary could not be generated, so callers can keep
+        the previous one and retry later.
+        """
+        transcript = []
+        for msg in messages:
+            role = "User" if msg.type == "user" else "Assistant"
+            content = msg.content
+            if msg.attachments:
+                content = f"{content}\n{self._format_attachments_for_context(msg.attachments)}"
+            transcript.append(f"{role}: {content}")
+        new_messages = "\n\n".join(transcript)
+
+        try:
+            content = await self._complete(
+                [
+                    {
+                        "role": "system",
+                        "content": "You maintain a running summary of a conversation. Update the summary with the new messages, keeping facts, decisions, figures and open questions the assistant will need later. Only return the updated summary.",
+                    },
+                    {
+                        "role": "user",
+                        "content": f"Current summary:\n{previous_summary or '(none)'}\n\n"
+                        f"New messages:\n{new_messages}",
+                    },
+                ],
+                max_tokens=settings.CONVERSATION_SUMMARY_MAX_TOKENS,
+                stats=LLMCallStats(operation="summary"),
+                temperature=0.2,
+                timeout=settings.LITELLM_TIMEOUT,
+            )
+
+            if content is not None:
+                return content.strip()
+            logger.warning("No summary choices returned from LLM")
+            return None
+
+        except Exception as e:
+            logger.error(f"Error summarizing conversation: {str(e)}")
+            return None
+
     async def generate_conversation_title(self, first_message: str) -> str:
         """Generate a title for a conversation based on the first message."""
         try:
@@ -225,18 +669,17 @@ class LLMService:
                 },
             ]
 
-            response = await acompletion(
-                model=settings.LITELLM_MODEL,
-                messages=messages,
+            content = await self._complete(
+                messages,
                 max_tokens=20,
+                pool=title_pool,
+                stats=LLMCallStats(operation="title"),
                 temperature=0.3,
                 timeout=30,
-                api_key=settings.LITELLM_API_KEY,
-                base_url=settings.LITELLM_BASE_URL,
             )
 
-            if response.choices and len(response.choices) > 0:
-                title = response.choices[0].message.content.strip()
+            if content is not None:
+                title = content.strip()
                 # Clean up the title
                 title = title.replace('"', "").replace("'", "")
                 return title[:50]  # Ensure max length
@@ -1,5 +1,5 @@
 import uuid
-from typing import Optional
+from typing import List, Optional
 
 import boto3
 from botocore.exceptions import ClientError
@@ -22,12 +22,79 @@ class S3Service:
         """
         Uploads a file object to S3 and returns the S3 object URL.
         """
-        # Generate a unique key for the file
-        key = f"uploads/{uuid.uuid4()}_{filename}"
+        key = self.new_key(filename)
+        self.put_file(file_obj, key, content_type)
+        return key
+
+    def put_file(self, file_obj, key: str, content_type: str) -> None:
+        """
+        Uploads a file object to the given S3 key.
+        """
         self.bucket.upload_fileobj(
             file_obj, key, ExtraArgs={"ContentType": content_type}
         )
-        return key
+
+    def new_key(self, filename: str) -> str:
+        """
+        Generates a unique key for a file.
+        """
+        return f"uploads/{uuid.uuid4()}_{filename}"
+
+    def create_multipart_upload(self, key: str, content_type: str) -> str:
+        """
+        Starts a multipart upload to key and returns its upload ID.
+        """
+        response = self.client.create_multipart_upload(
+            Bucket=settings.S3_BUCKET_NAME, Key=key, ContentType=content_type
+        )
+        return response["UploadId"]
+
+    def upload_part(
+        self, key: str, upload_id: str, part_number: int, data: bytes
+    ) -> str:
+        """
+        Uploads one part (at least 5MB, except the last) and returns its ETag.
+        """
+        response = self.client.upload_part(
+            Bucket=settings.S3_BUCKET_NAME,
+            Key=key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=data,
+        )
+        return response["ETag"]
+
+    def complete_multipart_upload(
+        self, key: str, upload_id: str, etags: List[str]
+    ) -> None:
+        """
+        Assembles the uploaded parts, in order, into the object.
+        """
+        self.client.complete_multipart_upload(
+            Bucket=settings.S3_BUCKET_NAME,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={
+                "Parts": [
+                    {"ETag": etag, "PartNumber": number}
+                    for number, etag in enumerate(etags, start=1)
+                ]
+            },
+        )
+
+    def abort_multipart_upload(self, key: str, upload_id: str) -> None:
+        """
+        Discards a multipart upload and the parts uploaded so far.
+        """
+        self.client.abort_multipart_upload(
+            Bucket=settings.S3_BUCKET_NAME, Key=key, UploadId=upload_id
+        )
+
+    def download_file(self, key: str) -> bytes:
+        """
+        Returns the content of an S3 object.
+        """
+        return self.bucket.Object(key).get()["Body"].read()
 
     def get_s3_url(self, key: str) -> str:
         """
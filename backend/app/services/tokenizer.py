@@ -0,0 +1,86 @@
+import logging
+import math
+import re
+from functools import lru_cache
+from typing import Callable, List, Optional, Union
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+APPROXIMATE = "approximate"
+
+# Chat formats wrap every message in a few tokens of role and separator markup
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_WORD_OR_SYMBOL = re.compile(r"\w+|[^\w\s]")
+
+
+def approximate_token_count(text: str) -> int:
+    """Estimate BPE tokens without a vocabulary.
+
+    Counts every punctuation mark as a token and every word as one token per
+    four characters, which slightly overestimates typical English BPE counts.
+    """
+    return sum(
+        math.ceil(len(piece) / 4) if piece[0].isalnum() or piece[0] == "_" else 1
+        for piece in _WORD_OR_SYMBOL.findall(text)
+    )
+
+
+@lru_cache(maxsize=1)
+def load_tokenizer() -> Callable[[str], int]:
+    """Return the configured token counter, falling back to the offline estimate.
+
+    tiktoken downloads its vocabulary on first use, so the first call can block
+    on the network; main.py warms it up in a thread at startup. Any failure is
+    logged once and the estimate is used from then on.
+    """
+    encoding_name = settings.LLM_TOKENIZER
+    if encoding_name == APPROXIMATE:
+        return approximate_token_count
+
+    try:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding(encoding_name)
+    except Exception as e:
+        logger.warning(
+            f"Tokenizer {encoding_name} unavailable, using approximate counts: {e}"
+        )
+        return approximate_token_count
+
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+def count_tokens(text: Optional[str]) -> int:
+    if not text:
+        return 0
+    return load_tokenizer()(text)
+
+
+def image_part_tokens() -> int:
+    """Tokens of one image content part, at most LLM_IMAGE_MAX_DIMENSION square.
+
+    Vision models charge a base cost plus a cost per 512px tile; assuming the
+    largest image we send overestimates smaller ones.
+    """
+    tiles = math.ceil(settings.LLM_IMAGE_MAX_DIMENSION / 512) ** 2
+    return 85 + 170 * tiles
+
+
+def count_content_tokens(content: Union[str, List[dict], None]) -> int:
+    """Tokens of message content, either text or a list of content parts."""
+    if not isinstance(content, list):
+        return count_tokens(content)
+    return sum(
+        count_tokens(part.get("text"))
+        if part.get("type") == "text"
+        else image_part_tokens()
+        for part in content
+    )
+
+
+def count_message_tokens(message: dict) -> int:
+    """Tokens a chat message occupies in the prompt, including its markup."""
+    return MESSAGE_OVERHEAD_TOKENS + count_content_tokens(message.get("content"))
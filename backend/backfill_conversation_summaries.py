@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Backfill script for the conversation summary columns.
+Recomputes message count, last-message preview and last-activity time for
+every conversation from its messages. Safe to rerun at any time.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add the backend directory to the Python path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+# Import after adding to path
+from app.services.conversation_service import conversation_service  # noqa: E402
+
+
+async def main():
+    """Main backfill function."""
+    print("Conversation Summary Backfill")
+    print("=" * 40)
+
+    try:
+        updated = await conversation_service.backfill_summaries()
+        print(f"✅ Updated {updated} conversations")
+    except Exception as e:
+        print(f"❌ Error backfilling conversation summaries: {e}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
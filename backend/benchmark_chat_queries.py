@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Benchmark the hot chat queries against growing tables.
+Seeds throwaway SQLite databases of increasing size, with and without the chat
+performance indexes, and reports the median time of each query. With the
+indexes in place the timings should stay flat as the tables grow.
+
+Usage:
+    python benchmark_chat_queries.py [--sizes 1000 10000 100000] [--runs 50]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add the backend directory to the Python path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+# Import after adding to path
+from sqlalchemy import desc, insert, select, text  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+
+from app.api.dataloaders import MessagePageKey, message_pages_query  # noqa: E402
+from app.api.pagination import keyset_before  # noqa: E402
+from app.core.database import Base  # noqa: E402
+from app.models.chat import Conversation, Message  # noqa: E402
+
+MESSAGES_PER_CONVERSATION = 20
+# One more conversation holds this share of the messages, so its history grows
+# with the table, and getConversation's message pages are timed against it
+LONG_THREAD_SHARE = 0.2
+MESSAGE_PAGE_SIZE = 50
+PERFORMANCE_INDEXES = [
+    "ix_conversations_updated_at_id",
+    "ix_messages_conversation_id_created_at_id",
+]
+
+
+def long_thread_size(message_count: int) -> int:
+    return max(int(message_count * LONG_THREAD_SHARE), 1)
+
+
+def build_queries(conversation_count: int, message_count: int) -> dict:
+    """The statements issued by getConversations, getConversation and send_message."""
+    base = datetime(2025, 1, 1)
+    middle_id = conversation_count // 2
+    middle_updated_at = base + timedelta(minutes=middle_id)
+    target_conversation = conversation_count // 3 or 1
+    # Seeded after the interleaved messages, so its IDs and times follow theirs
+    long_thread = conversation_count + 1
+    scrolled_back = message_count + long_thread_size(message_count) // 2
+    scrolled_back_at = base + timedelta(seconds=scrolled_back)
+
+    return {
+        "conversation list, first page": select(Conversation)
+        .order_by(desc(Conversation.updated_at), desc(Conversation.id))
+        .limit(21),
+        "conversation list, deep page": select(Conversation)
+        .where(
+            keyset_before(
+                Conversation.updated_at,
+                Conversation.id,
+                (middle_updated_at, middle_id),
+            )
+        )
+        .order_by(desc(Conversation.updated_at), desc(Conversation.id))
+        .limit(21),
+        "message history (send_message)": select(Message)
+        .where(Message.conversation_id == target_conversation)
+        .order_by(Message.created_at, Message.id),
+        # The query load_message_pages runs for getConversation's messages
+        "newest message page": message_pages_query(
+            [MessagePageKey(long_thread, last=MESSAGE_PAGE_SIZE)]
+        ),
+        "older message page": message_pages_query(
+            [
+                MessagePageKey(
+                    long_thread,
+                    last=MESSAGE_PAGE_SIZE,
+                    before=(scrolled_back_at, scrolled_back + 1),
+                )
+            ]
+        ),
+    }
+
+
+async def seed(engine, message_count: int, with_indexes: bool) -> int:
+    """Create and fill the chat tables; returns the number of conversations."""
+    conversation_count = max(message_count // MESSAGES_PER_CONVERSATION, 1)
+    base = datetime(2025, 1, 1)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        if not with_indexes:
+            for index_name in PERFORMANCE_INDEXES:
+                await conn.execute(text(f"DROP INDEX {index_name}"))
+
+        await conn.execute(
+            insert(Conversation.__table__),
+            [
+                {
+                    "id": i,
+                    "title": f"Conversation {i}",
+                    "created_at": base,
+                    "updated_at": base + timedelta(minutes=i),
+                }
+                for i in range(1, conversation_count + 2)
+            ],
+        )
+        # Interleave conversations so each one's messages are spread across the table
+        await conn.execute(
+            insert(Message.__table__),
+            [
+                {
+                    "conversation_id": i % conversation_count + 1,
+                    "type": "user" if i % 2 == 0 else "agent",
+                    "content": f"Message {i}",
+                    "created_at": base + timedelta(seconds=i),
+                }
+                for i in range(message_count)
+            ],
+        )
+        await conn.execute(
+            insert(Message.__table__),
+            [
+                {
+                    "conversation_id": conversation_count + 1,
+                    "type": "user" if i % 2 == 0 else "agent",
+                    "content": f"Message {i}",
+                    "created_at": base + timedelta(seconds=i),
+                }
+                for i in range(
+                    message_count, message_count + long_thread_size(message_count)
+                )
+            ],
+        )
+        await conn.execute(text("ANALYZE"))
+
+    return conversation_count
+
+
+async def time_query(engine, query, runs: int) -> float:
+    """Median wall time of a query in milliseconds."""
+    timings = []
+    async with engine.connect() as conn:
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = await conn.execute(query)
+            result.fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+async def explain(engine, query) -> str:
+    compiled = query.compile(engine, compile_kwargs={"literal_binds": True})
+    async with engine.connect() as conn:
+        result = await conn.execute(text(f"EXPLAIN QUERY PLAN {compiled}"))
+        return "; ".join(row[-1] for row in result.fetchall())
+
+
+async def run_benchmark(sizes: list, runs: int):
+    results = {}
+    plans = {}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in sizes:
+            for with_indexes in (False, True):
+                db_path = Path(tmp_dir) / f"bench_{size}_{with_indexes}.db"
+                engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+                conversation_count = await seed(engine, size, with_indexes)
+
+                queries = build_queries(conversation_count, size)
+                for name, query in queries.items():
+                    results[(name, size, with_indexes)] = await time_query(
+                        engine, query, runs
+                    )
+                    plans[(name, with_indexes)] = await explain(engine, query)
+
+                await engine.dispose()
+
+    return results, plans
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000]
+    )
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    print("Chat Query Benchmark (median ms per query)")
+    print("=" * 40)
+
+    results, plans = await run_benchmark(args.sizes, args.runs)
+    names = list(build_queries(1, 1).keys())
+
+    header = f"{'query':<34}{'indexes':<9}" + "".join(
+        f"{f'{size:,} msgs':>14}" for size in args.sizes
+    )
+    print(header)
+    print("-" * len(header))
+    for name in names:
+        for with_indexes in (False, True):
+            row = f"{name:<34}{'yes' if with_indexes else 'no':<9}"
+            row += "".join(
+                f"{results[(name, size, with_indexes)]:>14.3f}" for size in args.sizes
+            )
+            print(row)
+
+    print("\nQuery plans")
+    print("-" * 40)
+    for name in names:
+        print(f"{name}")
+        print(f"  without indexes: {plans[(name, False)]}")
+        print(f"  with indexes:    {plans[(name, True)]}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
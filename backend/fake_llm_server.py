@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Local OpenAI-compatible LLM stand-in for load and latency testing.
+Serves /v1/chat/completions with configurable latency, paced streaming, injected
+errors and deterministic replies, so the backend's real LLM path (LiteLLM,
+llm_guard, endpoint routing, streaming) can be benchmarked without network access.
+
+Usage:
+    python fake_llm_server.py [--port 8100] [--latency lognormal:0.8:0.5]
+        [--tokens-per-second 50] [--error-rate 0.05] [--error-status 429]
+
+Then point the backend at it:
+    LITELLM_MODEL=openai/fake-model LITELLM_BASE_URL=http://localhost:8100/v1
+
+Latency specs (seconds before the first token):
+    fixed:S, uniform:LOW:HIGH, exponential:MEAN, lognormal:MEDIAN:SIGMA
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import AsyncIterator, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = (
+    "revenue margin growth quarter forecast cash flow risk exposure equity debt "
+    "liquidity guidance outlook segment capital return yield valuation market "
+    "demand pricing cost operating earnings balance sheet covenant rate spread"
+).split()
+
+
+@dataclass
+class LatencyDistribution:
+    """Seconds to wait before the first token, parsed from a spec string."""
+
+    kind: str
+    params: List[float]
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyDistribution":
+        kind, *params = spec.split(":")
+        arity = {"fixed": 1, "uniform": 2, "exponential": 1, "lognormal": 2}
+        if kind not in arity or len(params) != arity[kind]:
+            raise ValueError(f"Invalid latency spec: {spec}")
+        return cls(kind, [float(param) for param in params])
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return rng.uniform(*self.params)
+        if self.kind == "exponential":
+            return rng.expovariate(1 / self.params[0]) if self.params[0] else 0.0
+        median, sigma = self.params
+        return rng.lognormvariate(math.log(median), sigma) if median else 0.0
+
+
+@dataclass
+class FakeLLMConfig:
+    latency: LatencyDistribution = field(
+        default_factory=lambda: LatencyDistribution("fixed", [0.0])
+    )
+    # Completion tokens per second once the reply starts; 0 sends it at once
+    tokens_per_second: float = 0.0
+    reply_tokens: int = 60
+    error_rate: float = 0.0
+    error_status: int = 500
+    # Seeds latency and error injection; replies are always deterministic
+    seed: Optional[int] = None
+
+
+@dataclass
+class FakeLLMStats:
+    requests: int = 0
+    errors: int = 0
+    in_flight: int = 0
+    peak_in_flight: int = 0
+
+
+def reply_for(model: str, messages: list, max_tokens: Optional[int], length: int):
+    """The same request always gets the same reply."""
+    digest = hashlib.sha256(
+        json.dumps([model, messages], sort_keys=True).encode()
+    ).digest()
+    rng = random.Random(digest)
+    count = min(length, max_tokens) if max_tokens else length
+    words = [rng.choice(WORDS) for _ in range(count)]
+    # One token per word: the first has no leading space, like a real stream
+    return [words[0], *(f" {word}" for word in words[1:])] if words else []
+
+
+def create_app(config: FakeLLMConfig) -> FastAPI:
+    app = FastAPI(title="Fake LLM provider")
+    rng = random.Random(config.seed)
+    stats = FakeLLMStats()
+    app.state.stats = stats
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats.__dict__
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": "fake-model", "object": "model"}]}
+
+    @app.post("/v1/chat/completions")
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats.requests += 1
+        stats.in_flight += 1
+        stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+        streaming = False
+        try:
+            await asyncio.sleep(config.latency.sample(rng))
+
+            if rng.random() < config.error_rate:
+                stats.errors += 1
+                return JSONResponse(
+                    {
+                        "error": {
+                            "message": "Injected failure",
+                            "type": "server_error",
+                            "code": config.error_status,
+                        }
+                    },
+                    status_code=config.error_status,
+                    headers={"retry-after": "1"}
+                    if config.error_status == 429
+                    else None,
+                )
+
+            model = body.get("model", "fake-model")
+            messages = body.get("messages", [])
+            tokens = reply_for(
+                model, messages, body.get("max_tokens"), config.reply_tokens
+            )
+            usage = {
+                "prompt_tokens": sum(
+                    len(str(message.get("content", "")).split()) + 4
+                    for message in messages
+                ),
+                "completion_tokens": len(tokens),
+            }
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+            completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+            if body.get("stream"):
+                streaming = True
+                return StreamingResponse(
+                    stream_chunks(
+                        completion_id,
+                        model,
+                        tokens,
+                        # Like OpenAI, usage is only streamed when asked for
+                        usage
+                        if (body.get("stream_options") or {}).get("include_usage")
+                        else None,
+                    ),
+                    media_type="text/event-stream",
+                )
+
+            if config.tokens_per_second:
+                await asyncio.sleep(len(tokens) / config.tokens_per_second)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "".join(tokens)},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": usage,
+            }
+        finally:
+            if not streaming:
+                stats.in_flight -= 1
+
+    async def stream_chunks(
+        completion_id: str, model: str, tokens: List[str], usage: Optional[dict]
+    ) -> AsyncIterator[str]:
+        def chunk(delta: Optional[dict], finish_reason: Optional[str] = None, **extra):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": []
+                if delta is None
+                else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                **extra,
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        try:
+            yield chunk({"role": "assistant", "content": ""})
+            for token in tokens:
+                if config.tokens_per_second:
+                    await asyncio.sleep(1 / config.tokens_per_second)
+                yield chunk({"content": token})
+            yield chunk({}, finish_reason="stop")
+            if usage is not None:
+                yield chunk(None, usage=usage)
+            yield "data: [DONE]\n\n"
+        finally:
+            stats.in_flight -= 1
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", default="fixed:0", type=LatencyDistribution.parse)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--reply-tokens", type=int, default=60)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = FakeLLMConfig(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        reply_tokens=args.reply_tokens,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
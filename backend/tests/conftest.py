@@ -1,7 +1,9 @@
 import os
+from datetime import datetime, timedelta
 from unittest.mock import patch
 
 import pytest
+import pytest_asyncio
 
 
 # Mock environment variables for testing
@@ -33,3 +35,117 @@ def mock_litellm():
         mock.timeout = 60
         mock.set_verbose = True
         yield mock
+
+
+# Count tokens offline so tests never try to download a tokenizer vocabulary
+@pytest.fixture(autouse=True)
+def offline_tokenizer():
+    from app.services.tokenizer import APPROXIMATE, load_tokenizer
+
+    load_tokenizer.cache_clear()
+    with patch("app.services.tokenizer.settings.LLM_TOKENIZER", APPROXIMATE):
+        yield
+    load_tokenizer.cache_clear()
+
+
+# Every test starts without cached or in-flight LLM responses
+@pytest.fixture(autouse=True)
+def empty_llm_response_cache():
+    from app.services.llm_service import llm_response_cache
+
+    llm_response_cache.clear()
+    yield
+    llm_response_cache.clear()
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    """A moto S3 bucket behind every service's s3_service."""
+    from moto import mock_aws
+
+    from app.core.config import settings
+    from app.services.s3_service import S3Service
+
+    monkeypatch.delenv("AWS_PROFILE", raising=False)
+    with mock_aws():
+        service = S3Service()
+        service.client.create_bucket(Bucket=settings.S3_BUCKET_NAME)
+        with (
+            patch("app.services.file_service.s3_service", service),
+            patch("app.services.image_service.s3_service", service),
+            patch("app.services.derivative_store.s3_service", service),
+        ):
+            yield service
+
+
+# Point the GraphQL resolvers at a throwaway SQLite database
+@pytest_asyncio.fixture
+async def test_db(tmp_path, monkeypatch):
+    from sqlalchemy.ext.asyncio import (
+        AsyncSession,
+        async_sessionmaker,
+        create_async_engine,
+    )
+
+    # Importing the services creates the S3 client, which would look for the
+    # empty profile that mock_env_vars sets
+    monkeypatch.delenv("AWS_PROFILE")
+
+    from app.api.response_cache import conversation_cache
+    from app.core.database import Base
+    from app.services.context_summary_service import context_summary_service
+    from app.services.file_service import file_content_cache
+    from app.services.generation_service import generation_service
+
+    conversation_cache.clear()
+    file_content_cache.clear()
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    session_factory = async_sessionmaker(
+        engine, class_=AsyncSession, expire_on_commit=False
+    )
+    with (
+        patch("app.api.schema.AsyncSessionLocal", session_factory),
+        patch("app.api.dataloaders.AsyncSessionLocal", session_factory),
+        patch("app.services.conversation_service.AsyncSessionLocal", session_factory),
+        patch("app.services.file_service.AsyncSessionLocal", session_factory),
+        patch("app.services.derivative_store.AsyncSessionLocal", session_factory),
+        patch(
+            "app.services.context_summary_service.AsyncSessionLocal", session_factory
+        ),
+        patch("app.services.generation_service.AsyncSessionLocal", session_factory),
+    ):
+        yield session_factory
+        await generation_service.stop()
+        await context_summary_service.wait_idle()
+
+    conversation_cache.clear()
+    file_content_cache.clear()
+    await engine.dispose()
+
+
+async def seed_conversation(session_factory, messages=0, words=0):
+    """Store conversation 1 with messages alternating user and agent turns.
+
+    Message i is "Message i" plus that many extra words, created i minutes
+    after the conversation was last updated. Returns that updated_at.
+    """
+    from app.models.chat import Conversation, Message, MessageType
+
+    updated_at = datetime(2024, 1, 1)
+    async with session_factory() as session:
+        session.add(Conversation(id=1, title="Deal", updated_at=updated_at))
+        for i in range(1, messages + 1):
+            session.add(
+                Message(
+                    id=i,
+                    conversation_id=1,
+                    type=MessageType.USER if i % 2 else MessageType.AGENT,
+                    content=f"Message {i}" + " word" * words,
+                    created_at=updated_at + timedelta(minutes=i),
+                )
+            )
+        await session.commit()
+    return updated_at
@@ -0,0 +1,22 @@
+"""Extraction pool jobs for tests, in a module workers import without the app."""
+
+import os
+import signal
+import time
+
+from app.services import extraction_worker
+
+
+def _block(file_obj, content_type, max_text_length):
+    """Block without using CPU or seeing the job timer."""
+    with open(os.environ["HUNG_WORKER_PID_FILE"], "w") as pid_file:
+        pid_file.write(str(os.getpid()))
+    signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGALRM})
+    time.sleep(60)
+
+
+def hang_on_pdf(path, content_type, *args):
+    """Run the job, hanging if it is a PDF."""
+    if content_type == "application/pdf":
+        extraction_worker.extract = _block
+    return extraction_worker.run_job(path, content_type, *args)
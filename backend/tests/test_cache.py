@@ -0,0 +1,220 @@
+import asyncio
+
+import pytest
+
+from app.core.cache import LRUCache, SingleFlight, estimate_size
+from app.core.metrics import Counter, MetricsRegistry
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(name, max_entries=10, max_bytes=1000, ttl_seconds=60, clock=None):
+    return LRUCache(
+        name,
+        max_entries=max_entries,
+        max_bytes=max_bytes,
+        ttl_seconds=ttl_seconds,
+        sizeof=len,
+        clock=clock or FakeClock(),
+    )
+
+
+class TestLRUCache:
+    def test_get_and_set(self):
+        cache = make_cache("test_get_set")
+
+        assert cache.get("a") is None
+        cache.set("a", "value")
+
+        assert cache.get("a") == "value"
+        assert cache.hits.value() == 1
+        assert cache.misses.value() == 1
+
+    def test_evicts_least_recently_used_entry(self):
+        cache = make_cache("test_lru", max_entries=2)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+
+        cache.set("c", "3")
+
+        assert cache.get("b") is None
+        assert cache.get("a") == "1"
+        assert cache.get("c") == "3"
+        assert cache.evictions.value(reason="capacity") == 1
+
+    def test_evicts_to_stay_within_byte_budget(self):
+        cache = make_cache("test_bytes", max_bytes=10)
+        cache.set("a", "x" * 6)
+        cache.set("b", "y" * 6)
+
+        assert len(cache) == 1
+        assert cache.total_bytes == 6
+        assert cache.get("b") == "y" * 6
+
+    def test_skips_values_larger_than_the_whole_budget(self):
+        cache = make_cache("test_oversized", max_bytes=10)
+        cache.set("a", "x" * 5)
+
+        cache.set("b", "y" * 11)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == "x" * 5
+
+    def test_entries_expire_after_ttl(self):
+        clock = FakeClock()
+        cache = make_cache("test_ttl", ttl_seconds=30, clock=clock)
+        cache.set("a", "1")
+
+        clock.now = 29
+        assert cache.get("a") == "1"
+        clock.now = 30
+        assert cache.get("a") is None
+        assert cache.evictions.value(reason="expired") == 1
+
+    def test_invalidate_drops_every_entry_with_tag(self):
+        cache = make_cache("test_invalidate")
+        cache.set("conversation", "1", tags=[1])
+        cache.set("messages", "2", tags=[1])
+        cache.set("other", "3", tags=[2])
+
+        assert cache.invalidate(1) == 2
+
+        assert cache.get("conversation") is None
+        assert cache.get("messages") is None
+        assert cache.get("other") == "3"
+        assert cache.total_bytes == 1
+
+    def test_value_read_before_invalidation_is_not_stored(self):
+        cache = make_cache("test_version")
+        version = cache.version([1])
+
+        cache.invalidate(1)
+        cache.set("conversation", "stale", tags=[1], version=version)
+
+        assert cache.get("conversation") is None
+
+    def test_zero_ttl_disables_cache(self):
+        cache = make_cache("test_disabled", ttl_seconds=0)
+        cache.set("a", "1")
+
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+
+class TestSingleFlight:
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_flight(self):
+        flights = SingleFlight("test_shared")
+        calls = 0
+        release = asyncio.Event()
+
+        async def call():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return "result"
+
+        waiters = [asyncio.create_task(flights.do("key", call)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await asyncio.gather(*waiters) == ["result"] * 3
+        assert calls == 1
+        assert flights.coalesced.value() == 2
+        assert flights.in_flight() == 0
+
+    @pytest.mark.asyncio
+    async def test_later_calls_start_a_new_flight(self):
+        flights = SingleFlight("test_sequential")
+        results = iter(["first", "second"])
+
+        async def call():
+            return next(results)
+
+        assert await flights.do("key", call) == "first"
+        assert await flights.do("key", call) == "second"
+
+    @pytest.mark.asyncio
+    async def test_errors_reach_every_waiter(self):
+        flights = SingleFlight("test_errors")
+        release = asyncio.Event()
+
+        async def call():
+            await release.wait()
+            raise ValueError("boom")
+
+        waiters = [asyncio.create_task(flights.do("key", call)) for _ in range(2)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+
+        assert [type(result) for result in results] == [ValueError, ValueError]
+
+    @pytest.mark.asyncio
+    async def test_flight_is_cancelled_only_when_every_waiter_left(self):
+        flights = SingleFlight("test_cancel")
+        release = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def call():
+            try:
+                await release.wait()
+                return "result"
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        first = asyncio.create_task(flights.do("key", call))
+        second = asyncio.create_task(flights.do("key", call))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        await asyncio.sleep(0)
+        assert not cancelled.is_set()
+
+        second.cancel()
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+
+
+class TestEstimateSize:
+    def test_nested_values_count_towards_size(self):
+        assert estimate_size({"a": "x" * 1000}) > estimate_size({"a": "x"}) + 900
+
+    def test_shared_references_are_counted_once(self):
+        text = "x" * 1000
+        assert estimate_size([text, text]) < 2 * estimate_size(text)
+
+
+class TestMetricsRegistry:
+    def test_render_prometheus_text(self):
+        registry = MetricsRegistry()
+        requests = registry.register(
+            Counter("requests_total", "Requests", labelnames=("status",))
+        )
+        requests.inc(status="ok")
+        requests.inc(2, status="ok")
+
+        assert registry.render() == (
+            "# HELP requests_total Requests\n"
+            "# TYPE requests_total counter\n"
+            'requests_total{status="ok"} 3.0\n'
+        )
+
+    def test_register_returns_existing_metric(self):
+        registry = MetricsRegistry()
+        first = registry.register(Counter("dup_total", "First"))
+
+        assert registry.register(Counter("dup_total", "Second")) is first
+
+    def test_wrong_labels_raise(self):
+        requests = Counter("labelled_total", "Requests", labelnames=("status",))
+
+        with pytest.raises(ValueError):
+            requests.inc()
@@ -0,0 +1,129 @@
+import asyncio
+import io
+import json
+import os
+import resource
+import time
+from unittest.mock import patch
+
+import pytest
+from extraction_jobs import hang_on_pdf
+
+from app.services import extraction_worker
+from app.services.content_extraction import (
+    content_extraction_service,
+    extractions,
+)
+from app.services.extraction_worker import ExtractionTimeout, run_job
+
+REPORT = {"revenue": 120, "segments": ["retail", "wholesale"]}
+
+
+@pytest.fixture
+def worker_pool():
+    with patch("app.services.content_extraction.settings.EXTRACTION_WORKERS", 1):
+        yield
+    content_extraction_service.shutdown()
+
+
+def _is_running(pid, wait=5):
+    """Whether pid is still running after wait seconds for it to be reaped."""
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+class TestExtractInWorker:
+    @pytest.mark.asyncio
+    async def test_json_is_formatted_in_a_worker_process(self, worker_pool):
+        text, metadata = await content_extraction_service.extract_content(
+            io.BytesIO(json.dumps(REPORT).encode()), "application/json", "r.json"
+        )
+
+        assert text == json.dumps(REPORT, indent=2)
+        assert metadata["is_valid_json"] is True
+
+    @pytest.mark.asyncio
+    async def test_invalid_files_report_the_error(self, worker_pool):
+        text, metadata = await content_extraction_service.extract_content(
+            io.BytesIO(b"{not json"), "application/json", "broken.json"
+        )
+
+        assert text == "[JSON: Could not process JSON file]"
+        assert "error" in metadata
+
+    @pytest.mark.asyncio
+    async def test_a_hung_worker_is_killed_and_queued_jobs_still_run(
+        self, worker_pool, tmp_path, monkeypatch
+    ):
+        pid_file = tmp_path / "hung.pid"
+        monkeypatch.setenv("HUNG_WORKER_PID_FILE", str(pid_file))
+        before = extractions.value(kind="json", outcome="timeout")
+
+        with (
+            patch("app.services.content_extraction.settings.EXTRACTION_TIMEOUT", 0.5),
+            patch("app.services.content_extraction.run_job", hang_on_pdf),
+        ):
+            hung = asyncio.create_task(
+                content_extraction_service.extract_content(
+                    io.BytesIO(b"%PDF"), "application/pdf", "stuck.pdf"
+                )
+            )
+            # Waits for the only worker longer than its own timeout
+            queued = asyncio.create_task(
+                content_extraction_service.extract_content(
+                    io.BytesIO(json.dumps(REPORT).encode()),
+                    "application/json",
+                    "r.json",
+                )
+            )
+
+            assert await hung == (
+                "[PDF: Could not process PDF file]",
+                {"error": "extraction_timeout"},
+            )
+            text, metadata = await queued
+
+        assert text == json.dumps(REPORT, indent=2)
+        assert extractions.value(kind="json", outcome="timeout") == before
+        assert not _is_running(int(pid_file.read_text()))
+
+    @pytest.mark.asyncio
+    async def test_exceeding_the_memory_limit_fails_the_job(self):
+        before = extractions.value(kind="json", outcome="memory_limit")
+
+        with (
+            patch("app.services.content_extraction.settings.EXTRACTION_WORKERS", 0),
+            patch("app.services.content_extraction.run_job", side_effect=MemoryError),
+        ):
+            text, metadata = await content_extraction_service.extract_content(
+                io.BytesIO(b"[]"), "application/json", "huge.json"
+            )
+
+        assert text == "[JSON: Could not process JSON file]"
+        assert metadata == {"error": "extraction_memory_limit"}
+        assert extractions.value(kind="json", outcome="memory_limit") == before + 1
+
+
+class TestRunJob:
+    def test_slow_jobs_time_out(self, tmp_path):
+        path = tmp_path / "slow.json"
+        path.write_bytes(b"[]")
+        cpu_limits = resource.getrlimit(resource.RLIMIT_CPU)
+
+        def hang(*args):
+            while True:
+                time.sleep(0.01)
+
+        with (
+            patch.object(extraction_worker, "extract", side_effect=hang),
+            pytest.raises(ExtractionTimeout),
+        ):
+            run_job(str(path), "application/json", 10000, timeout=0.05)
+
+        assert resource.getrlimit(resource.RLIMIT_CPU) == cpu_limits
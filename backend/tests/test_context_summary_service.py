@@ -0,0 +1,207 @@
+import asyncio
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from conftest import seed_conversation
+from sqlalchemy import select
+
+from app.models.chat import Conversation, Message
+from app.services.context_summary_service import (
+    ContextSummaryService,
+    context_summary_service,
+)
+
+
+def summary_thresholds(recent, minimum):
+    return (
+        patch(
+            "app.services.context_summary_service.settings.CONVERSATION_SUMMARY_RECENT_TOKENS",
+            recent,
+        ),
+        patch(
+            "app.services.context_summary_service.settings.CONVERSATION_SUMMARY_MIN_TOKENS",
+            minimum,
+        ),
+    )
+
+
+class TestUpdateSummary:
+    @pytest.mark.asyncio
+    async def test_folds_older_messages_and_keeps_recent_ones(self, test_db):
+        updated_at = await seed_conversation(test_db, 10, words=40)
+        recent, minimum = summary_thresholds(recent=100, minimum=50)
+
+        with (
+            recent,
+            minimum,
+            patch(
+                "app.services.context_summary_service.llm_service.summarize_conversation",
+                AsyncMock(return_value="Summary of 1-8"),
+            ) as mock_summarize,
+        ):
+            assert await context_summary_service.update_summary(1) is True
+
+        previous, folded = mock_summarize.call_args.args
+        assert previous is None
+        assert [msg.id for msg in folded] == list(range(1, 9))
+
+        async with test_db() as session:
+            conversation = await session.get(Conversation, 1)
+            assert conversation.context_summary == "Summary of 1-8"
+            assert conversation.context_summary_through_id == 8
+            # Summarizing must not reorder the sidebar
+            assert conversation.updated_at == updated_at
+
+            result = await session.execute(
+                context_summary_service.unsummarized_messages(1, conversation)
+            )
+            assert [msg.id for msg in result.scalars()] == [9, 10]
+
+    @pytest.mark.asyncio
+    async def test_extends_the_previous_summary(self, test_db):
+        await seed_conversation(test_db, 10, words=40)
+        async with test_db() as session:
+            conversation = await session.get(Conversation, 1)
+            conversation.context_summary = "Summary of 1-4"
+            conversation.context_summary_through_at = datetime(2024, 1, 1, 0, 4)
+            conversation.context_summary_through_id = 4
+            await session.commit()
+        recent, minimum = summary_thresholds(recent=100, minimum=50)
+
+        with (
+            recent,
+            minimum,
+            patch(
+                "app.services.context_summary_service.llm_service.summarize_conversation",
+                AsyncMock(return_value="Summary of 1-8"),
+            ) as mock_summarize,
+        ):
+            assert await context_summary_service.update_summary(1) is True
+
+        previous, folded = mock_summarize.call_args.args
+        assert previous == "Summary of 1-4"
+        assert [msg.id for msg in folded] == [5, 6, 7, 8]
+
+    @pytest.mark.asyncio
+    async def test_waits_until_enough_history_aged_out(self, test_db):
+        await seed_conversation(test_db, 4, words=40)
+        recent, minimum = summary_thresholds(recent=100, minimum=1000)
+
+        with (
+            recent,
+            minimum,
+            patch(
+                "app.services.context_summary_service.llm_service.summarize_conversation",
+                AsyncMock(),
+            ) as mock_summarize,
+        ):
+            assert await context_summary_service.update_summary(1) is False
+
+        mock_summarize.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_keeps_previous_summary_when_llm_fails(self, test_db):
+        await seed_conversation(test_db, 10, words=40)
+        recent, minimum = summary_thresholds(recent=100, minimum=50)
+
+        with (
+            recent,
+            minimum,
+            patch(
+                "app.services.context_summary_service.llm_service.summarize_conversation",
+                AsyncMock(return_value=None),
+            ),
+        ):
+            assert await context_summary_service.update_summary(1) is False
+
+        async with test_db() as session:
+            conversation = await session.get(Conversation, 1)
+            assert conversation.context_summary is None
+            assert conversation.context_summary_through_id is None
+
+
+class TestSchedule:
+    @pytest.mark.asyncio
+    async def test_coalesces_updates_for_the_same_conversation(self):
+        service = ContextSummaryService()
+        started = asyncio.Event()
+        release = asyncio.Event()
+        calls = []
+
+        async def update_summary(conversation_id):
+            calls.append(conversation_id)
+            started.set()
+            await release.wait()
+            return True
+
+        with patch.object(service, "update_summary", update_summary):
+            service.schedule(1)
+            await started.wait()
+            # Both arrive while the first pass runs: one more pass covers them
+            service.schedule(1)
+            service.schedule(1)
+            release.set()
+            await service.wait_idle()
+
+        assert calls == [1, 1]
+
+    @pytest.mark.asyncio
+    async def test_failed_update_does_not_stop_later_ones(self):
+        service = ContextSummaryService()
+
+        with patch.object(
+            service, "update_summary", AsyncMock(side_effect=Exception("DB error"))
+        ) as mock_update:
+            service.schedule(1)
+            await service.wait_idle()
+            service.schedule(1)
+            await service.wait_idle()
+
+        assert mock_update.await_count == 2
+
+
+class TestSummaryInPrompt:
+    @pytest.mark.asyncio
+    async def test_send_message_sends_summary_and_unsummarized_history(self, test_db):
+        from app.api.schema import schema
+
+        await seed_conversation(test_db, 10, words=40)
+        async with test_db() as session:
+            conversation = await session.get(Conversation, 1)
+            conversation.context_summary = "Summary of 1-8"
+            conversation.context_summary_through_at = datetime(2024, 1, 1, 0, 8)
+            conversation.context_summary_through_id = 8
+            await session.commit()
+
+        with (
+            patch(
+                "app.api.schema.llm_service.generate_response",
+                AsyncMock(return_value="Reply"),
+            ) as mock_generate,
+            patch("app.api.schema.context_summary_service.schedule") as mock_schedule,
+        ):
+            result = await schema.execute(
+                """
+                mutation {
+                    sendMessage(
+                        input: {conversationId: 1, type: "user", content: "Next"}
+                    ) {
+                        id
+                    }
+                }
+                """
+            )
+
+        assert result.errors is None
+        kwargs = mock_generate.call_args.kwargs
+        assert kwargs["summary"] == "Summary of 1-8"
+        assert [msg.id for msg in kwargs["conversation_history"]] == [9, 10]
+        mock_schedule.assert_called_once_with(1)
+
+        async with test_db() as session:
+            result = await session.execute(
+                select(Message).where(Message.conversation_id == 1)
+            )
+            # History outside the prompt is still stored in full
+            assert len(result.scalars().all()) == 12
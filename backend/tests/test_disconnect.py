@@ -0,0 +1,194 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from conftest import seed_conversation
+from sqlalchemy import select
+
+from app.api.dataloaders import Context
+from app.api.disconnect import (
+    ClientDisconnected,
+    cancel_on_disconnect,
+    cancelled_generations,
+    wait_for_pending,
+)
+from app.api.schema import schema
+from app.models.chat import Message
+
+SEND_MESSAGE = """
+    mutation SendMessage($input: MessageInput!) {
+        sendMessage(input: $input) { id content }
+    }
+"""
+
+SEND_MESSAGE_STREAM = """
+    subscription SendMessageStream($input: MessageInput!) {
+        sendMessageStream(input: $input) { delta done }
+    }
+"""
+
+INPUT = {"conversationId": 1, "type": "user", "content": "Next?"}
+
+
+class FakeRequest:
+    """An HTTP request whose client disconnects when `disconnect` is called."""
+
+    scope = {"type": "http"}
+
+    def __init__(self):
+        self._disconnected = asyncio.Event()
+
+    def disconnect(self):
+        self._disconnected.set()
+
+    async def receive(self):
+        await self._disconnected.wait()
+        return {"type": "http.disconnect"}
+
+
+class Hang:
+    """A call that never finishes, and notes when it starts and is cancelled."""
+
+    def __init__(self):
+        self.started = asyncio.Event()
+        self.cancelled = False
+
+    async def __call__(self, *args, **kwargs):
+        self.started.set()
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+async def stored_messages(session_factory):
+    async with session_factory() as session:
+        result = await session.execute(select(Message).order_by(Message.id))
+        return [(msg.type, msg.content) for msg in result.scalars().all()]
+
+
+class TestCancelOnDisconnect:
+    @pytest.mark.asyncio
+    async def test_returns_the_result_while_connected(self):
+        async def answer():
+            return 42
+
+        assert await cancel_on_disconnect(FakeRequest(), answer()) == 42
+
+    @pytest.mark.asyncio
+    async def test_cancels_the_call_on_disconnect(self):
+        request = FakeRequest()
+        hang = Hang()
+        task = asyncio.create_task(cancel_on_disconnect(request, hang()))
+        await hang.started.wait()
+
+        request.disconnect()
+
+        with pytest.raises(ClientDisconnected):
+            await task
+        assert hang.cancelled
+
+    @pytest.mark.asyncio
+    async def test_without_a_request_it_just_awaits(self):
+        async def answer():
+            return 42
+
+        assert await cancel_on_disconnect(None, answer()) == 42
+
+
+class TestSendMessageDisconnect:
+    @pytest.mark.asyncio
+    async def test_reply_is_cancelled_and_not_saved(self, test_db):
+        await seed_conversation(test_db)
+        request = FakeRequest()
+        context = Context()
+        context.request = request
+        hang = Hang()
+        labels = {"operation": "sendMessage", "persisted": "false"}
+        cancelled_before = cancelled_generations.value(**labels)
+
+        with patch("app.api.schema.llm_service.generate_response", new=hang):
+            execution = asyncio.create_task(
+                schema.execute(
+                    SEND_MESSAGE,
+                    variable_values={"input": INPUT},
+                    context_value=context,
+                )
+            )
+            await hang.started.wait()
+            request.disconnect()
+            result = await execution
+
+        assert result.errors is None
+        assert result.data["sendMessage"]["content"] == "Next?"
+        assert hang.cancelled
+        assert await stored_messages(test_db) == [("user", "Next?")]
+        assert cancelled_generations.value(**labels) == cancelled_before + 1
+
+
+class TestSendMessageStreamDisconnect:
+    @pytest.fixture
+    def reply(self):
+        """Streams `reply["deltas"]`, then waits for tokens that never come."""
+        reply = {"deltas": [], "closed": False}
+
+        async def stream_response(**kwargs):
+            try:
+                for delta in reply["deltas"]:
+                    yield delta
+                await asyncio.Event().wait()
+            finally:
+                reply["closed"] = True
+
+        with patch(
+            "app.api.schema.llm_service.stream_response", side_effect=stream_response
+        ):
+            yield reply
+
+    async def subscribe_and_leave(self, reply):
+        generator = await schema.subscribe(
+            SEND_MESSAGE_STREAM,
+            variable_values={"input": INPUT},
+            context_value=Context(),
+        )
+        # The saved user message, then the deltas
+        for _ in range(1 + len(reply["deltas"])):
+            await generator.__anext__()
+
+        # Leave while the next token is awaited
+        waiting = asyncio.create_task(generator.__anext__())
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        await generator.aclose()
+        await wait_for_pending()
+
+    @pytest.mark.asyncio
+    async def test_seen_part_of_the_reply_is_kept(self, test_db, reply):
+        await seed_conversation(test_db)
+        reply["deltas"] = ["Agent ", "reply"]
+        labels = {"operation": "sendMessageStream", "persisted": "true"}
+        cancelled_before = cancelled_generations.value(**labels)
+
+        await self.subscribe_and_leave(reply)
+
+        assert reply["closed"]
+        assert await stored_messages(test_db) == [
+            ("user", "Next?"),
+            ("agent", "Agent reply"),
+        ]
+        assert cancelled_generations.value(**labels) == cancelled_before + 1
+
+    @pytest.mark.asyncio
+    async def test_nothing_is_saved_before_the_first_delta(self, test_db, reply):
+        await seed_conversation(test_db)
+        labels = {"operation": "sendMessageStream", "persisted": "false"}
+        cancelled_before = cancelled_generations.value(**labels)
+
+        await self.subscribe_and_leave(reply)
+
+        assert reply["closed"]
+        assert await stored_messages(test_db) == [("user", "Next?")]
+        assert cancelled_generations.value(**labels) == cancelled_before + 1
@@ -0,0 +1,182 @@
+import asyncio
+import json
+import random
+import socket
+from unittest.mock import patch
+
+import httpx
+import pytest
+import pytest_asyncio
+import uvicorn
+
+from app.services.llm_metrics import LLMCallStats
+from app.services.llm_router import Endpoint, EndpointPool
+from app.services.llm_service import LLMService
+from fake_llm_server import FakeLLMConfig, LatencyDistribution, create_app
+
+REQUEST = {
+    "model": "fake-model",
+    "messages": [{"role": "user", "content": "How did Q3 go?"}],
+}
+
+
+def client_for(app):
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://fake"
+    )
+
+
+@pytest_asyncio.fixture
+async def fake_llm():
+    """A fake provider listening on a local port, for the real LiteLLM path."""
+    app = create_app(
+        FakeLLMConfig(latency=LatencyDistribution.parse("fixed:0.01"), reply_tokens=8)
+    )
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+    task = asyncio.create_task(server.serve(sockets=[sock]))
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    pool = EndpointPool(
+        "fake",
+        [
+            Endpoint(
+                model="openai/fake-model",
+                base_url=f"http://127.0.0.1:{sock.getsockname()[1]}/v1",
+                api_key="fake",
+            )
+        ],
+    )
+    with patch("app.services.llm_service.llm_pool", pool):
+        yield app
+
+    server.should_exit = True
+    await task
+
+
+class TestLatencyDistribution:
+    def test_parses_specs(self):
+        rng = random.Random(1)
+
+        assert LatencyDistribution.parse("fixed:0.5").sample(rng) == 0.5
+        assert 1 <= LatencyDistribution.parse("uniform:1:2").sample(rng) <= 2
+        assert LatencyDistribution.parse("lognormal:0.8:0.5").sample(rng) > 0
+        with pytest.raises(ValueError):
+            LatencyDistribution.parse("normal:1")
+
+
+class TestFakeLLMServer:
+    @pytest.mark.asyncio
+    async def test_replies_are_deterministic(self):
+        async with client_for(create_app(FakeLLMConfig())) as client:
+            first = (await client.post("/v1/chat/completions", json=REQUEST)).json()
+            second = (await client.post("/v1/chat/completions", json=REQUEST)).json()
+            other = (
+                await client.post(
+                    "/v1/chat/completions",
+                    json={**REQUEST, "messages": [{"role": "user", "content": "Hi"}]},
+                )
+            ).json()
+
+        content = first["choices"][0]["message"]["content"]
+        assert content == second["choices"][0]["message"]["content"]
+        assert content != other["choices"][0]["message"]["content"]
+        assert first["usage"]["completion_tokens"] == 60
+
+    @pytest.mark.asyncio
+    async def test_streams_the_same_reply(self):
+        app = create_app(FakeLLMConfig(reply_tokens=5, tokens_per_second=1000))
+        async with client_for(app) as client:
+            reply = (await client.post("/v1/chat/completions", json=REQUEST)).json()
+            response = await client.post(
+                "/v1/chat/completions", json={**REQUEST, "stream": True}
+            )
+
+        events = [
+            line.removeprefix("data: ")
+            for line in response.text.splitlines()
+            if line.startswith("data: ")
+        ]
+        assert events[-1] == "[DONE]"
+        chunks = [json.loads(event) for event in events[:-1]]
+        streamed = "".join(
+            chunk["choices"][0]["delta"].get("content", "") for chunk in chunks
+        )
+        assert streamed == reply["choices"][0]["message"]["content"]
+        assert chunks[-1]["choices"][0]["finish_reason"] == "stop"
+        assert app.state.stats.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_streams_usage_only_when_asked(self):
+        app = create_app(FakeLLMConfig(reply_tokens=5))
+        async with client_for(app) as client:
+            responses = [
+                await client.post(
+                    "/v1/chat/completions",
+                    json={**REQUEST, "stream": True, **options},
+                )
+                for options in ({}, {"stream_options": {"include_usage": True}})
+            ]
+
+        plain, with_usage = [
+            [
+                json.loads(line.removeprefix("data: "))
+                for line in response.text.splitlines()
+                if line.startswith("data: {")
+            ]
+            for response in responses
+        ]
+        assert not any("usage" in chunk for chunk in plain)
+        assert with_usage[-1]["choices"] == []
+        assert with_usage[-1]["usage"]["completion_tokens"] == 5
+
+    @pytest.mark.asyncio
+    async def test_max_tokens_caps_the_reply(self):
+        async with client_for(create_app(FakeLLMConfig())) as client:
+            response = await client.post(
+                "/v1/chat/completions", json={**REQUEST, "max_tokens": 3}
+            )
+
+        assert response.json()["usage"]["completion_tokens"] == 3
+
+    @pytest.mark.asyncio
+    async def test_injects_errors(self):
+        app = create_app(FakeLLMConfig(error_rate=1, error_status=429))
+        async with client_for(app) as client:
+            response = await client.post("/v1/chat/completions", json=REQUEST)
+
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "1"
+        assert app.state.stats.errors == 1
+
+    @pytest.mark.asyncio
+    async def test_tracks_concurrency(self):
+        app = create_app(FakeLLMConfig(latency=LatencyDistribution("fixed", [0.05])))
+        async with client_for(app) as client:
+            await asyncio.gather(
+                *(client.post("/v1/chat/completions", json=REQUEST) for _ in range(5))
+            )
+            stats = (await client.get("/stats")).json()
+
+        assert stats["requests"] == 5
+        assert stats["peak_in_flight"] == 5
+        assert stats["in_flight"] == 0
+
+
+class TestEndToEnd:
+    @pytest.mark.asyncio
+    async def test_llm_service_through_litellm(self, fake_llm):
+        stats = LLMCallStats()
+
+        reply = await LLMService().generate_response("How did Q3 go?", stats=stats)
+        deltas = [
+            delta async for delta in LLMService().stream_response("How did Q3 go?")
+        ]
+
+        assert len(reply.split()) == 8
+        assert stats.outcome == "ok"
+        assert stats.completion_tokens == 8
+        assert len("".join(deltas).split()) == 8
+        assert fake_llm.state.stats.requests == 2
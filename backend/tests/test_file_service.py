@@ -0,0 +1,278 @@
+import asyncio
+import hashlib
+import io
+import json
+import os
+from tempfile import SpooledTemporaryFile
+from unittest.mock import patch
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+from sqlalchemy import select
+from starlette.datastructures import Headers
+
+from app.core.config import settings
+from app.models.file import StoredFile
+from app.services.content_extraction import content_extraction_service
+from app.services.derivative_store import derivative_store
+from app.services.file_service import file_content_cache, file_service, small_metadata
+from tests.test_schema import count_queries
+
+
+async def seed_files(session_factory, count):
+    async with session_factory() as session:
+        for i in range(1, count + 1):
+            session.add(
+                StoredFile(
+                    id=i,
+                    filename=f"{i}.txt",
+                    original_filename=f"report-{i}.txt",
+                    content_type="text/plain",
+                    file_size=10,
+                    s3_key=f"uploads/{i}.txt",
+                    file_hash=f"hash-{i}",
+                    extracted_text=f"Content {i}",
+                    file_metadata=json.dumps({"extension": "txt"}),
+                )
+            )
+        await session.commit()
+
+
+class TestGetFilesContent:
+    @pytest.mark.asyncio
+    async def test_returns_content_in_requested_order(self, test_db):
+        await seed_files(test_db, 3)
+
+        contents = await file_service.get_files_content([3, 1, 99, 1])
+
+        assert [content["id"] for content in contents] == [3, 1, 1]
+        assert contents[0]["extracted_text"] == "Content 3"
+        assert contents[0]["file_hash"] == "hash-3"
+        assert contents[0]["metadata"] == {"extension": "txt"}
+
+    @pytest.mark.asyncio
+    async def test_misses_load_in_one_query_and_hits_skip_the_database(self, test_db):
+        await seed_files(test_db, 3)
+        statements = count_queries(test_db, "stored_files")
+
+        await file_service.get_files_content([1, 2])
+        await file_service.get_files_content([1, 2, 3])
+        await file_service.get_files_content([3, 2, 1])
+
+        assert len(statements) == 2
+        assert len(file_content_cache) == 3
+
+    @pytest.mark.asyncio
+    async def test_deleting_a_file_drops_its_cached_content(self, test_db):
+        await seed_files(test_db, 1)
+        await file_service.get_files_content([1])
+
+        with patch("app.services.file_service.s3_service"):
+            assert await file_service.delete_file(1) is True
+
+        assert await file_service.get_files_content([1]) == []
+
+
+class TestFileMetadata:
+    def test_keeps_only_small_scalar_fields(self):
+        metadata = {
+            "type": "image",
+            "width": 640,
+            "is_valid_json": True,
+            "error": None,
+            "base64_data": "A" * 10000,
+            "pages": [1, 2],
+        }
+
+        assert small_metadata(metadata) == {
+            "type": "image",
+            "width": 640,
+            "is_valid_json": True,
+            "error": None,
+        }
+
+    @pytest.mark.asyncio
+    async def test_deleting_a_file_drops_its_derivatives(self, test_db, s3):
+        await seed_files(test_db, 2)
+        await derivative_store.put("uploads/1.txt", "summary", b"one", "text/plain")
+        await derivative_store.put("uploads/2.txt", "summary", b"two", "text/plain")
+
+        await file_service.delete_file(1)
+
+        assert await derivative_store.get("uploads/1.txt", "summary") is None
+        assert await derivative_store.get("uploads/2.txt", "summary") == b"two"
+        assert stored_objects(s3) == ["uploads/2.txt.derivative/summary"]
+
+
+def upload(data, filename="notes.txt", content_type="text/plain"):
+    spooled = SpooledTemporaryFile(max_size=1024 * 1024)
+    spooled.write(data)
+    spooled.seek(0)
+    return UploadFile(
+        file=spooled,
+        filename=filename,
+        headers=Headers({"content-type": content_type}),
+    )
+
+
+def stored_objects(s3):
+    objects = s3.client.list_objects_v2(Bucket=settings.S3_BUCKET_NAME)
+    return [obj["Key"] for obj in objects.get("Contents", [])]
+
+
+def open_multipart_uploads(s3):
+    uploads = s3.client.list_multipart_uploads(Bucket=settings.S3_BUCKET_NAME)
+    return uploads.get("Uploads", [])
+
+
+class TestUploadFiles:
+    @pytest.mark.asyncio
+    async def test_small_files_are_hashed_and_sent_in_one_request(self, test_db, s3):
+        data = b"Quarterly revenue grew 12%."
+
+        [uploaded] = await file_service.upload_files([upload(data)])
+
+        stored = await file_service.get_file(uploaded["id"])
+        assert stored.file_hash == hashlib.sha256(data).hexdigest()
+        assert stored.file_size == len(data)
+        assert stored.extracted_text == data.decode()
+        assert s3.download_file(stored.s3_key) == data
+
+    @pytest.mark.asyncio
+    async def test_large_files_stream_as_multipart_uploads(self, test_db, s3):
+        part_size = 5 * 1024 * 1024
+        data = os.urandom(2 * part_size + 1000)
+        parts = []
+        upload_part = s3.upload_part
+
+        def record_part(key, upload_id, part_number, body):
+            parts.append((part_number, len(body)))
+            return upload_part(key, upload_id, part_number, body)
+
+        with (
+            patch("app.services.file_service.settings.UPLOAD_PART_SIZE", part_size),
+            patch.object(s3, "upload_part", side_effect=record_part),
+        ):
+            [uploaded] = await file_service.upload_files([upload(data)])
+
+        stored = await file_service.get_file(uploaded["id"])
+        assert parts == [(1, part_size), (2, part_size), (3, 1000)]
+        assert stored.file_hash == hashlib.sha256(data).hexdigest()
+        assert s3.download_file(stored.s3_key) == data
+        assert len(stored.extracted_text) <= 10000 + len("... [truncated]")
+
+    @pytest.mark.asyncio
+    async def test_oversized_files_are_rejected_while_streaming(self, test_db, s3):
+        part_size = 5 * 1024 * 1024
+
+        with (
+            patch("app.services.file_service.settings.UPLOAD_PART_SIZE", part_size),
+            patch.object(file_service, "max_file_size", part_size + 10),
+            pytest.raises(HTTPException) as error,
+        ):
+            await file_service.upload_files([upload(b"x" * (2 * part_size))])
+
+        assert error.value.status_code == 413
+        assert open_multipart_uploads(s3) == []
+        assert stored_objects(s3) == []
+
+    @pytest.mark.asyncio
+    async def test_duplicates_keep_only_the_first_copy(self, test_db, s3):
+        first = await file_service.upload_files([upload(b"Same bytes")])
+        second = await file_service.upload_files(
+            [upload(b"Same bytes", filename="copy.txt")]
+        )
+
+        assert second[0]["id"] == first[0]["id"]
+        assert second[0]["isDuplicate"] is True
+        assert len(stored_objects(s3)) == 1
+
+    @pytest.mark.asyncio
+    async def test_only_images_are_downscaled_for_vision_models(self, test_db, s3):
+        image = io.BytesIO()
+        Image.new("RGB", (64, 32), "red").save(image, format="PNG")
+
+        with patch("app.services.file_service.image_service.prepare_upload") as prepare:
+            [uploaded, _] = await file_service.upload_files(
+                [
+                    upload(image.getvalue(), "chart.png", "image/png"),
+                    upload(b'{"width": 64}', "size.json", "application/json"),
+                ]
+            )
+
+        stored = await file_service.get_file(uploaded["id"])
+        [(s3_key, _)] = [c.args for c in prepare.call_args_list]
+        assert s3_key == stored.s3_key
+
+    @pytest.mark.asyncio
+    async def test_batches_are_processed_concurrently_within_the_bound(
+        self, test_db, s3
+    ):
+        in_flight = peak = 0
+        stream_to_s3 = file_service._stream_to_s3
+
+        async def slow_stream(*args):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.05)
+            in_flight -= 1
+            return await stream_to_s3(*args)
+
+        with (
+            patch("app.services.file_service.settings.UPLOAD_CONCURRENCY", 3),
+            patch.object(file_service, "_stream_to_s3", side_effect=slow_stream),
+        ):
+            uploaded = await file_service.upload_files(
+                [upload(f"File {i}".encode(), filename=f"{i}.txt") for i in range(5)]
+            )
+
+        assert peak == 3
+        assert [file["fileName"] for file in uploaded] == [f"{i}.txt" for i in range(5)]
+
+    @pytest.mark.asyncio
+    async def test_duplicates_are_found_in_one_query(self, test_db, s3):
+        [first] = await file_service.upload_files([upload(b"Stored before")])
+        statements = count_queries(test_db, "stored_files")
+
+        uploaded = await file_service.upload_files(
+            [
+                upload(b"Stored before", filename="again.txt"),
+                upload(b"New", filename="new.txt"),
+                upload(b"New", filename="new-copy.txt"),
+            ]
+        )
+
+        assert len(statements) == 1
+        assert [file["isDuplicate"] for file in uploaded] == [True, False, True]
+        assert uploaded[0]["id"] == first["id"]
+        assert uploaded[2]["id"] == uploaded[1]["id"]
+        assert len(stored_objects(s3)) == 2
+
+    @pytest.mark.asyncio
+    async def test_a_failing_file_stores_nothing(self, test_db, s3):
+        extract_content = content_extraction_service.extract_content
+
+        async def fail_on_broken(file_obj, content_type, filename):
+            if filename == "broken.txt":
+                raise RuntimeError("extractor crashed")
+            return await extract_content(file_obj, content_type, filename)
+
+        with (
+            patch(
+                "app.services.file_service.content_extraction_service.extract_content",
+                side_effect=fail_on_broken,
+            ),
+            pytest.raises(HTTPException) as error,
+        ):
+            await file_service.upload_files(
+                [upload(b"Fine"), upload(b"Broken", filename="broken.txt")]
+            )
+
+        assert error.value.status_code == 500
+        assert "broken.txt" in error.value.detail
+        assert stored_objects(s3) == []
+        async with test_db() as session:
+            result = await session.execute(select(StoredFile))
+            assert result.scalars().all() == []
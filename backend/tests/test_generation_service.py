@@ -0,0 +1,246 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from conftest import seed_conversation
+
+from app.api.dataloaders import Context
+from app.api.schema import schema
+from app.models.chat import GenerationJob, Message
+from app.services.generation_service import generation_service
+
+SEND_MESSAGE_ASYNC = """
+    mutation SendMessageAsync($input: MessageInput!) {
+        sendMessageAsync(input: $input) {
+            id
+            status
+            userMessage { content }
+            agentMessage { content }
+        }
+    }
+"""
+
+GENERATION_STATUS = """
+    query GenerationStatus($jobId: Int!) {
+        generationStatus(jobId: $jobId) {
+            status
+            error
+            agentMessage { type content }
+        }
+    }
+"""
+
+
+async def seed_jobs(session_factory, count, status="pending", attempts=0):
+    async with session_factory() as session:
+        for i in range(1, count + 1):
+            session.add(
+                Message(id=100 + i, conversation_id=1, type="user", content=f"Ask {i}")
+            )
+            session.add(
+                GenerationJob(
+                    id=i,
+                    conversation_id=1,
+                    user_message_id=100 + i,
+                    status=status,
+                    attempts=attempts,
+                )
+            )
+        await session.commit()
+
+
+async def send_message_async(content="Next?"):
+    result = await schema.execute(
+        SEND_MESSAGE_ASYNC,
+        variable_values={
+            "input": {"conversationId": 1, "type": "user", "content": content}
+        },
+        context_value=Context(),
+    )
+    assert result.errors is None
+    return result.data["sendMessageAsync"]
+
+
+async def generation_status(job_id):
+    result = await schema.execute(
+        GENERATION_STATUS, variable_values={"jobId": job_id}, context_value=Context()
+    )
+    assert result.errors is None
+    return result.data["generationStatus"]
+
+
+class TestSendMessageAsync:
+    @pytest.fixture(autouse=True)
+    def mock_llm(self):
+        with patch(
+            "app.services.generation_service.llm_service.complete_response",
+            new=AsyncMock(return_value="Agent reply"),
+        ) as mock_generate:
+            yield mock_generate
+
+    @pytest.mark.asyncio
+    async def test_returns_before_the_reply_is_generated(self, test_db, mock_llm):
+        await seed_conversation(test_db)
+
+        job = await send_message_async()
+
+        assert job["status"] == "pending"
+        assert job["userMessage"] == {"content": "Next?"}
+        assert job["agentMessage"] is None
+        mock_llm.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_workers_store_the_reply(self, test_db, mock_llm):
+        await seed_conversation(test_db, messages=2)
+        await generation_service.start()
+
+        job = await send_message_async()
+        await generation_service.wait_idle()
+
+        status = await generation_status(job["id"])
+        assert status["status"] == "completed"
+        assert status["agentMessage"] == {"type": "agent", "content": "Agent reply"}
+
+        kwargs = mock_llm.call_args.kwargs
+        assert kwargs["user_message"] == "Next?"
+        assert [msg.content for msg in kwargs["conversation_history"]] == [
+            "Message 1",
+            "Message 2",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_call_stats_are_stored_on_the_reply(self, test_db, mock_llm):
+        await seed_conversation(test_db)
+
+        async def generate_response(stats, **kwargs):
+            stats.operation = "response"
+            stats.model = "grok/grok-beta"
+            stats.completion_tokens = 7
+            return "Agent reply"
+
+        mock_llm.side_effect = generate_response
+        await generation_service.start()
+
+        job = await send_message_async()
+        await generation_service.wait_idle()
+
+        async with test_db() as session:
+            job = await session.get(GenerationJob, job["id"])
+            reply = await session.get(Message, job.agent_message_id)
+        assert reply.generation_stats["model"] == "grok/grok-beta"
+        assert reply.generation_stats["completion_tokens"] == 7
+
+    @pytest.mark.asyncio
+    async def test_failed_generation_is_reported(self, test_db, mock_llm):
+        await seed_conversation(test_db)
+        mock_llm.side_effect = Exception("API Error")
+        await generation_service.start()
+
+        job = await send_message_async()
+        await generation_service.wait_idle()
+
+        status = await generation_status(job["id"])
+        assert status["status"] == "failed"
+        assert status["error"] == "API Error"
+        assert status["agentMessage"] is None
+
+    @pytest.mark.asyncio
+    async def test_rejects_agent_messages(self, test_db):
+        await seed_conversation(test_db)
+
+        result = await schema.execute(
+            SEND_MESSAGE_ASYNC,
+            variable_values={
+                "input": {"conversationId": 1, "type": "agent", "content": "Hi"}
+            },
+        )
+
+        assert result.errors is not None
+
+    @pytest.mark.asyncio
+    async def test_unknown_job_has_no_status(self, test_db):
+        assert await generation_status(42) is None
+
+
+class TestGenerationWorkers:
+    @pytest.mark.asyncio
+    async def test_start_requeues_unfinished_jobs(self, test_db):
+        await seed_conversation(test_db)
+        await seed_jobs(test_db, 2, status="running", attempts=1)
+
+        with patch(
+            "app.services.generation_service.llm_service.complete_response",
+            new=AsyncMock(return_value="Agent reply"),
+        ):
+            assert await generation_service.start() == 2
+            await generation_service.wait_idle()
+
+        async with test_db() as session:
+            for job_id in (1, 2):
+                job = await session.get(GenerationJob, job_id)
+                assert job.status == "completed"
+                assert job.attempts == 2
+
+    @pytest.mark.asyncio
+    async def test_provider_errors_fail_the_job(self, test_db):
+        await seed_conversation(test_db)
+        await seed_jobs(test_db, 1)
+
+        with patch(
+            "app.services.llm_service.LLMService._complete",
+            new=AsyncMock(side_effect=Exception("Rate limit exceeded")),
+        ):
+            await generation_service.start()
+            await generation_service.wait_idle()
+
+        status = await generation_status(1)
+        assert status["status"] == "failed"
+        assert status["error"] == "Rate limit exceeded"
+        assert status["agentMessage"] is None
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_max_attempts(self, test_db):
+        await seed_conversation(test_db)
+        await seed_jobs(test_db, 1, status="running", attempts=3)
+
+        with (
+            patch(
+                "app.services.generation_service.settings.GENERATION_MAX_ATTEMPTS", 3
+            ),
+            patch(
+                "app.services.generation_service.llm_service.complete_response",
+                new=AsyncMock(),
+            ) as mock_generate,
+        ):
+            await generation_service.start()
+            await generation_service.wait_idle()
+
+        mock_generate.assert_not_called()
+        status = await generation_status(1)
+        assert status["status"] == "failed"
+        assert status["error"] == "Gave up after 3 attempts"
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded_by_workers(self, test_db):
+        await seed_conversation(test_db)
+        await seed_jobs(test_db, 5)
+        in_flight = 0
+        peak = 0
+
+        async def generate_response(**kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return "Agent reply"
+
+        with patch(
+            "app.services.generation_service.llm_service.complete_response",
+            new=AsyncMock(side_effect=generate_response),
+        ) as mock_generate:
+            await generation_service.start(workers=2)
+            await generation_service.wait_idle()
+
+        assert mock_generate.await_count == 5
+        assert peak == 2
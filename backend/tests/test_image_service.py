@@ -0,0 +1,143 @@
+import base64
+import io
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+from sqlalchemy import select
+
+from app.models.file import FileDerivative
+from app.services.content_extraction import content_extraction_service
+from app.services.image_service import downscale_image, image_cache, image_service
+
+
+def make_image(size, mode="RGB", image_format="PNG"):
+    output = io.BytesIO()
+    Image.new(mode, size, "red").save(output, format=image_format)
+    return output.getvalue()
+
+
+def decode_part(part):
+    url = part["image_url"]["url"]
+    assert url.startswith("data:image/jpeg;base64,")
+    return Image.open(io.BytesIO(base64.b64decode(url.split(",", 1)[1])))
+
+
+@pytest.fixture(autouse=True)
+def empty_image_cache():
+    image_cache.clear()
+    yield
+    image_cache.clear()
+
+
+class TestDownscaleImage:
+    def test_fits_within_max_dimension_keeping_aspect_ratio(self):
+        derivative = Image.open(
+            io.BytesIO(downscale_image(make_image((4000, 2000)), 1024, 85))
+        )
+
+        assert derivative.format == "JPEG"
+        assert derivative.size == (1024, 512)
+
+    def test_small_images_keep_their_size(self):
+        derivative = Image.open(
+            io.BytesIO(downscale_image(make_image((300, 200)), 1024, 85))
+        )
+
+        assert derivative.size == (300, 200)
+
+    def test_transparent_images_are_flattened(self):
+        data = make_image((64, 64), mode="RGBA")
+
+        derivative = Image.open(io.BytesIO(downscale_image(data, 1024, 85)))
+
+        assert derivative.mode == "RGB"
+
+
+class TestImagePart:
+    FILE = {
+        "id": 1,
+        "file_hash": "hash-1",
+        "filename": "chart.png",
+        "s3_key": "uploads/chart.png",
+    }
+
+    def store_original(self, s3, data):
+        s3.put_file(io.BytesIO(data), self.FILE["s3_key"], "image/png")
+
+    def original_downloads(self, download):
+        return [c for c in download.call_args_list if c.args == (self.FILE["s3_key"],)]
+
+    @pytest.mark.asyncio
+    async def test_downloads_once_and_caches_by_file(self, test_db, s3):
+        self.store_original(s3, make_image((2048, 2048)))
+
+        with patch.object(s3, "download_file", wraps=s3.download_file) as download:
+            part = await image_service.image_part(self.FILE)
+            again = await image_service.image_part(self.FILE)
+
+        assert len(self.original_downloads(download)) == 1
+        assert again == part
+        assert decode_part(part).size == (1024, 1024)
+
+    @pytest.mark.asyncio
+    async def test_derivatives_are_stored_in_s3_beside_the_original(self, test_db, s3):
+        self.store_original(s3, make_image((64, 64)))
+
+        await image_service.image_part(self.FILE)
+
+        async with test_db() as session:
+            derivative = (await session.execute(select(FileDerivative))).scalar_one()
+        assert derivative.key == "uploads/chart.png.derivative/llm_image/1024/85"
+        assert derivative.kind == "llm_image/1024/85"
+        body = s3.download_file(derivative.key)
+        assert derivative.size == len(body)
+        assert Image.open(io.BytesIO(body)).format == "JPEG"
+
+    @pytest.mark.asyncio
+    async def test_uploaded_images_are_prepared_up_front(self, test_db, s3):
+        await image_service.prepare_upload("uploads/chart.png", make_image((100, 50)))
+        image_cache.clear()
+
+        # The original was never stored, so only the derivative can be read
+        part = await image_service.image_part(self.FILE)
+
+        assert decode_part(part).size == (100, 50)
+
+    @pytest.mark.asyncio
+    async def test_derivative_outlives_the_memory_cache(self, test_db, s3):
+        self.store_original(s3, make_image((64, 64)))
+
+        with patch.object(s3, "download_file", wraps=s3.download_file) as download:
+            part = await image_service.image_part(self.FILE)
+            image_cache.clear()
+            again = await image_service.image_part(self.FILE)
+
+        assert len(self.original_downloads(download)) == 1
+        assert again == part
+
+    @pytest.mark.asyncio
+    async def test_unreadable_images_give_no_part(self, test_db, s3):
+        self.store_original(s3, b"not an image")
+
+        assert await image_service.image_part(self.FILE) is None
+
+
+class TestImageExtraction:
+    @pytest.mark.asyncio
+    async def test_metadata_describes_the_image_without_its_data(self):
+        data = make_image((640, 480), image_format="JPEG")
+
+        text, metadata = await content_extraction_service.extract_content(
+            io.BytesIO(data), "image/jpeg", "photo.jpg"
+        )
+
+        assert "640x480" in text
+        assert metadata == {
+            "type": "image",
+            "content_type": "image/jpeg",
+            "format": "JPEG",
+            "width": 640,
+            "height": 480,
+            "size": len(data),
+        }
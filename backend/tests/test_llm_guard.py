@@ -0,0 +1,317 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.core.metrics import metrics_registry
+from app.services.llm_guard import (
+    CircuitBreaker,
+    LLMGuard,
+    LLMUnavailableError,
+    TokenBucket,
+    circuit_transitions,
+    is_retryable,
+    retry_after,
+)
+from app.services.llm_service import LLMService
+
+
+class FakeClock:
+    """Monotonic clock that only moves when sleeping."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        headers = {"retry-after": retry_after} if retry_after else {}
+        self.response = SimpleNamespace(headers=headers)
+
+
+@pytest.fixture
+def clock():
+    clock = FakeClock()
+    with patch("app.services.llm_guard.asyncio.sleep", clock.sleep):
+        yield clock
+
+
+def make_guard(clock, **options):
+    defaults = dict(
+        max_concurrent=2,
+        requests_per_minute=0,
+        tokens_per_minute=0,
+        max_retries=2,
+        backoff_base=1,
+        backoff_max=10,
+        queue_timeout=5,
+        breaker=CircuitBreaker(failure_threshold=2, reset_seconds=30, clock=clock),
+    )
+    return LLMGuard(**{**defaults, **options}, clock=clock)
+
+
+async def guarded_call(guard, call, tokens=10):
+    async with guard.limit(tokens):
+        return await guard.retry(call)
+
+
+class TestTokenBucket:
+    @pytest.mark.asyncio
+    async def test_waits_for_refill_once_the_burst_is_spent(self, clock):
+        bucket = TokenBucket(rate=2, capacity=4, clock=clock)
+
+        for _ in range(4):
+            await bucket.acquire()
+        assert clock.sleeps == []
+
+        await bucket.acquire(3)
+        assert clock.sleeps == [1.5]
+
+    @pytest.mark.asyncio
+    async def test_oversized_request_waits_for_a_full_bucket(self, clock):
+        bucket = TokenBucket(rate=1, capacity=5, clock=clock)
+        await bucket.acquire(5)
+
+        await bucket.acquire(50)
+
+        assert clock.sleeps == [5]
+
+    @pytest.mark.asyncio
+    async def test_zero_rate_disables_the_limit(self, clock):
+        bucket = TokenBucket(rate=0, capacity=1, clock=clock)
+
+        for _ in range(10):
+            await bucket.acquire(100)
+
+        assert clock.sleeps == []
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_failures(self, clock):
+        breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30, clock=clock)
+
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.allow() is False
+        assert breaker.retry_in == 30
+
+    def test_half_open_lets_one_probe_through(self, clock):
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30, clock=clock)
+        breaker.record_failure()
+        clock.now = 30
+
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.allow() is True
+        assert breaker.allow() is False
+
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_failed_probe_reopens(self, clock):
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30, clock=clock)
+        breaker.record_failure()
+        clock.now = 30
+        assert breaker.allow() is True
+
+        breaker.record_failure()
+
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.retry_in == 30
+
+    def test_peeking_does_not_change_the_state(self, clock):
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30, clock=clock)
+        breaker.record_failure()
+        clock.now = 30
+        half_opened = circuit_transitions.value(state=CircuitBreaker.HALF_OPEN)
+
+        assert breaker.peek() == CircuitBreaker.HALF_OPEN
+        assert circuit_transitions.value(state=CircuitBreaker.HALF_OPEN) == half_opened
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert (
+            circuit_transitions.value(state=CircuitBreaker.HALF_OPEN) == half_opened + 1
+        )
+
+
+class TestLLMGuard:
+    def test_classifies_provider_errors(self):
+        assert is_retryable(ProviderError(429))
+        assert is_retryable(ProviderError(503))
+        assert not is_retryable(ProviderError(400))
+        assert not is_retryable(ValueError("bad"))
+        assert retry_after(ProviderError(429, retry_after="7")) == 7
+        assert retry_after(ProviderError(429)) is None
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_capped(self):
+        guard = make_guard(FakeClock(), max_concurrent=2)
+        in_flight = 0
+        peak = 0
+
+        async def call():
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+        await asyncio.gather(*(guarded_call(guard, call) for _ in range(6)))
+
+        assert peak == 2
+        assert guard.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_retries_rate_limits_with_backoff(self, clock):
+        guard = make_guard(clock)
+        call = AsyncMock(side_effect=[ProviderError(429), ProviderError(502), "ok"])
+
+        with patch("app.services.llm_guard.random.uniform", return_value=1):
+            assert await guarded_call(guard, call) == "ok"
+
+        assert call.await_count == 3
+        # Exponential backoff from backoff_base
+        assert clock.sleeps == [1, 2]
+        assert guard.breaker.state == CircuitBreaker.CLOSED
+
+    @pytest.mark.asyncio
+    async def test_honors_retry_after(self, clock):
+        guard = make_guard(clock)
+        call = AsyncMock(side_effect=[ProviderError(429, retry_after="4"), "ok"])
+
+        assert await guarded_call(guard, call) == "ok"
+
+        assert clock.sleeps == [4]
+
+    @pytest.mark.asyncio
+    async def test_backoff_is_shared_between_callers(self, clock):
+        guard = make_guard(clock)
+        await guarded_call(
+            guard, AsyncMock(side_effect=[ProviderError(429, retry_after="4"), "ok"])
+        )
+        clock.now -= 3
+
+        await guarded_call(guard, AsyncMock(return_value="ok"))
+
+        # The second caller waits out what is left of the first one's backoff
+        assert clock.sleeps == [4, 3]
+
+    @pytest.mark.asyncio
+    async def test_client_errors_are_not_retried(self, clock):
+        guard = make_guard(clock)
+        call = AsyncMock(side_effect=ProviderError(400))
+
+        with pytest.raises(ProviderError):
+            await guarded_call(guard, call)
+
+        assert call.await_count == 1
+        assert guard.breaker.state == CircuitBreaker.CLOSED
+
+    @pytest.mark.asyncio
+    async def test_open_circuit_fails_fast(self, clock):
+        guard = make_guard(clock, max_retries=0)
+        call = AsyncMock(side_effect=ProviderError(500))
+        for _ in range(2):
+            with pytest.raises(ProviderError):
+                await guarded_call(guard, call)
+
+        with pytest.raises(LLMUnavailableError):
+            await guarded_call(guard, call)
+
+        assert call.await_count == 2
+        assert guard.breaker.state == CircuitBreaker.OPEN
+
+    @pytest.mark.asyncio
+    async def test_cancelled_probe_lets_the_next_one_through(self, clock):
+        guard = make_guard(clock, max_retries=0)
+        guard.breaker.record_failure()
+        guard.breaker.record_failure()
+        clock.now = 30
+
+        with pytest.raises(asyncio.CancelledError):
+            await guarded_call(guard, AsyncMock(side_effect=asyncio.CancelledError))
+
+        assert await guarded_call(guard, AsyncMock(return_value="ok")) == "ok"
+        assert guard.breaker.state == CircuitBreaker.CLOSED
+
+    @pytest.mark.asyncio
+    async def test_rate_limits_delay_calls(self, clock):
+        guard = make_guard(clock, requests_per_minute=60, tokens_per_minute=600)
+
+        await guarded_call(guard, AsyncMock(), tokens=600)
+        await guarded_call(guard, AsyncMock(), tokens=300)
+
+        # The token bucket refills 10 tokens a second
+        assert clock.sleeps == [30]
+
+    @pytest.mark.asyncio
+    async def test_retries_take_request_tokens(self, clock):
+        guard = make_guard(clock, requests_per_minute=60, backoff_max=0)
+        call = AsyncMock(side_effect=[ProviderError(429), "ok"])
+
+        await guarded_call(guard, AsyncMock())
+        assert await guarded_call(guard, call) == "ok"
+
+        # A burst of 60, less the two requests and the retry
+        assert guard.requests.available == 57
+
+    @pytest.mark.asyncio
+    async def test_gives_up_when_queued_too_long(self):
+        guard = make_guard(FakeClock(), max_concurrent=1, queue_timeout=0.01)
+        release = asyncio.Event()
+
+        holder = asyncio.create_task(guarded_call(guard, release.wait))
+        await asyncio.sleep(0)
+        with pytest.raises(LLMUnavailableError):
+            await guarded_call(guard, AsyncMock())
+
+        release.set()
+        await holder
+        assert guard.waiting == 0
+
+    def test_state_is_exported_as_metrics(self):
+        rendered = metrics_registry.render()
+
+        for name in (
+            "llm_in_flight_requests",
+            "llm_waiting_requests",
+            "llm_circuit_state",
+            "llm_backoff_seconds",
+        ):
+            assert f"{name} " in rendered
+
+
+class TestLLMServiceFallback:
+    @pytest.mark.asyncio
+    async def test_open_circuit_returns_fallback_without_calling_provider(self, clock):
+        guard = make_guard(clock)
+        guard.breaker.record_failure()
+        guard.breaker.record_failure()
+
+        with (
+            patch("app.services.llm_service.llm_guard", guard),
+            patch("app.services.llm_service.acompletion") as mock_completion,
+        ):
+            response = await LLMService().generate_response("Hello")
+            title = await LLMService().generate_conversation_title("Hello")
+
+        mock_completion.assert_not_called()
+        assert response.startswith("I encountered an error")
+        assert "unavailable" in response
+        assert title.startswith("Conversation ")
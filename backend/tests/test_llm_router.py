@@ -0,0 +1,191 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.services.llm_router import Endpoint, EndpointPool
+from app.services.llm_service import LLMService
+
+
+def make_pool(*models, alpha=0.5, clock=None):
+    return EndpointPool(
+        "test",
+        [Endpoint(model=model) for model in models],
+        alpha=alpha,
+        clock=clock or (lambda: 0),
+    )
+
+
+class ClientError(Exception):
+    status_code = 400
+
+
+def warm_up(pool, endpoint, seconds, samples=10):
+    for _ in range(samples):
+        pool.observe(endpoint, seconds)
+
+
+@pytest.fixture
+def hedging():
+    with (
+        patch("app.services.llm_router.settings.LLM_HEDGE_MIN_SAMPLES", 10),
+        patch("app.services.llm_router.settings.LLM_HEDGE_MIN_DELAY_SECONDS", 0),
+    ):
+        yield
+
+
+class TestEndpointPool:
+    def test_ranks_by_moving_average_latency(self):
+        pool = make_pool("fast", "slow", "new")
+        fast, slow, new = pool.endpoints
+
+        pool.observe(fast, 1.0)
+        pool.observe(slow, 0.5)
+        pool.observe(slow, 3.5)
+
+        assert slow.ewma == 2.0
+        # Unmeasured endpoints go first so they get measured
+        assert pool.ranked() == [new, fast, slow]
+
+    @pytest.mark.asyncio
+    async def test_failures_route_around_the_endpoint(self):
+        pool = make_pool("primary", "secondary")
+        primary, secondary = pool.endpoints
+        pool.observe(primary, 1.0)
+        pool.observe(secondary, 2.0)
+        request = AsyncMock(side_effect=[Exception("down"), "ok"])
+
+        with pytest.raises(Exception):
+            await pool.call(request)
+        assert await pool.call(request) == "ok"
+
+        assert [call.args[0].model for call in request.await_args_list] == [
+            "primary",
+            "secondary",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_failed_endpoint_is_probed_after_the_interval(self):
+        now = 0
+        pool = make_pool("primary", "secondary", clock=lambda: now)
+        primary, secondary = pool.endpoints
+        pool.observe(primary, 1.0)
+        pool.observe(secondary, 2.0)
+        pool.record_failure(primary, Exception("down"))
+
+        assert pool.route() == [secondary, primary]
+        now = 30
+        pool.observe(secondary, 2.0)
+        # One call probes the endpoint; the rest stay on the best one
+        assert pool.route() == [primary, secondary]
+        assert pool.route() == [secondary, primary]
+
+        # A successful probe is measured, pulling its average back down
+        penalized = primary.ewma
+        now = 60
+        request = AsyncMock(return_value="ok")
+        await pool.call(request)
+        assert request.await_args.args[0] is primary
+        assert primary.ewma < penalized
+
+    def test_client_errors_do_not_penalize_the_endpoint(self):
+        pool = make_pool("primary", "secondary")
+        primary, secondary = pool.endpoints
+        pool.observe(primary, 1.0)
+        pool.observe(secondary, 2.0)
+
+        pool.record_failure(primary, ClientError("bad request"))
+
+        assert primary.ewma == 1.0
+
+    def test_p95_needs_enough_samples(self, hedging):
+        pool = make_pool("model")
+        (endpoint,) = pool.endpoints
+        warm_up(pool, endpoint, 1.0, samples=9)
+        assert pool.p95() is None
+
+        for seconds in range(1, 12):
+            pool.observe(endpoint, seconds)
+
+        assert pool.p95() == 10
+
+    @pytest.mark.asyncio
+    async def test_slow_call_is_hedged_and_the_loser_cancelled(self, hedging):
+        pool = make_pool("primary", "backup")
+        primary, backup = pool.endpoints
+        warm_up(pool, primary, 0.01)
+        warm_up(pool, backup, 0.02)
+        cancelled = asyncio.Event()
+
+        async def request(endpoint):
+            if endpoint is primary:
+                try:
+                    await asyncio.sleep(10)
+                except asyncio.CancelledError:
+                    cancelled.set()
+                    raise
+            return endpoint.model
+
+        assert await pool.call(request, hedge=True) == "backup"
+        await asyncio.wait_for(cancelled.wait(), 1)
+
+    @pytest.mark.asyncio
+    async def test_hedge_falls_back_when_one_call_fails(self, hedging):
+        pool = make_pool("primary", "backup")
+        primary, backup = pool.endpoints
+        warm_up(pool, primary, 0.01)
+        warm_up(pool, backup, 0.02)
+
+        async def request(endpoint):
+            if endpoint is backup:
+                raise Exception("down")
+            await asyncio.sleep(0.1)
+            return endpoint.model
+
+        assert await pool.call(request, hedge=True) == "primary"
+
+    @pytest.mark.asyncio
+    async def test_fast_call_is_not_hedged(self, hedging):
+        pool = make_pool("primary", "backup")
+        primary, backup = pool.endpoints
+        warm_up(pool, primary, 1.0)
+        warm_up(pool, backup, 2.0)
+        request = AsyncMock(return_value="ok")
+
+        assert await pool.call(request, hedge=True) == "ok"
+
+        request.assert_awaited_once_with(primary)
+
+    @pytest.mark.asyncio
+    async def test_no_hedging_without_latency_history(self, hedging):
+        pool = make_pool("primary", "backup")
+
+        async def request(endpoint):
+            await asyncio.sleep(0.01)
+            return endpoint.model
+
+        assert await pool.call(request, hedge=True) == "primary"
+
+
+class TestTitleRouting:
+    @pytest.mark.asyncio
+    async def test_titles_use_the_title_pool(self):
+        response = MagicMock()
+        response.choices = [MagicMock()]
+        response.choices[0].message.content = "Quarterly Results"
+        title_pool = EndpointPool(
+            "title", [Endpoint(model="small-model", base_url="http://small")]
+        )
+
+        with (
+            patch("app.services.llm_service.title_pool", title_pool),
+            patch(
+                "app.services.llm_service.acompletion", return_value=response
+            ) as mock_completion,
+        ):
+            title = await LLMService().generate_conversation_title("Q3 numbers?")
+
+        assert title == "Quarterly Results"
+        kwargs = mock_completion.call_args.kwargs
+        assert kwargs["model"] == "small-model"
+        assert kwargs["base_url"] == "http://small"
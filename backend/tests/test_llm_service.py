@@ -1,9 +1,24 @@
+import asyncio
+from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
 from app.models.chat import Message, MessageType
-from app.services.llm_service import LLMService
+from app.services.llm_metrics import (
+    LLMCallStats,
+    calls,
+    estimate_cost,
+    time_to_first_token,
+    tokens,
+)
+from app.services.llm_router import Endpoint, EndpointPool, llm_pool
+from app.services.llm_service import (
+    LLMService,
+    llm_response_cache,
+    response_cache_key,
+)
+from app.services.tokenizer import count_tokens
 
 
 class TestLLMService:
@@ -49,6 +64,92 @@ class TestLLMService:
             assert "encountered an error" in result
             assert "API Error" in result
 
+    @staticmethod
+    def stream_of(*deltas):
+        async def chunks():
+            for delta in deltas:
+                chunk = MagicMock()
+                chunk.choices = [MagicMock()]
+                chunk.choices[0].delta.content = delta
+                yield chunk
+
+        return chunks()
+
+    @pytest.mark.asyncio
+    async def test_stream_response_yields_deltas(self, llm_service):
+        with patch(
+            "app.services.llm_service.acompletion",
+            new=AsyncMock(return_value=self.stream_of("Hel", None, "lo", "")),
+        ) as mock_acompletion:
+            deltas = [delta async for delta in llm_service.stream_response("Hi")]
+
+        assert deltas == ["Hel", "lo"]
+        assert mock_acompletion.call_args.kwargs["stream"] is True
+
+    @pytest.mark.asyncio
+    async def test_stream_response_records_time_to_first_token(self, llm_service):
+        labels = {"model": llm_pool.ranked()[0].model, "operation": "stream"}
+        observed = time_to_first_token.count(**labels)
+        stats = LLMCallStats()
+        with patch(
+            "app.services.llm_service.acompletion",
+            new=AsyncMock(return_value=self.stream_of("a", "b")),
+        ):
+            [delta async for delta in llm_service.stream_response("Hi", stats=stats)]
+
+        assert time_to_first_token.count(**labels) == observed + 1
+        assert stats.outcome == "ok"
+        assert 0 < stats.time_to_first_token_seconds <= stats.duration_seconds
+        # No usage report in the stream, so the reply is counted locally
+        assert stats.completion_tokens == count_tokens("ab")
+
+    @pytest.mark.asyncio
+    async def test_stream_response_records_the_final_usage_chunk(self, llm_service):
+        async def chunks():
+            async for chunk in self.stream_of("Hel", "lo"):
+                chunk.usage = None
+                yield chunk
+            yield SimpleNamespace(
+                choices=[],
+                usage=SimpleNamespace(prompt_tokens=42, completion_tokens=2),
+            )
+
+        stats = LLMCallStats()
+        with patch(
+            "app.services.llm_service.acompletion",
+            new=AsyncMock(return_value=chunks()),
+        ) as mock_acompletion:
+            deltas = [
+                delta async for delta in llm_service.stream_response("Hi", stats=stats)
+            ]
+
+        assert deltas == ["Hel", "lo"]
+        assert mock_acompletion.call_args.kwargs["stream_options"] == {
+            "include_usage": True
+        }
+        assert (stats.prompt_tokens, stats.completion_tokens) == (42, 2)
+
+    @pytest.mark.asyncio
+    async def test_stream_response_exception(self, llm_service):
+        with patch(
+            "app.services.llm_service.acompletion", side_effect=Exception("API Error")
+        ):
+            deltas = [delta async for delta in llm_service.stream_response("Hi")]
+
+        assert len(deltas) == 1
+        assert "API Error" in deltas[0]
+
+    @pytest.mark.asyncio
+    async def test_stream_response_empty_stream(self, llm_service):
+        with patch(
+            "app.services.llm_service.acompletion",
+            new=AsyncMock(return_value=self.stream_of()),
+        ):
+            deltas = [delta async for delta in llm_service.stream_response("Hi")]
+
+        assert len(deltas) == 1
+        assert "couldn't generate a response" in deltas[0]
+
     @pytest.mark.asyncio
     async def test_build_messages_basic(self, llm_service):
         messages = await llm_service._build_messages("Hello")
@@ -81,8 +182,8 @@ class TestLLMService:
         assert messages[2]["content"] == "Hi there!"
 
     @pytest.mark.asyncio
-    async def test_build_messages_limits_history(self, llm_service):
-        # Create 15 messages to test the 10-message limit
+    async def test_build_messages_keeps_short_history(self, llm_service):
+        # Short messages no longer get cut to a fixed window
         long_history = [
             Message(
                 id=i,
@@ -96,8 +197,174 @@ class TestLLMService:
             "New message", conversation_history=long_history
         )
 
-        # Should be system + 10 recent history + current = 12
-        assert len(messages) == 12
+        # Should be system + 15 history + current = 17
+        assert len(messages) == 17
+
+    @pytest.mark.asyncio
+    async def test_build_prompt_fills_budget_newest_first(self, llm_service):
+        history = [
+            Message(id=1, type=MessageType.USER, content="old " * 100),
+            Message(id=2, type=MessageType.AGENT, content="middle " * 100),
+            Message(id=3, type=MessageType.USER, content="Short one"),
+            Message(id=4, type=MessageType.AGENT, content="Short two"),
+        ]
+        base = await llm_service._build_prompt("New message")
+
+        with patch(
+            "app.services.llm_service.settings.LLM_CONTEXT_TOKEN_BUDGET",
+            base.token_count + 150,
+        ):
+            prompt = await llm_service._build_prompt(
+                "New message", conversation_history=history
+            )
+
+        contents = [message["content"] for message in prompt.messages]
+        assert contents[1:] == ["Short one", "Short two", "New message"]
+        assert prompt.dropped_messages == 2
+        assert base.token_count < prompt.token_count <= base.token_count + 150
+
+    @pytest.mark.asyncio
+    async def test_build_prompt_keeps_current_message_over_budget(self, llm_service):
+        with patch("app.services.llm_service.settings.LLM_CONTEXT_TOKEN_BUDGET", 1):
+            prompt = await llm_service._build_prompt(
+                "New message",
+                conversation_history=[
+                    Message(id=1, type=MessageType.USER, content="Hello")
+                ],
+            )
+
+        assert [message["role"] for message in prompt.messages] == ["system", "user"]
+        assert prompt.messages[-1]["content"] == "New message"
+        assert prompt.dropped_messages == 1
+
+    @pytest.mark.asyncio
+    async def test_build_prompt_includes_summary(self, llm_service):
+        prompt = await llm_service._build_prompt(
+            "New message",
+            conversation_history=[
+                Message(id=5, type=MessageType.AGENT, content="Latest reply")
+            ],
+            summary="The user is reviewing Q3 revenue.",
+        )
+
+        assert [message["role"] for message in prompt.messages] == [
+            "system",
+            "system",
+            "assistant",
+            "user",
+        ]
+        assert "The user is reviewing Q3 revenue." in prompt.messages[1]["content"]
+
+    @pytest.mark.asyncio
+    async def test_summarize_conversation_success(
+        self, llm_service, mock_response, sample_messages
+    ):
+        mock_response.choices[0].message.content = "  Greetings were exchanged.  "
+
+        with patch(
+            "app.services.llm_service.acompletion", return_value=mock_response
+        ) as mock_completion:
+            result = await llm_service.summarize_conversation(
+                "Earlier summary", sample_messages
+            )
+
+        assert result == "Greetings were exchanged."
+        prompt = mock_completion.call_args.kwargs["messages"][-1]["content"]
+        assert "Earlier summary" in prompt
+        assert "User: Hello" in prompt
+        assert "Assistant: Hi there!" in prompt
+
+    @pytest.mark.asyncio
+    async def test_summarize_conversation_returns_none_on_error(
+        self, llm_service, sample_messages
+    ):
+        with patch(
+            "app.services.llm_service.acompletion", side_effect=Exception("API Error")
+        ):
+            assert (
+                await llm_service.summarize_conversation(None, sample_messages) is None
+            )
+
+    @pytest.mark.asyncio
+    async def test_identical_concurrent_calls_share_one_completion(
+        self, llm_service, mock_response
+    ):
+        release = asyncio.Event()
+
+        async def completion(**kwargs):
+            await release.wait()
+            return mock_response
+
+        with patch(
+            "app.services.llm_service.acompletion",
+            new=AsyncMock(side_effect=completion),
+        ) as mock_completion:
+            titles = [
+                asyncio.create_task(llm_service.generate_conversation_title("Hi"))
+                for _ in range(3)
+            ]
+            await asyncio.sleep(0)
+            release.set()
+            results = await asyncio.gather(*titles)
+
+        assert results == ["Test response"] * 3
+        assert mock_completion.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_repeated_calls_are_served_from_cache(
+        self, llm_service, mock_response
+    ):
+        with (
+            patch.object(llm_response_cache, "max_entries", 1000),
+            patch(
+                "app.services.llm_service.acompletion", return_value=mock_response
+            ) as mock_completion,
+        ):
+            first = await llm_service.generate_response("Hello")
+            second = await llm_service.generate_response("Hello")
+            other = await llm_service.generate_response("Hello again")
+
+        assert first == second == other == "Test response"
+        assert mock_completion.call_count == 2
+        assert llm_response_cache.hits.value() >= 1
+
+    @pytest.mark.asyncio
+    async def test_response_cache_is_off_by_default(self, llm_service, mock_response):
+        with patch(
+            "app.services.llm_service.acompletion", return_value=mock_response
+        ) as mock_completion:
+            await llm_service.generate_response("Hello")
+            await llm_service.generate_response("Hello")
+
+        assert mock_completion.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_calls_are_not_cached(self, llm_service, mock_response):
+        with patch(
+            "app.services.llm_service.acompletion",
+            side_effect=[Exception("API Error"), mock_response],
+        ):
+            failed = await llm_service.generate_response("Hello")
+            retried = await llm_service.generate_response("Hello")
+
+        assert failed.startswith("I encountered an error")
+        assert retried == "Test response"
+
+    def test_cache_key_covers_model_parameters_and_messages(self):
+        messages = [{"role": "user", "content": "Hello"}]
+        key = response_cache_key(messages, max_tokens=20, temperature=0.3)
+
+        assert key == response_cache_key(
+            messages, temperature=0.3, max_tokens=20, timeout=5
+        )
+        assert key != response_cache_key(messages, max_tokens=20, temperature=0.7)
+        assert key != response_cache_key(
+            [{"role": "user", "content": "Hi"}], max_tokens=20, temperature=0.3
+        )
+        other_pool = EndpointPool("other", [Endpoint(model="other-model")])
+        assert key != response_cache_key(
+            messages, pool=other_pool, max_tokens=20, temperature=0.3
+        )
 
     @pytest.mark.asyncio
     async def test_get_attachments_content_empty(self, llm_service):
@@ -229,6 +496,66 @@ class TestLLMService:
             )
             assert result.startswith("Conversation Test message for")
 
+    @staticmethod
+    def file_content(file_id, text):
+        return {
+            "id": file_id,
+            "filename": f"file-{file_id}.txt",
+            "content_type": "text/plain",
+            "extracted_text": text,
+            "metadata": {},
+        }
+
+    @pytest.mark.asyncio
+    async def test_build_prompt_fetches_all_attachments_in_one_call(self, llm_service):
+        history = [
+            Message(
+                id=i,
+                type=MessageType.USER,
+                content=f"Turn {i}",
+                attachments=[{"url": f"/api/files/{i}", "name": f"{i}.txt"}],
+            )
+            for i in range(1, 6)
+        ]
+        files_content = [self.file_content(i, f"Content {i}") for i in range(1, 7)]
+
+        with patch("app.services.file_service.file_service") as mock_file_service:
+            mock_file_service.get_files_content = AsyncMock(return_value=files_content)
+
+            prompt = await llm_service._build_prompt(
+                "New message",
+                conversation_history=history,
+                attachments=[{"url": "/api/files/6", "name": "6.txt"}],
+            )
+
+        mock_file_service.get_files_content.assert_awaited_once_with([6, 1, 2, 3, 4, 5])
+        assert "Content 1" in prompt.messages[1]["content"]
+        assert "Content 6" in prompt.messages[-1]["content"]
+
+    @pytest.mark.asyncio
+    async def test_build_prompt_skips_files_of_turns_that_cannot_fit(self, llm_service):
+        history = [
+            Message(
+                id=1,
+                type=MessageType.USER,
+                content="old " * 500,
+                attachments=[{"url": "/api/files/1", "name": "1.txt"}],
+            ),
+            Message(id=2, type=MessageType.AGENT, content="Recent"),
+        ]
+
+        with (
+            patch("app.services.llm_service.settings.LLM_CONTEXT_TOKEN_BUDGET", 200),
+            patch("app.services.file_service.file_service") as mock_file_service,
+        ):
+            mock_file_service.get_files_content = AsyncMock(return_value=[])
+            prompt = await llm_service._build_prompt(
+                "New message", conversation_history=history
+            )
+
+        mock_file_service.get_files_content.assert_not_called()
+        assert prompt.dropped_messages == 1
+
     @pytest.mark.asyncio
     async def test_build_messages_with_attachments_in_history(self, llm_service):
         message_with_attachments = Message(
@@ -239,7 +566,9 @@ class TestLLMService:
         )
 
         with patch.object(
-            llm_service, "_get_attachments_content", return_value="File content"
+            llm_service,
+            "_load_attachment_files",
+            return_value={123: self.file_content(123, "File content")},
         ):
             messages = await llm_service._build_messages(
                 "New message", conversation_history=[message_with_attachments]
@@ -253,12 +582,56 @@ class TestLLMService:
             )
             assert "File content" in user_msg["content"]
 
+    @pytest.mark.asyncio
+    async def test_build_prompt_sends_images_as_content_parts(self, llm_service):
+        image = {
+            "id": 7,
+            "file_hash": "hash-7",
+            "filename": "chart.png",
+            "content_type": "image/png",
+            "s3_key": "uploads/chart.png",
+            "extracted_text": "[IMAGE: image/png image, 800x600 pixels]",
+            "metadata": {"width": 800, "height": 600},
+        }
+        image_part = {
+            "type": "image_url",
+            "image_url": {"url": "data:image/jpeg;base64,abc"},
+        }
+
+        with (
+            patch.object(
+                llm_service, "_load_attachment_files", return_value={7: image}
+            ),
+            patch(
+                "app.services.image_service.image_service.image_part",
+                AsyncMock(return_value=image_part),
+            ),
+        ):
+            prompt = await llm_service._build_prompt(
+                "What does this show?",
+                attachments=[{"url": "/api/files/7", "name": "chart.png"}],
+            )
+            with patch("app.services.llm_service.settings.LLM_IMAGE_INPUT", False):
+                text_only = await llm_service._build_prompt(
+                    "What does this show?",
+                    attachments=[{"url": "/api/files/7", "name": "chart.png"}],
+                )
+
+        text_part, sent_image = prompt.messages[-1]["content"]
+        assert "What does this show?" in text_part["text"]
+        assert "800x600" in text_part["text"]
+        assert sent_image == image_part
+        assert prompt.token_count > text_only.token_count
+        assert isinstance(text_only.messages[-1]["content"], str)
+
     @pytest.mark.asyncio
     async def test_build_messages_with_current_attachments(self, llm_service):
         attachments = [{"url": "/api/files/456", "name": "current.txt"}]
 
         with patch.object(
-            llm_service, "_get_attachments_content", return_value="Current file content"
+            llm_service,
+            "_load_attachment_files",
+            return_value={456: self.file_content(456, "Current file content")},
         ):
             messages = await llm_service._build_messages(
                 "Check this", attachments=attachments
@@ -267,3 +640,75 @@ class TestLLMService:
             # The last message should contain both user message and attachment content
             assert "Check this" in messages[-1]["content"]
             assert "Current file content" in messages[-1]["content"]
+
+
+class TestLLMCallStats:
+    @pytest.fixture
+    def mock_response(self):
+        response = MagicMock()
+        response.choices = [MagicMock()]
+        response.choices[0].message.content = "Test response"
+        response.usage.prompt_tokens = 12
+        response.usage.completion_tokens = 3
+        return response
+
+    @pytest.mark.asyncio
+    async def test_records_provider_usage(self, mock_response):
+        labels = {"model": llm_pool.ranked()[0].model, "operation": "response"}
+        calls_before = calls.value(outcome="ok", **labels)
+        tokens_before = tokens.value(kind="completion", **labels)
+        stats = LLMCallStats()
+
+        with patch("app.services.llm_service.acompletion", return_value=mock_response):
+            await LLMService().generate_response("Hello", stats=stats)
+
+        assert stats.operation == "response"
+        assert stats.model == labels["model"]
+        assert stats.outcome == "ok"
+        assert (stats.prompt_tokens, stats.completion_tokens) == (12, 3)
+        assert stats.duration_seconds >= stats.queue_wait_seconds
+        assert calls.value(outcome="ok", **labels) == calls_before + 1
+        assert tokens.value(kind="completion", **labels) == tokens_before + 3
+
+    @pytest.mark.asyncio
+    async def test_cached_calls_cost_nothing(self, mock_response):
+        stats = LLMCallStats()
+
+        with (
+            patch.object(llm_response_cache, "max_entries", 1000),
+            patch("app.services.llm_service.acompletion", return_value=mock_response),
+        ):
+            await LLMService().generate_response("Hello")
+            await LLMService().generate_response("Hello", stats=stats)
+
+        assert stats.outcome == "cached"
+        assert stats.model == llm_pool.ranked()[0].model
+        assert (stats.prompt_tokens, stats.completion_tokens) == (0, 0)
+
+    @pytest.mark.asyncio
+    async def test_failed_calls_are_recorded(self):
+        stats = LLMCallStats()
+
+        with patch(
+            "app.services.llm_service.acompletion", side_effect=Exception("API Error")
+        ):
+            await LLMService().generate_response("Hello", stats=stats)
+
+        assert stats.outcome == "error"
+        assert stats.duration_seconds > 0
+
+    def test_estimates_cost_from_model_prices(self):
+        prices = {
+            "cheap-model": {"input_cost_per_token": 1, "output_cost_per_token": 2}
+        }
+
+        with patch("app.services.llm_metrics.litellm.model_cost", prices):
+            assert estimate_cost("provider/cheap-model", 10, 5) == 20
+            assert estimate_cost("unknown-model", 10, 5) is None
+
+    def test_stored_only_when_enabled(self):
+        stats = LLMCallStats(operation="response", model="m", prompt_tokens=5)
+
+        assert stats.as_stored()["prompt_tokens"] == 5
+        with patch("app.services.llm_metrics.settings.LLM_STORE_CALL_STATS", False):
+            assert stats.as_stored() is None
@@ -0,0 +1,105 @@
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from strawberry.extensions import ParserCache, ValidationCache
+
+from app.api.persisted_queries import hash_query, persisted_queries
+from app.api.schema import schema
+from app.main import app
+
+client = TestClient(app)
+
+QUERY = "query GetConversation($id: Int!) { getConversation(id: $id) { id title } }"
+
+
+def persisted(sha256_hash, version=1):
+    return {"persistedQuery": {"version": version, "sha256Hash": sha256_hash}}
+
+
+def post_graphql(**body):
+    response = client.post("/graphql", json=body)
+    assert response.status_code == 200
+    return response.json()
+
+
+class TestPersistedQueries:
+    @pytest.fixture(autouse=True)
+    def empty_registry(self):
+        persisted_queries.clear()
+        yield
+        persisted_queries.clear()
+
+    @pytest.fixture
+    def no_conversation(self):
+        with patch("app.api.schema.AsyncSessionLocal") as session_factory:
+            session = session_factory.return_value.__aenter__.return_value
+            session.get.return_value = None
+            yield
+
+    def test_unknown_hash_asks_client_for_query(self):
+        body = post_graphql(
+            variables={"id": 1}, extensions=persisted(hash_query(QUERY))
+        )
+
+        assert body["data"] is None
+        assert body["errors"][0]["message"] == "PersistedQueryNotFound"
+        assert body["errors"][0]["extensions"]["code"] == "PERSISTED_QUERY_NOT_FOUND"
+
+    def test_registered_query_is_served_by_hash(self, no_conversation):
+        sha256_hash = hash_query(QUERY)
+        first = post_graphql(
+            query=QUERY, variables={"id": 1}, extensions=persisted(sha256_hash)
+        )
+
+        second = post_graphql(variables={"id": 1}, extensions=persisted(sha256_hash))
+
+        assert first == {"data": {"getConversation": None}}
+        assert second == first
+
+    def test_hash_mismatch_is_rejected(self):
+        body = post_graphql(
+            query=QUERY, variables={"id": 1}, extensions=persisted("0" * 64)
+        )
+
+        assert body["errors"][0]["extensions"]["code"] == "BAD_USER_INPUT"
+        assert len(persisted_queries) == 0
+
+    def test_unsupported_version_is_rejected(self):
+        body = post_graphql(
+            query=QUERY,
+            variables={"id": 1},
+            extensions=persisted(hash_query(QUERY), version=2),
+        )
+
+        assert (
+            body["errors"][0]["extensions"]["code"] == "PERSISTED_QUERY_NOT_SUPPORTED"
+        )
+
+    def test_plain_queries_still_work(self, no_conversation):
+        body = post_graphql(query=QUERY, variables={"id": 1})
+
+        assert body == {"data": {"getConversation": None}}
+        assert len(persisted_queries) == 0
+
+
+class TestDocumentCache:
+    @pytest.mark.asyncio
+    async def test_repeat_operation_skips_parse_and_validation(self):
+        [parser_cache] = [e for e in schema.extensions if isinstance(e, ParserCache)]
+        [validation_cache] = [
+            e for e in schema.extensions if isinstance(e, ValidationCache)
+        ]
+        query = "{ getDocument(id: 1) { id title } }"
+        await schema.execute(query)
+        parse_hits = parser_cache.cached_parse_document.cache_info().hits
+        validate_hits = validation_cache.cached_validate_document.cache_info().hits
+
+        result = await schema.execute(query)
+
+        assert result.errors is None
+        assert parser_cache.cached_parse_document.cache_info().hits == parse_hits + 1
+        assert (
+            validation_cache.cached_validate_document.cache_info().hits
+            == validate_hits + 1
+        )
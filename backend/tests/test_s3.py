@@ -118,6 +118,14 @@ class TestS3Service:
         content = s3_service.bucket._objects[key].body
         assert content == file_content
 
+    def test_download_file(self, s3_service):
+        """Test reading back the content of an uploaded file"""
+        key = s3_service.upload_file(
+            io.BytesIO(b"Downloaded content"), "download.txt", "text/plain"
+        )
+
+        assert s3_service.download_file(key) == b"Downloaded content"
+
     def test_get_s3_url(self, s3_service):
         """Test generating an S3 URL for a given key"""
         test_key = "uploads/test_key.txt"
@@ -0,0 +1,797 @@
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy import event
+
+from app.api.dataloaders import Context, MessagePageKey, load_message_pages
+from app.api.schema import schema
+from app.models.chat import Conversation, Message
+from app.models.file import StoredFile
+from app.services.context_summary_service import context_summary_service
+from app.services.conversation_service import conversation_service
+
+GET_CONVERSATIONS = """
+    query GetConversations($first: Int!, $after: String) {
+        getConversations(first: $first, after: $after) {
+            edges {
+                cursor
+                node { id title updatedAt }
+            }
+            pageInfo { hasNextPage endCursor }
+        }
+    }
+"""
+
+
+async def seed_conversations(session_factory, count, same_timestamp=False):
+    base = datetime(2025, 1, 1)
+    async with session_factory() as session:
+        for i in range(count):
+            timestamp = base if same_timestamp else base + timedelta(minutes=i)
+            conversation = Conversation(
+                title=f"Conversation {i}", created_at=timestamp, updated_at=timestamp
+            )
+            conversation.messages = [
+                Message(type="user", content=f"Message {i}", created_at=timestamp)
+            ]
+            session.add(conversation)
+        await session.commit()
+
+
+def count_queries(session_factory, table):
+    """Record every SELECT against a table issued through the engine."""
+    statements = []
+    engine = session_factory.kw["bind"].sync_engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if (
+            statement.lstrip().upper().startswith("SELECT")
+            and f"FROM {table}" in statement
+        ):
+            statements.append(statement)
+
+    return statements
+
+
+async def fetch_all_pages(first):
+    titles, after, pages = [], None, 0
+    while True:
+        result = await schema.execute(
+            GET_CONVERSATIONS, variable_values={"first": first, "after": after}
+        )
+        assert result.errors is None
+        connection = result.data["getConversations"]
+        titles.extend(edge["node"]["title"] for edge in connection["edges"])
+        pages += 1
+        if not connection["pageInfo"]["hasNextPage"]:
+            return titles, pages
+        after = connection["pageInfo"]["endCursor"]
+
+
+class TestGetConversations:
+    @pytest.mark.asyncio
+    async def test_first_page_is_newest(self, test_db):
+        await seed_conversations(test_db, 5)
+
+        result = await schema.execute(GET_CONVERSATIONS, variable_values={"first": 2})
+
+        assert result.errors is None
+        connection = result.data["getConversations"]
+        assert [edge["node"]["title"] for edge in connection["edges"]] == [
+            "Conversation 4",
+            "Conversation 3",
+        ]
+        assert connection["pageInfo"]["hasNextPage"] is True
+        assert connection["pageInfo"]["endCursor"] == connection["edges"][-1]["cursor"]
+
+    @pytest.mark.asyncio
+    async def test_pages_cover_every_conversation_once(self, test_db):
+        await seed_conversations(test_db, 7)
+
+        titles, pages = await fetch_all_pages(first=3)
+
+        assert pages == 3
+        assert titles == [f"Conversation {i}" for i in reversed(range(7))]
+
+    @pytest.mark.asyncio
+    async def test_ties_on_updated_at_are_broken_by_id(self, test_db):
+        await seed_conversations(test_db, 5, same_timestamp=True)
+
+        titles, _ = await fetch_all_pages(first=2)
+
+        assert titles == [f"Conversation {i}" for i in reversed(range(5))]
+
+    @pytest.mark.asyncio
+    async def test_empty_list(self, test_db):
+        result = await schema.execute(GET_CONVERSATIONS, variable_values={"first": 5})
+
+        assert result.data["getConversations"] == {
+            "edges": [],
+            "pageInfo": {"hasNextPage": False, "endCursor": None},
+        }
+
+    @pytest.mark.asyncio
+    async def test_invalid_cursor(self, test_db):
+        result = await schema.execute(
+            GET_CONVERSATIONS, variable_values={"first": 5, "after": "not-a-cursor"}
+        )
+
+        assert result.errors is not None
+        assert "Invalid cursor" in result.errors[0].message
+
+    @pytest.mark.asyncio
+    async def test_invalid_page_size(self, test_db):
+        result = await schema.execute(GET_CONVERSATIONS, variable_values={"first": 0})
+
+        assert result.errors is not None
+        assert "Invalid page size" in result.errors[0].message
+
+
+class TestConversationLoaders:
+    @pytest.mark.asyncio
+    async def test_unselected_messages_are_not_loaded(self, test_db):
+        await seed_conversations(test_db, 2)
+        statements = count_queries(test_db, "messages")
+
+        result = await schema.execute(
+            "{ getConversation(id: 1) { id title } }", context_value=Context()
+        )
+
+        assert result.errors is None
+        assert result.data["getConversation"] == {"id": 1, "title": "Conversation 0"}
+        assert statements == []
+
+    @pytest.mark.asyncio
+    async def test_selected_messages_cost_one_query(self, test_db):
+        await seed_conversations(test_db, 3)
+        statements = count_queries(test_db, "messages")
+
+        result = await schema.execute(
+            "{ getConversation(id: 2) { messages { edges { node { content } } } } }",
+            context_value=Context(),
+        )
+
+        assert result.errors is None
+        assert result.data["getConversation"]["messages"]["edges"] == [
+            {"node": {"content": "Message 1"}}
+        ]
+        assert len(statements) == 1
+
+    @pytest.mark.asyncio
+    async def test_pages_of_one_conversation_share_a_query(self, test_db):
+        base = datetime(2025, 1, 1)
+        async with test_db() as session:
+            session.add(Conversation(id=1, title="Long"))
+            session.add(Conversation(id=2, title="Short"))
+            for i in range(1, 6):
+                session.add(
+                    Message(
+                        id=i,
+                        conversation_id=1,
+                        type="user",
+                        content=f"Message {i}",
+                        created_at=base + timedelta(minutes=i),
+                    )
+                )
+            await session.commit()
+        statements = count_queries(test_db, "messages")
+
+        newest, older, empty = await load_message_pages(
+            [
+                MessagePageKey(1, last=2),
+                MessagePageKey(1, last=2, before=(base + timedelta(minutes=2), 2)),
+                MessagePageKey(2, last=2),
+            ]
+        )
+
+        assert [m.id for m in newest.messages] == [4, 5]
+        assert newest.has_previous_page
+        assert [m.id for m in older.messages] == [1]
+        assert not older.has_previous_page
+        assert empty == ([], False)
+        assert len(statements) == 1
+
+    @pytest.mark.asyncio
+    async def test_attachment_files_are_batched_into_one_query(self, test_db):
+        async with test_db() as session:
+            conversation = Conversation(title="Many files")
+            for i in range(1, 4):
+                session.add(
+                    StoredFile(
+                        filename=f"{i}.txt",
+                        original_filename=f"file-{i}.txt",
+                        content_type="text/plain",
+                        file_size=i,
+                        s3_key=f"uploads/{i}.txt",
+                    )
+                )
+                conversation.messages.append(
+                    Message(
+                        type="user",
+                        content=f"File {i}",
+                        attachments=[
+                            {"type": "file", "name": "f", "url": f"/api/files/{i}"}
+                        ],
+                    )
+                )
+            session.add(conversation)
+            await session.commit()
+        statements = count_queries(test_db, "stored_files")
+
+        result = await schema.execute(
+            """
+            {
+                getConversation(id: 1) {
+                    messages { edges { node { attachments { file { id } } } } }
+                }
+            }
+            """,
+            context_value=Context(),
+        )
+
+        assert result.errors is None
+        file_ids = [
+            edge["node"]["attachments"][0]["file"]["id"]
+            for edge in result.data["getConversation"]["messages"]["edges"]
+        ]
+        assert file_ids == [1, 2, 3]
+        assert len(statements) == 1
+
+    @pytest.mark.asyncio
+    async def test_attachment_file_is_resolved_through_loader(self, test_db):
+        async with test_db() as session:
+            stored_file = StoredFile(
+                filename="abc.txt",
+                original_filename="report.txt",
+                content_type="text/plain",
+                file_size=42,
+                s3_key="uploads/abc.txt",
+                extracted_text="hello",
+                file_metadata='{"type": "text"}',
+            )
+            conversation = Conversation(title="With file")
+            conversation.messages = [
+                Message(
+                    type="user",
+                    content="See attached",
+                    attachments=[
+                        {"type": "file", "name": "report.txt", "url": "/api/files/1"},
+                        {"type": "file", "name": "other", "url": "https://x/y"},
+                    ],
+                )
+            ]
+            session.add_all([stored_file, conversation])
+            await session.commit()
+
+        result = await schema.execute(
+            """
+            {
+                getConversation(id: 1) {
+                    messages {
+                        edges {
+                            node {
+                                attachments { file { fileName fileSize metadata } }
+                            }
+                        }
+                    }
+                }
+            }
+            """,
+            context_value=Context(),
+        )
+
+        assert result.errors is None
+        edges = result.data["getConversation"]["messages"]["edges"]
+        attachments = edges[0]["node"]["attachments"]
+        assert attachments[0]["file"] == {
+            "fileName": "report.txt",
+            "fileSize": 42,
+            "metadata": {"type": "text"},
+        }
+        assert attachments[1]["file"] is None
+
+
+GET_MESSAGES = """
+    query GetMessages($last: Int, $before: String) {
+        getConversation(id: 1) {
+            messages(last: $last, before: $before) {
+                edges { node { content } }
+                pageInfo { hasPreviousPage startCursor }
+            }
+        }
+    }
+"""
+
+
+async def seed_messages(session_factory, count, same_timestamp=False):
+    base = datetime(2025, 1, 1)
+    async with session_factory() as session:
+        conversation = Conversation(title="Long thread")
+        conversation.messages = [
+            Message(
+                type="user",
+                content=f"Message {i}",
+                created_at=base if same_timestamp else base + timedelta(seconds=i),
+            )
+            for i in range(count)
+        ]
+        session.add(conversation)
+        await session.commit()
+
+
+async def fetch_message_page(last=None, before=None):
+    result = await schema.execute(
+        GET_MESSAGES,
+        variable_values={"last": last, "before": before},
+        context_value=Context(),
+    )
+    assert result.errors is None
+    connection = result.data["getConversation"]["messages"]
+    contents = [edge["node"]["content"] for edge in connection["edges"]]
+    return contents, connection["pageInfo"]
+
+
+class TestConversationMessagesPagination:
+    @pytest.mark.asyncio
+    async def test_last_returns_newest_page_oldest_first(self, test_db):
+        await seed_messages(test_db, 5)
+
+        contents, page_info = await fetch_message_page(last=2)
+
+        assert contents == ["Message 3", "Message 4"]
+        assert page_info["hasPreviousPage"] is True
+
+    @pytest.mark.asyncio
+    async def test_before_scrolls_back_through_history(self, test_db):
+        await seed_messages(test_db, 5, same_timestamp=True)
+
+        contents, page_info = await fetch_message_page(last=2)
+        history = contents
+        while page_info["hasPreviousPage"]:
+            contents, page_info = await fetch_message_page(
+                last=2, before=page_info["startCursor"]
+            )
+            history = contents + history
+
+        assert history == [f"Message {i}" for i in range(5)]
+
+    @pytest.mark.asyncio
+    async def test_without_last_returns_whole_history(self, test_db):
+        await seed_messages(test_db, 3)
+
+        contents, page_info = await fetch_message_page()
+
+        assert contents == ["Message 0", "Message 1", "Message 2"]
+        assert page_info["hasPreviousPage"] is False
+
+
+SEND_MESSAGE = """
+    mutation SendMessage($input: MessageInput!) {
+        sendMessage(input: $input) { id }
+    }
+"""
+
+CREATE_CONVERSATION_WITH_MESSAGE = """
+    mutation Create($firstMessage: String!) {
+        createConversationWithMessage(title: "Deal", firstMessage: $firstMessage) {
+            id
+        }
+    }
+"""
+
+SUMMARIES = """
+    {
+        getConversations(first: 10) {
+            edges { node { title messageCount lastMessagePreview lastMessageAt } }
+        }
+    }
+"""
+
+
+async def fetch_summaries():
+    result = await schema.execute(SUMMARIES)
+    assert result.errors is None
+    return [edge["node"] for edge in result.data["getConversations"]["edges"]]
+
+
+class TestConversationSummaryColumns:
+    @pytest.fixture(autouse=True)
+    def mock_llm(self):
+        with patch(
+            "app.api.schema.llm_service.generate_response",
+            new=AsyncMock(return_value="Agent reply"),
+        ):
+            yield
+
+    @pytest.mark.asyncio
+    async def test_create_with_message_records_both_messages(self, test_db):
+        result = await schema.execute(
+            CREATE_CONVERSATION_WITH_MESSAGE,
+            variable_values={"firstMessage": "Review the CIM"},
+            context_value=Context(),
+        )
+        assert result.errors is None
+
+        [summary] = await fetch_summaries()
+
+        assert summary["messageCount"] == 2
+        assert summary["lastMessagePreview"] == "Agent reply"
+        assert summary["lastMessageAt"] is not None
+
+    @pytest.mark.asyncio
+    async def test_send_message_updates_summary(self, test_db):
+        await seed_conversations(test_db, 1)
+        async with test_db() as session:
+            await session.execute(
+                Conversation.__table__.update().values(message_count=1)
+            )
+            await session.commit()
+
+        result = await schema.execute(
+            SEND_MESSAGE,
+            variable_values={
+                "input": {"conversationId": 1, "type": "user", "content": "Next?"}
+            },
+            context_value=Context(),
+        )
+        assert result.errors is None
+
+        [summary] = await fetch_summaries()
+
+        assert summary["messageCount"] == 3
+        assert summary["lastMessagePreview"] == "Agent reply"
+
+    @pytest.mark.asyncio
+    async def test_concurrent_sends_do_not_lose_increments(self, test_db):
+        await seed_conversations(test_db, 1)
+
+        async with test_db() as first, test_db() as second:
+            # Both sessions load the row before either commits
+            conversations = [
+                await session.get(Conversation, 1) for session in (first, second)
+            ]
+            for session, conversation in zip((first, second), conversations):
+                for content in ("Question", "Reply"):
+                    message = Message(conversation_id=1, type="user", content=content)
+                    session.add(message)
+                    conversation_service.record_message(conversation, message)
+                await session.commit()
+
+        [summary] = await fetch_summaries()
+        assert summary["messageCount"] == 4
+
+    @pytest.mark.asyncio
+    async def test_backfill_recomputes_from_messages(self, test_db):
+        await seed_conversations(test_db, 2)
+        async with test_db() as session:
+            session.add(
+                Message(
+                    conversation_id=1,
+                    type="agent",
+                    content="x" * 500,
+                    created_at=datetime(2026, 1, 1),
+                )
+            )
+            await session.commit()
+        before = await fetch_summaries()
+
+        updated = await conversation_service.backfill_summaries()
+
+        assert updated == 2
+        after = await fetch_summaries()
+        assert [s["title"] for s in after] == [s["title"] for s in before]
+        assert after[0]["messageCount"] == 1
+        assert after[0]["lastMessagePreview"] == "Message 1"
+        assert after[1]["messageCount"] == 2
+        assert after[1]["lastMessagePreview"] == "x" * 200
+        assert after[1]["lastMessageAt"] == "2026-01-01T00:00:00"
+
+
+class TestSendMessageConcurrency:
+    @pytest.mark.asyncio
+    async def test_llm_calls_do_not_hold_database_connections(self, test_db):
+        # More sends than the pool has connections (5 + 10 overflow): if each
+        # held its session through the LLM call, the last ones could never start
+        sends = 20
+        await seed_conversations(test_db, 1)
+        pool = test_db.kw["bind"].pool
+        in_flight = 0
+        all_started = asyncio.Event()
+        checked_out = []
+
+        async def generate_response(**kwargs):
+            nonlocal in_flight
+            in_flight += 1
+            if in_flight == sends:
+                checked_out.append(pool.checkedout())
+                all_started.set()
+            await asyncio.wait_for(all_started.wait(), timeout=5)
+            return "Agent reply"
+
+        with patch(
+            "app.api.schema.llm_service.generate_response",
+            new=AsyncMock(side_effect=generate_response),
+        ):
+            results = await asyncio.gather(
+                *(
+                    schema.execute(
+                        SEND_MESSAGE,
+                        variable_values={
+                            "input": {
+                                "conversationId": 1,
+                                "type": "user",
+                                "content": f"Question {i}",
+                            }
+                        },
+                        context_value=Context(),
+                    )
+                    for i in range(sends)
+                )
+            )
+
+        assert all(result.errors is None for result in results)
+        # Every send was waiting on the LLM at once with no connection in use
+        assert checked_out == [0]
+        [summary] = await fetch_summaries()
+        assert summary["messageCount"] == 2 * sends
+
+
+class TestCreateConversationWithMessage:
+    @pytest.mark.asyncio
+    async def test_title_and_reply_are_generated_concurrently(self, test_db):
+        in_flight = 0
+        both_started = asyncio.Event()
+
+        async def llm_call():
+            nonlocal in_flight
+            in_flight += 1
+            if in_flight == 2:
+                both_started.set()
+            # A serial caller would never start the second call
+            await asyncio.wait_for(both_started.wait(), timeout=1)
+
+        async def generate_title(first_message):
+            await llm_call()
+            return "CIM Review"
+
+        async def generate_response(**kwargs):
+            await llm_call()
+            return "Agent reply"
+
+        with (
+            patch(
+                "app.api.schema.llm_service.generate_conversation_title",
+                new=AsyncMock(side_effect=generate_title),
+            ),
+            patch(
+                "app.api.schema.llm_service.generate_response",
+                new=AsyncMock(side_effect=generate_response),
+            ),
+        ):
+            result = await schema.execute(
+                """
+                mutation {
+                    createConversationWithMessage(
+                        title: null, firstMessage: "Review the CIM"
+                    ) {
+                        title
+                        messages { edges { node { type content } } }
+                    }
+                }
+                """,
+                context_value=Context(),
+            )
+
+        assert result.errors is None
+        conversation = result.data["createConversationWithMessage"]
+        assert conversation["title"] == "CIM Review"
+        assert [edge["node"] for edge in conversation["messages"]["edges"]] == [
+            {"type": "user", "content": "Review the CIM"},
+            {"type": "agent", "content": "Agent reply"},
+        ]
+
+    @pytest.mark.asyncio
+    async def test_falls_back_when_title_generation_fails(self, test_db):
+        with (
+            patch(
+                "app.api.schema.llm_service.generate_conversation_title",
+                new=AsyncMock(side_effect=Exception("API Error")),
+            ),
+            patch(
+                "app.api.schema.llm_service.generate_response",
+                new=AsyncMock(return_value="Agent reply"),
+            ),
+        ):
+            result = await schema.execute(
+                """
+                mutation {
+                    createConversationWithMessage(title: null, firstMessage: "Hi") {
+                        title
+                    }
+                }
+                """,
+                context_value=Context(),
+            )
+
+        assert result.errors is None
+        assert result.data["createConversationWithMessage"]["title"].startswith(
+            "Conversation "
+        )
+
+
+GET_CONVERSATION = """
+    query GetConversation($id: Int!) {
+        getConversation(id: $id) {
+            id
+            updatedAt
+            messages { edges { node { content } } }
+        }
+    }
+"""
+
+
+async def fetch_conversation(id=1):
+    result = await schema.execute(
+        GET_CONVERSATION, variable_values={"id": id}, context_value=Context()
+    )
+    assert result.errors is None
+    return result.data["getConversation"]
+
+
+class TestConversationResponseCache:
+    @pytest.fixture(autouse=True)
+    def mock_llm(self):
+        with patch(
+            "app.api.schema.llm_service.generate_response",
+            new=AsyncMock(return_value="Agent reply"),
+        ):
+            yield
+
+    @pytest.mark.asyncio
+    async def test_repeat_read_is_served_from_cache(self, test_db):
+        await seed_conversations(test_db, 1)
+        first = await fetch_conversation()
+        conversation_statements = count_queries(test_db, "conversations")
+        message_statements = count_queries(test_db, "messages")
+
+        second = await fetch_conversation()
+
+        assert second == first
+        assert conversation_statements == []
+        assert message_statements == []
+
+    @pytest.mark.asyncio
+    async def test_send_message_invalidates_conversation(self, test_db):
+        await seed_conversations(test_db, 1)
+        before = await fetch_conversation()
+
+        result = await schema.execute(
+            SEND_MESSAGE,
+            variable_values={
+                "input": {"conversationId": 1, "type": "user", "content": "Next?"}
+            },
+            context_value=Context(),
+        )
+        assert result.errors is None
+
+        after = await fetch_conversation()
+        assert after["updatedAt"] != before["updatedAt"]
+        assert [edge["node"]["content"] for edge in after["messages"]["edges"]] == [
+            "Message 0",
+            "Next?",
+            "Agent reply",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_other_conversations_stay_cached(self, test_db):
+        await seed_conversations(test_db, 2)
+        await fetch_conversation(1)
+        await fetch_conversation(2)
+
+        await schema.execute(
+            SEND_MESSAGE,
+            variable_values={
+                "input": {"conversationId": 1, "type": "user", "content": "Next?"}
+            },
+            context_value=Context(),
+        )
+        # The send's background summary check reads conversation 1
+        await context_summary_service.wait_idle()
+        statements = count_queries(test_db, "conversations")
+        await fetch_conversation(2)
+
+        assert statements == []
+
+    @pytest.mark.asyncio
+    async def test_missing_conversation_is_not_cached(self, test_db):
+        result = await schema.execute("{ getConversation(id: 1) { id } }")
+        assert result.data["getConversation"] is None
+
+        await seed_conversations(test_db, 1)
+
+        assert (await fetch_conversation())["id"] == 1
+
+
+SEND_MESSAGE_STREAM = """
+    subscription SendMessageStream($input: MessageInput!) {
+        sendMessageStream(input: $input) {
+            delta
+            done
+            message { id type content }
+        }
+    }
+"""
+
+
+async def stream_events(input):
+    generator = await schema.subscribe(
+        SEND_MESSAGE_STREAM, variable_values={"input": input}, context_value=Context()
+    )
+    events = []
+    async for result in generator:
+        assert result.errors is None
+        events.append(result.data["sendMessageStream"])
+    return events
+
+
+class TestSendMessageStream:
+    @pytest.fixture(autouse=True)
+    def mock_llm(self):
+        async def stream_response(**kwargs):
+            for delta in ["Agent ", "reply "]:
+                yield delta
+
+        with patch(
+            "app.api.schema.llm_service.stream_response", side_effect=stream_response
+        ) as mock:
+            yield mock
+
+    @pytest.mark.asyncio
+    async def test_streams_deltas_between_saved_messages(self, test_db):
+        await seed_conversations(test_db, 1)
+
+        events = await stream_events(
+            {"conversationId": 1, "type": "user", "content": "Next?"}
+        )
+
+        assert [event["delta"] for event in events] == [None, "Agent ", "reply ", None]
+        assert events[0]["message"]["content"] == "Next?"
+        assert events[0]["done"] is False
+        assert events[-1]["done"] is True
+        assert events[-1]["message"]["type"] == "agent"
+        assert events[-1]["message"]["content"] == "Agent reply"
+
+    @pytest.mark.asyncio
+    async def test_agent_message_is_persisted_with_summary(self, test_db, mock_llm):
+        await seed_conversations(test_db, 1)
+
+        await stream_events({"conversationId": 1, "type": "user", "content": "Next?"})
+
+        history = mock_llm.call_args.kwargs["conversation_history"]
+        assert [msg.content for msg in history] == ["Message 0"]
+        conversation = await fetch_conversation()
+        assert [
+            edge["node"]["content"] for edge in conversation["messages"]["edges"]
+        ] == [
+            "Message 0",
+            "Next?",
+            "Agent reply",
+        ]
+        [summary] = await fetch_summaries()
+        assert summary["lastMessagePreview"] == "Agent reply"
+
+    @pytest.mark.asyncio
+    async def test_agent_type_is_saved_without_streaming(self, test_db, mock_llm):
+        await seed_conversations(test_db, 1)
+
+        events = await stream_events(
+            {"conversationId": 1, "type": "agent", "content": "Noted"}
+        )
+
+        assert events == [
+            {"delta": None, "done": True, "message": events[0]["message"]}
+        ]
+        mock_llm.assert_not_called()
@@ -0,0 +1,61 @@
+from unittest.mock import patch
+
+from app.services.tokenizer import (
+    MESSAGE_OVERHEAD_TOKENS,
+    approximate_token_count,
+    count_message_tokens,
+    count_tokens,
+    image_part_tokens,
+    load_tokenizer,
+)
+
+
+class TestTokenizer:
+    def test_approximate_counts_words_and_symbols(self):
+        assert approximate_token_count("Hello, world!") == 6
+        assert approximate_token_count("internationalization") == 5
+        assert approximate_token_count("") == 0
+
+    def test_count_message_tokens_adds_overhead(self):
+        message = {"role": "user", "content": "Hello, world!"}
+
+        assert count_message_tokens(message) == MESSAGE_OVERHEAD_TOKENS + 6
+
+    def test_content_parts_count_text_and_images(self):
+        message = {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": "Hello, world!"},
+                {"type": "image_url", "image_url": {"url": "data:image/jpeg;base64,"}},
+            ],
+        }
+
+        assert count_message_tokens(message) == (
+            MESSAGE_OVERHEAD_TOKENS + 6 + image_part_tokens()
+        )
+        with patch("app.services.tokenizer.settings.LLM_IMAGE_MAX_DIMENSION", 512):
+            assert image_part_tokens() == 85 + 170
+
+    def test_empty_content_counts_only_overhead(self):
+        assert count_tokens(None) == 0
+        assert count_message_tokens({"role": "user"}) == MESSAGE_OVERHEAD_TOKENS
+
+    def test_unavailable_encoding_falls_back_to_estimate(self):
+        load_tokenizer.cache_clear()
+        with (
+            patch("app.services.tokenizer.settings.LLM_TOKENIZER", "cl100k_base"),
+            patch("tiktoken.get_encoding", side_effect=OSError("offline")),
+        ):
+            assert load_tokenizer() is approximate_token_count
+
+    def test_tiktoken_encoding_is_used_when_available(self):
+        class FakeEncoding:
+            def encode(self, text, disallowed_special):
+                return text.split()
+
+        load_tokenizer.cache_clear()
+        with (
+            patch("app.services.tokenizer.settings.LLM_TOKENIZER", "cl100k_base"),
+            patch("tiktoken.get_encoding", return_value=FakeEncoding()),
+        ):
+            assert count_tokens("one two three") == 3
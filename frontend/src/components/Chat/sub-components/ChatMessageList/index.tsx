@@ -1,6 +1,8 @@
+import Button from '@mui/material/Button';
 import Stack from '@mui/material/Stack';
 import React from 'react';
 
+import { STREAMING_MESSAGE_ID } from '../../../../hooks/useChat';
 import { useConversation } from '../../../../hooks/useConversation';
 import { Layout } from '../../../../styles/layout';
 import ChatTypingIndicator from '../ChatInputTypingIndicator';
@@ -13,11 +15,29 @@ import type { Message } from '../../../../types/chat';
 const ChatMessageList: React.FC<{
   messages: Message[];
 }> = ({ messages }) => {
-  const { isGetConversationLoading, isAddingMessagePending } = useConversation();
-  const isTyping = isGetConversationLoading || isAddingMessagePending;
+  const {
+    activeConversation,
+    isGetConversationLoading,
+    isAddingMessagePending,
+    loadOlderMessages,
+    isLoadingOlderMessages,
+  } = useConversation();
+  // Once tokens start streaming the reply itself replaces the typing indicator
+  const isStreaming = messages[messages.length - 1]?.id === STREAMING_MESSAGE_ID;
+  const isTyping = isGetConversationLoading || (isAddingMessagePending && !isStreaming);
   return (
     <MessageListContainer px={2} pt={2} pb={Layout.chatInputHeight}>
       <Stack spacing={2} alignItems="stretch" sx={{ minHeight: 'min-content', width: '100%' }}>
+        {activeConversation?.hasOlderMessages && (
+          <Button
+            size="small"
+            onClick={loadOlderMessages}
+            disabled={isLoadingOlderMessages}
+            sx={{ alignSelf: 'center' }}
+          >
+            Load earlier messages
+          </Button>
+        )}
         {messages.map((message) => (
           <ChatMessageBubble key={message.id} message={message} />
         ))}
@@ -8,15 +8,20 @@ import SidebarConversationList from './sub-components/SidebarConversationList';
 import SidebarHeader from './sub-components/SidebarHeader';
 import SidebarSearch from './sub-components/SidebarSearch';
 
-import type { Conversation } from '../../types/chat';
+import type { ConversationSummary } from '../../types/chat';
 
 const Sidebar: React.FC = () => {
   const navigate = useNavigate();
   const { conversationId } = useParams() as { conversationId: string };
-  const { data: conversations = [] } = useGetConversations();
+  const {
+    data: conversations = [],
+    hasNextPage,
+    fetchNextPage,
+    isFetchingNextPage,
+  } = useGetConversations();
 
   const handleSelectConversation = useCallback(
-    (conversation: Conversation) => {
+    (conversation: ConversationSummary) => {
       navigate(`/conversations/${conversation.id}`);
     },
     [navigate],
@@ -30,6 +35,9 @@ const Sidebar: React.FC = () => {
         conversations={conversations}
         conversationId={conversationId}
         onSelect={handleSelectConversation}
+        hasMore={hasNextPage}
+        onLoadMore={fetchNextPage}
+        isLoadingMore={isFetchingNextPage}
       />
     </SidebarRoot>
   );
@@ -1,22 +1,34 @@
+import Button from '@mui/material/Button';
 import List from '@mui/material/List';
 import React from 'react';
 
 import SidebarItem from '../SidebarItem';
 
-import { SidebarConversationListRoot, EmptyStateContainer, SidebarListSubheader } from './styles';
+import {
+  SidebarConversationListRoot,
+  EmptyStateContainer,
+  LoadMoreContainer,
+  SidebarListSubheader,
+} from './styles';
 
-import type { Conversation } from '../../../../types/chat';
+import type { ConversationSummary } from '../../../../types/chat';
 
 interface SidebarConversationListProps {
-  conversations: Conversation[];
+  conversations: ConversationSummary[];
   conversationId: string;
-  onSelect: (conversation: Conversation) => void;
+  onSelect: (conversation: ConversationSummary) => void;
+  hasMore?: boolean;
+  onLoadMore?: () => void;
+  isLoadingMore?: boolean;
 }
 
 const SidebarConversationList: React.FC<SidebarConversationListProps> = ({
   conversations,
   conversationId,
   onSelect,
+  hasMore = false,
+  onLoadMore,
+  isLoadingMore = false,
 }) => (
   <SidebarConversationListRoot role="navigation">
     <List
@@ -36,6 +48,13 @@ const SidebarConversationList: React.FC<SidebarConversationListProps> = ({
         ))
       )}
     </List>
+    {hasMore && (
+      <LoadMoreContainer>
+        <Button size="small" onClick={() => onLoadMore?.()} disabled={isLoadingMore}>
+          Load more conversations
+        </Button>
+      </LoadMoreContainer>
+    )}
   </SidebarConversationListRoot>
 );
 
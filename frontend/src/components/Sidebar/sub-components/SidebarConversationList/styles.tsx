@@ -15,6 +15,12 @@ export const EmptyStateContainer = styled(Box)(({ theme }) => ({
   fontSize: 14,
 }));
 
+export const LoadMoreContainer = styled(Box)(({ theme }) => ({
+  display: 'flex',
+  justifyContent: 'center',
+  padding: theme.spacing(1),
+}));
+
 export const SidebarListSubheader = styled(ListSubheader)<ListSubheaderProps>({
   backgroundColor: 'transparent',
 });
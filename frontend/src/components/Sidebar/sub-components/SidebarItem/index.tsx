@@ -4,12 +4,12 @@ import ListItemText from '@mui/material/ListItemText';
 import Tooltip from '@mui/material/Tooltip';
 import React from 'react';
 
-import type { Conversation } from '../../../../types/chat';
+import type { ConversationSummary } from '../../../../types/chat';
 
 interface SidebarItemProps {
-  conversation: Conversation;
+  conversation: ConversationSummary;
   isSelected: boolean;
-  onSelect: (conversation: Conversation) => void;
+  onSelect: (conversation: ConversationSummary) => void;
 }
 
 const SidebarItem: React.FC<SidebarItemProps> = React.memo(
@@ -20,12 +20,18 @@ const SidebarItem: React.FC<SidebarItemProps> = React.memo(
           <ListItemButton onClick={() => onSelect(conversation)} selected={isSelected}>
             <ListItemText
               primary={conversation.title}
+              secondary={conversation.lastMessagePreview}
               slotProps={{
                 primary: {
                   variant: 'body2',
                   color: isSelected ? 'primary.contrastText' : 'text.primary',
                   noWrap: true,
                 },
+                secondary: {
+                  variant: 'caption',
+                  color: isSelected ? 'primary.contrastText' : 'text.secondary',
+                  noWrap: true,
+                },
               }}
             />
           </ListItemButton>
@@ -3,8 +3,9 @@ import { useParams } from 'react-router-dom';
 
 import {
   useCreateConversationWithMessage,
-  useSendMessage,
+  useSendMessageStream,
   useGetConversation,
+  useLoadOlderMessages,
 } from '../hooks/useChat';
 import { ConversationContext } from '../hooks/useConversation';
 import { type Attachment, type Conversation, type Message, MessageType } from '../types/chat';
@@ -15,12 +16,14 @@ interface ConversationProviderProps {
 
 export const ConversationProvider: React.FC<ConversationProviderProps> = ({ children }) => {
   const { conversationId } = useParams<{ conversationId: string }>();
-  const { data: activeConversation, isLoading: isGetConversationLoading } = useGetConversation(
-    conversationId ? parseInt(conversationId) : undefined,
-  );
+  const activeConversationId = conversationId ? parseInt(conversationId) : undefined;
+  const { data: activeConversation, isLoading: isGetConversationLoading } =
+    useGetConversation(activeConversationId);
+  const { mutateAsync: loadOlderMessagesMutation, isPending: isLoadingOlderMessages } =
+    useLoadOlderMessages(activeConversationId);
   const { mutateAsync: createConversationMutation, isPending: isCreatingConversationPending } =
     useCreateConversationWithMessage();
-  const { mutateAsync: addMessageMutation, isPending: isAddingMessagePending } = useSendMessage();
+  const { mutateAsync: addMessageMutation, isPending: isAddingMessagePending } = useSendMessageStream();
 
   const createConversation = async (
     message: string,
@@ -65,6 +68,15 @@ export const ConversationProvider: React.FC<ConversationProviderProps> = ({ chil
     }
   };
 
+  const loadOlderMessages = async (): Promise<void> => {
+    if (!activeConversation?.olderMessagesCursor) return;
+    try {
+      await loadOlderMessagesMutation(activeConversation.olderMessagesCursor);
+    } catch (error) {
+      console.error('Failed to load older messages:', error);
+    }
+  };
+
   return (
     <ConversationContext.Provider
       value={{
@@ -74,6 +86,8 @@ export const ConversationProvider: React.FC<ConversationProviderProps> = ({ chil
         isCreatingConversationPending,
         isGetConversationLoading,
         isAddingMessagePending,
+        loadOlderMessages,
+        isLoadingOlderMessages,
       }}
     >
       {children}
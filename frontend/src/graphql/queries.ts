@@ -1,52 +1,57 @@
 import { gql } from "graphql-request";
 
 export const GET_CONVERSATIONS = gql`
-  query GetConversations {
-    getConversations {
-      id
-      title
-      createdAt
-      updatedAt
-      messages {
-        id
-        conversationId
-        type
-        content
-        attachments {
-          type
-          name
-          url
-          size
-          mimeType
-          metadata
+  query GetConversations($first: Int, $after: String) {
+    getConversations(first: $first, after: $after) {
+      edges {
+        cursor
+        node {
+          id
+          title
+          createdAt
+          updatedAt
+          messageCount
+          lastMessagePreview
+          lastMessageAt
         }
-        createdAt
+      }
+      pageInfo {
+        hasNextPage
+        endCursor
       }
     }
   }
 `;
 
 export const GET_CONVERSATION = gql`
-  query GetConversation($id: Int!) {
+  query GetConversation($id: Int!, $last: Int, $before: String) {
     getConversation(id: $id) {
       id
       title
       createdAt
       updatedAt
-      messages {
-        id
-        conversationId
-        type
-        content
-        attachments {
-          type
-          name
-          url
-          size
-          mimeType
-          metadata
+      messages(last: $last, before: $before) {
+        edges {
+          node {
+            id
+            conversationId
+            type
+            content
+            attachments {
+              type
+              name
+              url
+              size
+              mimeType
+              metadata
+            }
+            createdAt
+          }
+        }
+        pageInfo {
+          hasPreviousPage
+          startCursor
         }
-        createdAt
       }
     }
   }
@@ -60,19 +65,27 @@ export const CREATE_CONVERSATION = gql`
       createdAt
       updatedAt
       messages {
-        id
-        conversationId
-        type
-        content
-        attachments {
-          type
-          name
-          url
-          size
-          mimeType
-          metadata
+        edges {
+          node {
+            id
+            conversationId
+            type
+            content
+            attachments {
+              type
+              name
+              url
+              size
+              mimeType
+              metadata
+            }
+            createdAt
+          }
+        }
+        pageInfo {
+          hasPreviousPage
+          startCursor
         }
-        createdAt
       }
     }
   }
@@ -94,19 +107,27 @@ export const CREATE_CONVERSATION_WITH_MESSAGE = gql`
       createdAt
       updatedAt
       messages {
-        id
-        conversationId
-        type
-        content
-        attachments {
-          type
-          name
-          url
-          size
-          mimeType
-          metadata
+        edges {
+          node {
+            id
+            conversationId
+            type
+            content
+            attachments {
+              type
+              name
+              url
+              size
+              mimeType
+              metadata
+            }
+            createdAt
+          }
+        }
+        pageInfo {
+          hasPreviousPage
+          startCursor
         }
-        createdAt
       }
     }
   }
@@ -131,3 +152,68 @@ export const SEND_MESSAGE = gql`
     }
   }
 `;
+
+export const SEND_MESSAGE_STREAM = gql`
+  subscription SendMessageStream($input: MessageInput!) {
+    sendMessageStream(input: $input) {
+      delta
+      done
+      message {
+        id
+        conversationId
+        type
+        content
+        attachments {
+          type
+          name
+          url
+          size
+          mimeType
+          metadata
+        }
+        createdAt
+      }
+    }
+  }
+`;
+
+export const SEND_MESSAGE_ASYNC = gql`
+  mutation SendMessageAsync($input: MessageInput!) {
+    sendMessageAsync(input: $input) {
+      id
+      status
+      userMessage {
+        id
+        conversationId
+        type
+        content
+        attachments {
+          type
+          name
+          url
+          size
+          mimeType
+          metadata
+        }
+        createdAt
+      }
+    }
+  }
+`;
+
+export const GENERATION_STATUS = gql`
+  query GenerationStatus($jobId: Int!) {
+    generationStatus(jobId: $jobId) {
+      id
+      status
+      error
+      agentMessage {
+        id
+        conversationId
+        type
+        content
+        createdAt
+      }
+    }
+  }
+`;
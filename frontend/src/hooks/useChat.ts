@@ -1,4 +1,4 @@
-import { useQuery, useMutation, useQueryClient } from "@tanstack/react-query";
+import { useInfiniteQuery, useQuery, useMutation, useQueryClient } from "@tanstack/react-query";
 
 import {
   GET_CONVERSATIONS,
@@ -6,25 +6,44 @@ import {
   CREATE_CONVERSATION,
   CREATE_CONVERSATION_WITH_MESSAGE,
   SEND_MESSAGE,
+  SEND_MESSAGE_STREAM,
 } from "../graphql/queries";
 import { graphqlClient } from "../lib/graphql";
+import { subscribe } from "../lib/subscriptions";
 import { MessageType } from "../types/chat";
 import { queryKeys } from "../utils/queryKeys";
 
 import type {
   Conversation,
   ConversationInput,
+  ConversationSummary,
   MessageInput,
   Message,
   Attachment,
 } from "../types/chat";
 
-interface GraphQLConversation {
+interface GraphQLConversationSummary {
   id: string;
   title: string;
   createdAt: string;
   updatedAt: string;
-  messages: GraphQLMessage[];
+  messageCount?: number;
+  lastMessagePreview?: string | null;
+  lastMessageAt?: string | null;
+}
+
+interface GraphQLConversation extends GraphQLConversationSummary {
+  messages: GraphQLMessageConnection;
+}
+
+interface GraphQLMessageConnection {
+  edges: { node: GraphQLMessage }[];
+  pageInfo: { hasPreviousPage: boolean; startCursor: string | null };
+}
+
+interface GraphQLConversationConnection {
+  edges: { cursor: string; node: GraphQLConversationSummary }[];
+  pageInfo: { hasNextPage: boolean; endCursor: string | null };
 }
 
 interface GraphQLMessage {
@@ -36,40 +55,60 @@ interface GraphQLMessage {
   createdAt: string;
 }
 
+interface GraphQLMessageStreamEvent {
+  delta?: string | null;
+  done: boolean;
+  message?: GraphQLMessage | null;
+}
+
+// Placeholder ID of the agent message while its tokens are still arriving
+export const STREAMING_MESSAGE_ID = "streaming";
+
 const formatMessage = (msg: GraphQLMessage): Message => ({
   ...msg,
   type: msg.type === 'user' ? MessageType.USER : MessageType.AGENT,
   createdAt: new Date(msg.createdAt),
 });
 
-const formatConversation = (conv: GraphQLConversation): Conversation => ({
+const formatConversationSummary = (conv: GraphQLConversationSummary): ConversationSummary => ({
   ...conv,
   createdAt: new Date(conv.createdAt),
   updatedAt: new Date(conv.updatedAt),
-  messages: conv.messages.map(formatMessage),
+  lastMessageAt: conv.lastMessageAt ? new Date(conv.lastMessageAt) : null,
 });
 
-export const useGetConversations = () => {
-  const queryClient = useQueryClient();
+const formatConversation = (conv: GraphQLConversation): Conversation => ({
+  ...formatConversationSummary(conv),
+  messages: conv.messages.edges.map((edge) => formatMessage(edge.node)),
+  hasOlderMessages: conv.messages.pageInfo.hasPreviousPage,
+  olderMessagesCursor: conv.messages.pageInfo.startCursor,
+});
 
-  return useQuery({
+const CONVERSATIONS_PAGE_SIZE = 50;
+const MESSAGES_PAGE_SIZE = 50;
+
+// Conversations are paged newest-first; fetchNextPage loads the next older page
+export const useGetConversations = () => {
+  return useInfiniteQuery({
     throwOnError: process.env.NODE_ENV === 'development',
     queryKey: queryKeys.conversations.all,
-    queryFn: async (): Promise<Conversation[]> => {
-      const data = (await graphqlClient.request(GET_CONVERSATIONS)) as {
-        getConversations: GraphQLConversation[];
+    queryFn: async ({ pageParam }): Promise<GraphQLConversationConnection> => {
+      const data = (await graphqlClient.request(GET_CONVERSATIONS, {
+        first: CONVERSATIONS_PAGE_SIZE,
+        after: pageParam,
+      })) as {
+        getConversations: GraphQLConversationConnection;
       };
 
-      const conversations = data.getConversations.map((conv) => {
-        const conversation = formatConversation(conv);
-
-        queryClient.setQueryData(queryKeys.conversations.detail(parseInt(conv.id)), conversation);
-
-        return conversation;
-      });
-
-      return conversations;
+      return data.getConversations;
     },
+    initialPageParam: null as string | null,
+    getNextPageParam: (lastPage) =>
+      lastPage.pageInfo.hasNextPage ? lastPage.pageInfo.endCursor : undefined,
+    select: (data): ConversationSummary[] =>
+      data.pages.flatMap((page) =>
+        page.edges.map((edge) => formatConversationSummary(edge.node))
+      ),
   });
 };
 
@@ -78,7 +117,10 @@ export const useGetConversation = (id?: number) => {
     throwOnError: process.env.NODE_ENV === 'development',
     queryKey: queryKeys.conversations.detail(id!),
     queryFn: async (): Promise<Conversation | null> => {
-      const data = (await graphqlClient.request(GET_CONVERSATION, { id })) as {
+      const data = (await graphqlClient.request(GET_CONVERSATION, {
+        id,
+        last: MESSAGES_PAGE_SIZE,
+      })) as {
         getConversation: GraphQLConversation | null;
       };
       if (!data.getConversation) return null;
@@ -91,6 +133,43 @@ export const useGetConversation = (id?: number) => {
   });
 };
 
+export const useLoadOlderMessages = (id?: number) => {
+  const queryClient = useQueryClient();
+
+  return useMutation({
+    throwOnError: process.env.NODE_ENV === 'development',
+    mutationKey: queryKeys.mutations.loadOlderMessages,
+    mutationFn: async (before: string): Promise<Conversation | null> => {
+      const data = (await graphqlClient.request(GET_CONVERSATION, {
+        id,
+        last: MESSAGES_PAGE_SIZE,
+        before,
+      })) as {
+        getConversation: GraphQLConversation | null;
+      };
+      if (!data.getConversation) return null;
+
+      return formatConversation(data.getConversation);
+    },
+    onSuccess: (olderPage) => {
+      if (!olderPage) return;
+      // Prepend the older page to the cached conversation
+      queryClient.setQueryData(
+        queryKeys.conversations.detail(id!),
+        (oldData: Conversation | undefined) => {
+          if (!oldData) return oldData;
+          return {
+            ...oldData,
+            messages: [...olderPage.messages, ...oldData.messages],
+            hasOlderMessages: olderPage.hasOlderMessages,
+            olderMessagesCursor: olderPage.olderMessagesCursor,
+          };
+        }
+      );
+    },
+  });
+};
+
 export const useCreateConversation = () => {
   const queryClient = useQueryClient();
 
@@ -176,3 +255,73 @@ export const useSendMessage = () => {
     },
   });
 };
+
+export const useSendMessageStream = () => {
+  const queryClient = useQueryClient();
+
+  return useMutation({
+    throwOnError: process.env.NODE_ENV === "development",
+    mutationKey: queryKeys.mutations.sendMessageStream,
+    mutationFn: (input: MessageInput): Promise<Message> => {
+      const updateMessages = (update: (messages: Message[]) => Message[]) =>
+        queryClient.setQueryData(
+          queryKeys.conversations.detail(input.conversationId),
+          (oldData: Conversation | undefined) => {
+            if (!oldData) return oldData;
+            return { ...oldData, updatedAt: new Date(), messages: update(oldData.messages) };
+          }
+        );
+      const withoutPlaceholder = (messages: Message[]) =>
+        messages.filter((message) => message.id !== STREAMING_MESSAGE_ID);
+
+      return new Promise((resolve, reject) => {
+        subscribe<{ sendMessageStream: GraphQLMessageStreamEvent }>(
+          SEND_MESSAGE_STREAM,
+          { input },
+          {
+            onNext: ({ sendMessageStream: event }) => {
+              if (event.done && event.message) {
+                // The saved agent message replaces the streamed placeholder
+                const message = formatMessage(event.message);
+                updateMessages((messages) => [...withoutPlaceholder(messages), message]);
+                resolve(message);
+              } else if (event.message) {
+                const message = formatMessage(event.message);
+                updateMessages((messages) => [...messages, message]);
+              } else if (event.delta) {
+                const delta = event.delta;
+                updateMessages((messages) => {
+                  const last = messages[messages.length - 1];
+                  if (last?.id === STREAMING_MESSAGE_ID) {
+                    return [...messages.slice(0, -1), { ...last, content: last.content + delta }];
+                  }
+                  return [
+                    ...messages,
+                    {
+                      id: STREAMING_MESSAGE_ID,
+                      conversationId: String(input.conversationId),
+                      type: MessageType.AGENT,
+                      content: delta,
+                      createdAt: new Date(),
+                    },
+                  ];
+                });
+              }
+            },
+            onError: (error) => {
+              updateMessages(withoutPlaceholder);
+              reject(error);
+            },
+            onComplete: () => reject(new Error("Stream ended without a reply")),
+          }
+        );
+      });
+    },
+    onSettled: (_message, _error, variables) => {
+      queryClient.invalidateQueries({ queryKey: queryKeys.conversations.all });
+      queryClient.invalidateQueries({
+        queryKey: queryKeys.conversations.detail(variables.conversationId),
+      });
+    },
+  });
+};
@@ -9,6 +9,8 @@ interface ConversationContextState {
   isCreatingConversationPending: boolean;
   isGetConversationLoading: boolean;
   isAddingMessagePending: boolean;
+  loadOlderMessages: () => Promise<void>;
+  isLoadingOlderMessages: boolean;
 }
 
 export const ConversationContext = createContext<ConversationContextState | undefined>(undefined);
@@ -2,10 +2,66 @@ import { GraphQLClient } from "graphql-request";
 
 const endpoint = "http://localhost:8000/graphql";
 
+const PERSISTED_QUERY_NOT_FOUND = "PersistedQueryNotFound";
+
+// sha256 of each query document, computed once per document
+const queryHashes = new Map<string, Promise<string>>();
+
+const hashQuery = (query: string): Promise<string> => {
+  let hash = queryHashes.get(query);
+  if (!hash) {
+    hash = crypto.subtle
+      .digest("SHA-256", new TextEncoder().encode(query))
+      .then((digest) =>
+        Array.from(new Uint8Array(digest), (byte) => byte.toString(16).padStart(2, "0")).join("")
+      );
+    queryHashes.set(query, hash);
+  }
+  return hash;
+};
+
+/**
+ * Automatic persisted queries: send only the query hash, and fall back to
+ * sending the full document once when the server has not seen it yet.
+ */
+const persistedQueryFetch: typeof fetch = async (input, init) => {
+  if (typeof init?.body !== "string" || !globalThis.crypto?.subtle) {
+    return fetch(input, init);
+  }
+
+  const { query, ...body } = JSON.parse(init.body);
+  if (typeof query !== "string") {
+    return fetch(input, init);
+  }
+
+  const extensions = {
+    ...body.extensions,
+    persistedQuery: { version: 1, sha256Hash: await hashQuery(query) },
+  };
+
+  const response = await fetch(input, {
+    ...init,
+    body: JSON.stringify({ ...body, extensions }),
+  });
+  const result = await response.clone().json().catch(() => null);
+  const notFound = result?.errors?.some(
+    (error: { message?: string }) => error.message === PERSISTED_QUERY_NOT_FOUND
+  );
+  if (!notFound) {
+    return response;
+  }
+
+  return fetch(input, {
+    ...init,
+    body: JSON.stringify({ ...body, query, extensions }),
+  });
+};
+
 export const graphqlClient = new GraphQLClient(endpoint, {
   headers: {
     "Content-Type": "application/json",
   },
+  fetch: persistedQueryFetch,
 });
 
 export default graphqlClient;
@@ -0,0 +1,69 @@
+const endpoint = "ws://localhost:8000/graphql";
+
+const SUBPROTOCOL = "graphql-transport-ws";
+
+interface SubscriptionHandlers<T> {
+  onNext: (data: T) => void;
+  onError: (error: Error) => void;
+  onComplete: () => void;
+}
+
+/**
+ * Run one GraphQL subscription over its own WebSocket using the
+ * graphql-transport-ws protocol. Returns a function that stops it.
+ */
+export const subscribe = <T>(
+  query: string,
+  variables: Record<string, unknown>,
+  { onNext, onError, onComplete }: SubscriptionHandlers<T>
+): (() => void) => {
+  const socket = new WebSocket(endpoint, SUBPROTOCOL);
+  const id = "1";
+  let finished = false;
+
+  const finish = (callback: () => void) => {
+    if (finished) return;
+    finished = true;
+    callback();
+    socket.close(1000);
+  };
+
+  socket.onopen = () => {
+    socket.send(JSON.stringify({ type: "connection_init" }));
+  };
+
+  socket.onmessage = (event) => {
+    const message = JSON.parse(event.data);
+    switch (message.type) {
+      case "connection_ack":
+        socket.send(JSON.stringify({ id, type: "subscribe", payload: { query, variables } }));
+        break;
+      case "ping":
+        socket.send(JSON.stringify({ type: "pong" }));
+        break;
+      case "next":
+        if (message.payload.errors?.length) {
+          finish(() => onError(new Error(message.payload.errors[0].message)));
+        } else {
+          onNext(message.payload.data as T);
+        }
+        break;
+      case "error":
+        finish(() => onError(new Error(message.payload?.[0]?.message ?? "Subscription failed")));
+        break;
+      case "complete":
+        finish(onComplete);
+        break;
+    }
+  };
+
+  socket.onerror = () => finish(() => onError(new Error("Subscription connection failed")));
+  socket.onclose = () => finish(() => onError(new Error("Subscription closed before completing")));
+
+  return () => {
+    if (!finished && socket.readyState === WebSocket.OPEN) {
+      socket.send(JSON.stringify({ id, type: "complete" }));
+    }
+    finish(() => undefined);
+  };
+};
@@ -25,12 +25,20 @@ export interface Message {
   createdAt: Date;
 }
 
-export interface Conversation {
+export interface ConversationSummary {
   id: string;
   title: string;
   createdAt: Date;
   updatedAt: Date;
+  messageCount?: number;
+  lastMessagePreview?: string | null;
+  lastMessageAt?: Date | null;
+}
+
+export interface Conversation extends ConversationSummary {
   messages: Message[];
+  hasOlderMessages: boolean;
+  olderMessagesCursor: string | null;
 }
 
 export interface ConversationInput {
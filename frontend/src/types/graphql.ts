@@ -19,6 +19,7 @@ export type Scalars = {
 };
 
 export type AttachmentGQL = {
+  file?: Maybe<FileGQL>;
   metadata?: Maybe<Scalars['JSON']['output']>;
   mimeType?: Maybe<Scalars['String']['output']>;
   name: Scalars['String']['output'];
@@ -39,15 +40,42 @@ export type AttachmentInput = {
 export type ConversationGQL = {
   createdAt: Scalars['DateTime']['output'];
   id: Scalars['Int']['output'];
-  messages: Array<MessageGQL>;
+  messages: MessageConnection;
   title: Scalars['String']['output'];
   updatedAt: Scalars['DateTime']['output'];
 };
 
+
+export type ConversationGQLmessagesArgs = {
+  before?: InputMaybe<Scalars['String']['input']>;
+  last?: InputMaybe<Scalars['Int']['input']>;
+};
+
+export type ConversationConnection = {
+  edges: Array<ConversationEdge>;
+  pageInfo: PageInfo;
+};
+
+export type ConversationEdge = {
+  cursor: Scalars['String']['output'];
+  node: ConversationSummaryGQL;
+};
+
 export type ConversationInput = {
   title?: InputMaybe<Scalars['String']['input']>;
 };
 
+/** Sidebar-sized view of a conversation; never carries messages. */
+export type ConversationSummaryGQL = {
+  createdAt: Scalars['DateTime']['output'];
+  id: Scalars['Int']['output'];
+  lastMessageAt?: Maybe<Scalars['DateTime']['output']>;
+  lastMessagePreview?: Maybe<Scalars['String']['output']>;
+  messageCount: Scalars['Int']['output'];
+  title: Scalars['String']['output'];
+  updatedAt: Scalars['DateTime']['output'];
+};
+
 export type DocumentCreateInput = {
   category: Scalars['String']['input'];
   content: Scalars['String']['input'];
@@ -69,6 +97,37 @@ export type DocumentType = {
   title: Scalars['String']['output'];
 };
 
+export type FileGQL = {
+  createdAt: Scalars['DateTime']['output'];
+  fileName: Scalars['String']['output'];
+  fileSize: Scalars['Int']['output'];
+  hasExtractedContent: Scalars['Boolean']['output'];
+  id: Scalars['Int']['output'];
+  metadata?: Maybe<Scalars['JSON']['output']>;
+  mimeType: Scalars['String']['output'];
+};
+
+export type GenerationJobGQL = {
+  agentMessage?: Maybe<MessageGQL>;
+  conversationId: Scalars['Int']['output'];
+  createdAt: Scalars['DateTime']['output'];
+  error?: Maybe<Scalars['String']['output']>;
+  id: Scalars['Int']['output'];
+  status: Scalars['String']['output'];
+  updatedAt: Scalars['DateTime']['output'];
+  userMessage: MessageGQL;
+};
+
+export type MessageConnection = {
+  edges: Array<MessageEdge>;
+  pageInfo: PageInfo;
+};
+
+export type MessageEdge = {
+  cursor: Scalars['String']['output'];
+  node: MessageGQL;
+};
+
 export type MessageGQL = {
   attachments?: Maybe<Array<AttachmentGQL>>;
   content: Scalars['String']['output'];
@@ -86,11 +145,18 @@ export type MessageInput = {
   type: Scalars['String']['input'];
 };
 
+export type MessageStreamEvent = {
+  delta?: Maybe<Scalars['String']['output']>;
+  done: Scalars['Boolean']['output'];
+  message?: Maybe<MessageGQL>;
+};
+
 export type Mutation = {
   createConversation: ConversationGQL;
   createConversationWithMessage: ConversationGQL;
   createDocument: DocumentType;
   sendMessage: MessageGQL;
+  sendMessageAsync: GenerationJobGQL;
 };
 
 
@@ -115,19 +181,43 @@ export type MutationsendMessageArgs = {
   input: MessageInput;
 };
 
+
+export type MutationsendMessageAsyncArgs = {
+  input: MessageInput;
+};
+
+export type PageInfo = {
+  endCursor?: Maybe<Scalars['String']['output']>;
+  hasNextPage: Scalars['Boolean']['output'];
+  hasPreviousPage: Scalars['Boolean']['output'];
+  startCursor?: Maybe<Scalars['String']['output']>;
+};
+
 export type Query = {
+  generationStatus?: Maybe<GenerationJobGQL>;
   getConversation?: Maybe<ConversationGQL>;
-  getConversations: Array<ConversationGQL>;
+  getConversations: ConversationConnection;
   getDocument: DocumentType;
   listDocuments: Array<DocumentType>;
 };
 
 
+export type QuerygenerationStatusArgs = {
+  jobId: Scalars['Int']['input'];
+};
+
+
 export type QuerygetConversationArgs = {
   id: Scalars['Int']['input'];
 };
 
 
+export type QuerygetConversationsArgs = {
+  after?: InputMaybe<Scalars['String']['input']>;
+  first?: Scalars['Int']['input'];
+};
+
+
 export type QuerygetDocumentArgs = {
   id: Scalars['Int']['input'];
 };
@@ -139,24 +229,38 @@ export type QuerylistDocumentsArgs = {
   offset?: Scalars['Int']['input'];
 };
 
-export type GetConversationsQueryVariables = Exact<{ [key: string]: never; }>;
+export type Subscription = {
+  sendMessageStream: MessageStreamEvent;
+};
+
 
+export type SubscriptionsendMessageStreamArgs = {
+  input: MessageInput;
+};
+
+export type GetConversationsQueryVariables = Exact<{
+  first?: InputMaybe<Scalars['Int']['input']>;
+  after?: InputMaybe<Scalars['String']['input']>;
+}>;
 
-export type GetConversationsQuery = { getConversations: Array<{ id: number, title: string, createdAt: any, updatedAt: any, messages: Array<{ id: number, conversationId: number, type: string, content: string, createdAt: any, attachments?: Array<{ type: string, name: string, url: string, size?: number | null, mimeType?: string | null, metadata?: any | null }> | null }> }> };
+
+export type GetConversationsQuery = { getConversations: { edges: Array<{ cursor: string, node: { id: number, title: string, createdAt: any, updatedAt: any, messageCount: number, lastMessagePreview?: string | null, lastMessageAt?: any | null } }>, pageInfo: { hasNextPage: boolean, endCursor?: string | null } } };
 
 export type GetConversationQueryVariables = Exact<{
   id: Scalars['Int']['input'];
+  last?: InputMaybe<Scalars['Int']['input']>;
+  before?: InputMaybe<Scalars['String']['input']>;
 }>;
 
 
-export type GetConversationQuery = { getConversation?: { id: number, title: string, createdAt: any, updatedAt: any, messages: Array<{ id: number, conversationId: number, type: string, content: string, createdAt: any, attachments?: Array<{ type: string, name: string, url: string, size?: number | null, mimeType?: string | null, metadata?: any | null }> | null }> } | null };
+export type GetConversationQuery = { getConversation?: { id: number, title: string, createdAt: any, updatedAt: any, messages: { edges: Array<{ node: { id: number, conversationId: number, type: string, content: string, createdAt: any, attachments?: Array<{ type: string, name: string, url: string, size?: number | null, mimeType?: string | null, metadata?: any | null }> | null } }>, pageInfo: { hasPreviousPage: boolean, startCursor?: string | null } } } | null };
 
 export type CreateConversationMutationVariables = Exact<{
   input: ConversationInput;
 }>;
 
 
-export type CreateConversationMutation = { createConversation: { id: number, title: string, createdAt: any, updatedAt: any, messages: Array<{ id: number, conversationId: number, type: string, content: string, createdAt: any, attachments?: Array<{ type: string, name: string, url: string, size?: number | null, mimeType?: string | null, metadata?: any | null }> | null }> } };
+export type CreateConversationMutation = { createConversation: { id: number, title: string, createdAt: any, updatedAt: any, messages: { edges: Array<{ node: { id: number, conversationId: number, type: string, content: string, createdAt: any, attachments?: Array<{ type: string, name: string, url: string, size?: number | null, mimeType?: string | null, metadata?: any | null }> | null } }>, pageInfo: { hasPreviousPage: boolean, startCursor?: string | null } } } };
 
 export type CreateConversationWithMessageMutationVariables = Exact<{
   title?: InputMaybe<Scalars['String']['input']>;
@@ -165,7 +269,7 @@ export type CreateConversationWithMessageMutationVariables = Exact<{
 }>;
 
 
-export type CreateConversationWithMessageMutation = { createConversationWithMessage: { id: number, title: string, createdAt: any, updatedAt: any, messages: Array<{ id: number, conversationId: number, type: string, content: string, createdAt: any, attachments?: Array<{ type: string, name: string, url: string, size?: number | null, mimeType?: string | null, metadata?: any | null }> | null }> } };
+export type CreateConversationWithMessageMutation = { createConversationWithMessage: { id: number, title: string, createdAt: any, updatedAt: any, messages: { edges: Array<{ node: { id: number, conversationId: number, type: string, content: string, createdAt: any, attachments?: Array<{ type: string, name: string, url: string, size?: number | null, mimeType?: string | null, metadata?: any | null }> | null } }>, pageInfo: { hasPreviousPage: boolean, startCursor?: string | null } } } };
 
 export type SendMessageMutationVariables = Exact<{
   input: MessageInput;
@@ -173,3 +277,24 @@ export type SendMessageMutationVariables = Exact<{
 
 
 export type SendMessageMutation = { sendMessage: { id: number, conversationId: number, type: string, content: string, createdAt: any, attachments?: Array<{ type: string, name: string, url: string, size?: number | null, mimeType?: string | null, metadata?: any | null }> | null } };
+
+export type SendMessageStreamSubscriptionVariables = Exact<{
+  input: MessageInput;
+}>;
+
+
+export type SendMessageStreamSubscription = { sendMessageStream: { delta?: string | null, done: boolean, message?: { id: number, conversationId: number, type: string, content: string, createdAt: any, attachments?: Array<{ type: string, name: string, url: string, size?: number | null, mimeType?: string | null, metadata?: any | null }> | null } | null } };
+
+export type SendMessageAsyncMutationVariables = Exact<{
+  input: MessageInput;
+}>;
+
+
+export type SendMessageAsyncMutation = { sendMessageAsync: { id: number, status: string, userMessage: { id: number, conversationId: number, type: string, content: string, createdAt: any, attachments?: Array<{ type: string, name: string, url: string, size?: number | null, mimeType?: string | null, metadata?: any | null }> | null } } };
+
+export type GenerationStatusQueryVariables = Exact<{
+  jobId: Scalars['Int']['input'];
+}>;
+
+
+export type GenerationStatusQuery = { generationStatus?: { id: number, status: string, error?: string | null, agentMessage?: { id: number, conversationId: number, type: string, content: string, createdAt: any } | null } | null };
@@ -29,6 +29,8 @@ export const queryKeys = {
     createConversation: ["createConversation"] as const,
     createConversationWithMessage: ["createConversationWithMessage"] as const,
     sendMessage: ["sendMessage"] as const,
+    sendMessageStream: ["sendMessageStream"] as const,
+    loadOlderMessages: ["loadOlderMessages"] as const,
   },
 } as const;
 